@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+bench_crossings.py - Qualidade x tempo da reducao de cruzamentos do layout
+
+Para cada esforco de crossing_reduction (fast, normal, high) roda o layout
+generico (sem LaTeX) e soma os cruzamentos entre camadas antes e depois da
+reducao e o tempo gasto nela:
+  - todos os circuitos de circuits/;
+  - somadores ripple-carry CMOS sinteticos (synthetic_netlists.py).
+
+Uso:
+    python scripts/bench_crossings.py
+    python scripts/bench_crossings.py --bits 8 32 --efforts fast high
+"""
+
+import sys
+import os
+import argparse
+import tempfile
+
+import spice_to_schematic
+import synthetic_netlists
+from crossing_reduction import EFFORTS
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+
+
+def measure(circuits, effort):
+    """Soma os layout_stats de todos os circuitos com o esforco dado."""
+    totals = {'groups': 0, 'crossings_before': 0, 'crossings_after': 0, 'seconds': 0.0}
+    for components, title in circuits:
+        stats = {}
+        spice_to_schematic.circuitikz_body(components, title, layout_effort=effort,
+                                           layout_stats=stats)
+        for key, value in stats.items():
+            totals[key] += value
+    return totals
+
+
+def print_rows(label, circuits, efforts):
+    for effort in efforts:
+        totals = measure(circuits, effort)
+        before = totals['crossings_before']
+        after = totals['crossings_after']
+        reduction = 100.0 * (before - after) / before if before else 0.0
+        print(f"{label:>14} {effort:>7} {totals['groups']:>7} {before:>8} {after:>8} "
+              f"{reduction:>9.1f}% {totals['seconds'] * 1e3:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da reducao de cruzamentos')
+    parser.add_argument('--bits', type=int, nargs='+', default=[4, 16, 64],
+                        help='Tamanhos dos somadores sinteticos (bits)')
+    parser.add_argument('--efforts', nargs='+', choices=EFFORTS, default=list(EFFORTS),
+                        help='Esforcos a comparar (padrao: todos)')
+    args = parser.parse_args()
+
+    print(f"{'conjunto':>14} {'esforco':>7} {'grupos':>7} {'antes':>8} {'depois':>8} "
+          f"{'reducao':>10} {'tempo (ms)':>10}")
+    circuits = []
+    for path in sorted(spice_to_schematic.find_spice_files(os.path.join(REPO_ROOT, 'circuits'))):
+        components, title = spice_to_schematic.parse_spice_file(path)
+        if components:
+            circuits.append((components, title))
+    print_rows('circuits/', circuits, args.efforts)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for bits in args.bits:
+            path = os.path.join(tmp, f"somador{bits}.cir")
+            synthetic_netlists.write_lines(path, synthetic_netlists.iter_ripple_adder_lines(bits))
+            print_rows(f"somador {bits}b", [spice_to_schematic.parse_spice_file(path)], args.efforts)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
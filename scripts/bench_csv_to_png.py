@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+bench_csv_to_png.py - Vazao do csv_to_png.py com --jobs
+
+Gera um diretorio de CSVs sinteticos no formato do wrdata e roda o
+csv_to_png.py (processo separado, como na linha de comando) com cada
+valor de --jobs:
+  - tempo total e arquivos/s de cada execucao (cache de formas de onda
+    desligado, para medir leitura + grafico);
+  - saida de console conferida: deve ser igual a da execucao serial
+    (mesma ordem, mesmas contagens de sucesso e erro);
+  - um CSV vazio entra no lote para conferir a contagem de erros.
+
+Uso:
+    python scripts/bench_csv_to_png.py
+    python scripts/bench_csv_to_png.py --files 100 --rows 2000 --jobs 1 2 4 8
+"""
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'csv_to_png.py')
+
+
+def write_corpus(directory, files, rows):
+    """CSVs (tempo, vetor) x 2, como o wrdata sem wr_singlescale, e um CSV vazio."""
+    t = np.linspace(0.0, 1e-3, rows)
+    for i in range(files):
+        data = np.column_stack([t, np.sin(2e4 * (i + 1) * t), t, np.cos(2e4 * t)])
+        np.savetxt(os.path.join(directory, f"sinal_{i:03d}.csv"), data, fmt=' %.6e ', delimiter='')
+    open(os.path.join(directory, 'vazio.csv'), 'w').close()
+
+
+def run(directory, jobs):
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, SCRIPT, directory, '--no-cache', '-j', str(jobs)],
+                          capture_output=True, text=True)
+    return time.perf_counter() - start, proc.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do csv_to_png.py com --jobs')
+    parser.add_argument('--files', type=int, default=100, help='Numero de CSVs sinteticos')
+    parser.add_argument('--rows', type=int, default=2000, help='Linhas por CSV')
+    parser.add_argument('--jobs', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+                        help='Valores de --jobs a medir (o primeiro e a referencia)')
+    args = parser.parse_args()
+
+    print(f"{args.files} CSV(s) de {args.rows} linhas, {os.cpu_count()} CPU(s)")
+    print(f"{'jobs':>5} | {'tempo (s)':>9} | {'arq/s':>7} | {'speedup':>7} | saida igual")
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        write_corpus(tmp, args.files, args.rows)
+        reference = None
+        for jobs in args.jobs:
+            seconds, stdout = run(tmp, jobs)
+            if reference is None:
+                reference = (seconds, stdout)
+            same = stdout == reference[1]
+            failed = failed or not same
+            print(f"{jobs:>5} | {seconds:>9.1f} | {(args.files + 1) / seconds:>7.1f} | "
+                  f"{reference[0] / seconds:>6.2f}x | {'sim' if same else 'NAO'}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
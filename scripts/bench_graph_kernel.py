@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+bench_graph_kernel.py - Escalabilidade das travessias do layout (graph_kernel)
+
+Compara as travessias de graph_kernel.py com as copias originais (abaixo:
+BFS com list.pop(0) e DFS com sets) sobre a adjacencia do layout
+(_layout_adjacency) de somadores ripple-carry CMOS sinteticos, de poucas
+centenas ate ~10k nos:
+  - componentes conexos (todos os nos, em ordem);
+  - niveis BFS a partir do no de maior grau e a partir de todos os nos de
+    um nivel largo (fila grande, onde pop(0) fica quadratico);
+  - resultados conferidos (mesmos niveis e mesmos grupos, na mesma ordem).
+
+Uso:
+    python scripts/bench_graph_kernel.py
+    python scripts/bench_graph_kernel.py --bits 16 64 256 416
+"""
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+import spice_to_schematic
+import synthetic_netlists
+import graph_kernel
+
+LAYOUT_BIPOLES = {'R', 'C', 'L', 'V', 'I', 'D'}
+
+
+def legacy_components(adj, nodes):
+    """DFS original de _circuitikz_generic."""
+    groups = []
+    visited = set()
+    for n in nodes:
+        if n in visited:
+            continue
+        stack = [n]
+        group = set()
+        while stack:
+            cur = stack.pop()
+            if cur in group:
+                continue
+            group.add(cur)
+            for nxt in adj[cur]:
+                if nxt not in group:
+                    stack.append(nxt)
+        visited |= group
+        groups.append(group)
+    return groups
+
+
+def legacy_levels(adj, roots, group):
+    """BFS original de layout_group (fila em lista, pop(0))."""
+    level = {root: 0 for root in roots}
+    queue = list(level.keys())
+    while queue:
+        cur = queue.pop(0)
+        for nxt in adj[cur]:
+            if nxt in group and nxt not in level:
+                level[nxt] = level[cur] + 1
+                queue.append(nxt)
+    return level
+
+
+def timed(func, *args, repeat=3):
+    """Menor tempo (s) de repeat execucoes e o ultimo resultado."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench(components):
+    adj = spice_to_schematic._layout_adjacency(components, LAYOUT_BIPOLES)
+    nodes = sorted(adj)
+    edges = sum(len(ns) for ns in adj.values()) // 2
+
+    old_cc, old_groups = timed(legacy_components, adj, nodes)
+    new_cc, new_groups = timed(graph_kernel.connected_components, adj, nodes)
+    same = [list(g) for g in old_groups] == [list(g) for g in new_groups]
+
+    group = max(new_groups, key=len)
+    degree = graph_kernel.degree_table(adj, group)
+    root = max(group, key=lambda n: (degree[n], n))
+    old_bfs, old_level = timed(legacy_levels, adj, [root], group)
+    new_bfs, new_level = timed(graph_kernel.bfs_levels, adj, [root], group)
+    same = same and list(old_level.items()) == list(new_level.items())
+
+    # Fila grande: todos os nos do nivel mais largo como raizes
+    by_level = {}
+    for n, lvl in new_level.items():
+        by_level.setdefault(lvl, []).append(n)
+    roots = max(by_level.values(), key=len)
+    old_wide, old_level = timed(legacy_levels, adj, roots, group)
+    new_wide, new_level = timed(graph_kernel.bfs_levels, adj, roots, group)
+    same = same and list(old_level.items()) == list(new_level.items())
+
+    return {
+        'nodes': len(nodes), 'edges': edges, 'same': same,
+        'cc': (old_cc, new_cc), 'bfs': (old_bfs, new_bfs), 'wide': (old_wide, new_wide),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das travessias do layout')
+    parser.add_argument('--bits', type=int, nargs='+', default=[16, 64, 256, 416],
+                        help='Tamanhos dos somadores sinteticos (bits, multiplos de 4)')
+    args = parser.parse_args()
+
+    print(f"{'bits':>5} {'nos':>6} {'arestas':>8} | {'componentes (ms)':>17} | "
+          f"{'BFS (ms)':>15} | {'BFS fila larga (ms)':>19} | ok")
+    print(f"{'':>5} {'':>6} {'':>8} | {'antigo':>8} {'kernel':>8} | {'antigo':>7} {'kernel':>7} | "
+          f"{'antigo':>9} {'kernel':>9} |")
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for bits in args.bits:
+            path = os.path.join(tmp, f"somador{bits}.cir")
+            synthetic_netlists.write_lines(path, synthetic_netlists.iter_ripple_adder_lines(bits))
+            components, _ = spice_to_schematic.parse_spice_file(path)
+            components = spice_to_schematic.ComponentTable.from_components(components).with_sorted_nodes()
+            r = bench(components)
+            failed = failed or not r['same']
+            print(f"{bits:>5} {r['nodes']:>6} {r['edges']:>8} | "
+                  f"{r['cc'][0] * 1e3:>8.2f} {r['cc'][1] * 1e3:>8.2f} | "
+                  f"{r['bfs'][0] * 1e3:>7.2f} {r['bfs'][1] * 1e3:>7.2f} | "
+                  f"{r['wide'][0] * 1e3:>9.2f} {r['wide'][1] * 1e3:>9.2f} | "
+                  f"{'sim' if r['same'] else 'NAO'}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
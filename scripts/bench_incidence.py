@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+bench_incidence.py - Custo das varreduras de componentes no layout generico
+
+Compara as varreduras originais de _circuitikz_generic (copias abaixo: cada
+grupo varre todos os componentes para achar os seus, a fonte de referencia e
+os nos de alimentacao) com o IncidenceIndex, construido uma vez por
+esquematico:
+  - tempo das varreduras antigas x construcao do indice + consultas;
+  - fatia do tempo total do layout gasta nelas (antes x depois);
+  - resultados conferidos (mesmos componentes, na mesma ordem, e mesma
+    referencia por grupo).
+
+Os circuitos sao arranjos de N amplificadores independentes
+(synthetic_netlists.py amps): N grupos, entao a varredura antiga e O(N^2).
+
+Uso:
+    python scripts/bench_incidence.py
+    python scripts/bench_incidence.py --stages 50 300 --profile
+"""
+
+import sys
+import os
+import time
+import argparse
+import cProfile
+import pstats
+import tempfile
+
+import spice_to_schematic
+import synthetic_netlists
+import graph_kernel
+from spice_to_schematic import GROUND_ID, IncidenceIndex
+
+LAYOUT_BIPOLES = {'R', 'C', 'L', 'V', 'I', 'D'}
+
+
+def legacy_scans(components, groups):
+    """Varreduras originais: uma passada por todos os componentes por grupo."""
+    result = []
+    for group in groups:
+        group_components = [
+            comp for comp in components
+            if any(n in group for n in comp.node_ids)
+        ]
+        ref = None
+        for comp in components:
+            if comp.comp_type not in ('V', 'I') or len(comp.node_ids) < 2:
+                continue
+            n1 = comp.node_ids[0]
+            n2 = comp.node_ids[1]
+            if n1 in group and n2 == GROUND_ID:
+                ref = n1
+                break
+            if n2 in group and n1 == GROUND_ID:
+                ref = n2
+                break
+        result.append(([c.index for c in group_components], ref))
+    return result
+
+
+def index_scans(components, groups):
+    """Mesmas consultas lidas do IncidenceIndex (inclui a construcao)."""
+    incidence = IncidenceIndex(components, LAYOUT_BIPOLES)
+    return [
+        ([c.index for c in incidence.group_components(group)], incidence.ground_source(group))
+        for group in groups
+    ]
+
+
+def timed(func, *args, repeat=3):
+    """Menor tempo (s) de repeat execucoes e o ultimo resultado."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench(components, title):
+    adj = spice_to_schematic._layout_adjacency(components, LAYOUT_BIPOLES)
+    groups = graph_kernel.connected_components(adj, sorted(adj))
+    old_scan, old_result = timed(legacy_scans, components, groups)
+    new_scan, new_result = timed(index_scans, components, groups)
+    layout, _ = timed(spice_to_schematic._circuitikz_generic, components, title, repeat=1)
+    # Layout antigo estimado: o atual com as consultas do indice trocadas pelas varreduras
+    old_layout = layout - new_scan + old_scan
+    return {
+        'groups': len(groups), 'same': old_result == new_result,
+        'scan': (old_scan, new_scan), 'layout': (old_layout, layout),
+    }
+
+
+def profile_layout(components, title, limit):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    spice_to_schematic._circuitikz_generic(components, title)
+    profiler.disable()
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do indice de incidencia do layout')
+    parser.add_argument('--stages', type=int, nargs='+', default=[50, 100, 300],
+                        help='Numero de amplificadores independentes por circuito')
+    parser.add_argument('--profile', action='store_true',
+                        help='Mostra o cProfile do layout do maior circuito')
+    parser.add_argument('--limit', type=int, default=15,
+                        help='Linhas do cProfile (com --profile)')
+    args = parser.parse_args()
+
+    print(f"{'estagios':>8} {'comps':>6} {'grupos':>6} | {'varreduras (ms)':>17} | "
+          f"{'layout (ms)':>17} | {'fatia no layout':>15} | ok")
+    print(f"{'':>8} {'':>6} {'':>6} | {'antigo':>8} {'indice':>8} | {'antigo':>8} {'atual':>8} | "
+          f"{'antigo':>7} {'atual':>7} |")
+    failed = False
+    last = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for stages in args.stages:
+            path = os.path.join(tmp, f"amps{stages}.cir")
+            synthetic_netlists.write_lines(path, synthetic_netlists.iter_amplifier_array_lines(stages))
+            components, title = spice_to_schematic.parse_spice_file(path)
+            components = spice_to_schematic.ComponentTable.from_components(components).with_sorted_nodes()
+            r = bench(components, title)
+            failed = failed or not r['same']
+            old_share = 100.0 * r['scan'][0] / r['layout'][0]
+            new_share = 100.0 * r['scan'][1] / r['layout'][1]
+            print(f"{stages:>8} {len(components):>6} {r['groups']:>6} | "
+                  f"{r['scan'][0] * 1e3:>8.1f} {r['scan'][1] * 1e3:>8.1f} | "
+                  f"{r['layout'][0] * 1e3:>8.1f} {r['layout'][1] * 1e3:>8.1f} | "
+                  f"{old_share:>6.1f}% {new_share:>6.1f}% | "
+                  f"{'sim' if r['same'] else 'NAO'}")
+            last = (components, title)
+    if args.profile and last:
+        profile_layout(*last, args.limit)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
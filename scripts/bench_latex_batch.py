@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+bench_latex_batch.py - Compara o render circuitikz por arquivo com o render em lote
+
+Gera os corpos circuitikz de todos os circuitos (parse + layout, sem LaTeX)
+e mede o tempo total de:
+  - por arquivo: um pdflatex + pdftocairo por circuito (render_circuitikz)
+  - em lote: um unico pdflatex com uma pagina por circuito (render_circuitikz_batch)
+  - com --latex-format: os dois modos acima tambem com o formato
+    pre-compilado (ensure_latex_format)
+
+Uso:
+    python scripts/bench_latex_batch.py
+    python scripts/bench_latex_batch.py circuits/02_filtros --limit 10
+
+Requer pdflatex (com circuitikz) e pdftocairo no PATH. Os arquivos
+temporarios e PNGs ficam em um diretorio temporario, removido no final.
+"""
+
+import sys
+import os
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import spice_to_schematic
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+
+
+def collect_bodies(search_path, limit=None):
+    """Retorna [(nome, tex_body)] dos circuitos encontrados em search_path."""
+    bodies = []
+    for path in sorted(spice_to_schematic.find_spice_files(search_path)):
+        components, title = spice_to_schematic.parse_spice_file(path)
+        tex_body = spice_to_schematic.circuitikz_body(components, title or os.path.basename(path))
+        if tex_body:
+            bodies.append((os.path.relpath(path, REPO_ROOT), tex_body))
+        if limit and len(bodies) >= limit:
+            break
+    return bodies
+
+
+def bench_per_file(bodies, out_dir, latex_format=None):
+    start = time.perf_counter()
+    ok = 0
+    for idx, (_, tex_body) in enumerate(bodies):
+        if spice_to_schematic.render_circuitikz(tex_body, out_dir / f"{idx}.png", latex_format):
+            ok += 1
+    return time.perf_counter() - start, ok
+
+
+def bench_batch(bodies, out_dir, latex_format=None):
+    entries = [(tex_body, out_dir / f"{idx}.png") for idx, (_, tex_body) in enumerate(bodies)]
+    start = time.perf_counter()
+    rendered = spice_to_schematic.render_circuitikz_batch(entries, latex_format)
+    elapsed = time.perf_counter() - start
+    failed = [bodies[idx][0] for idx, path in enumerate(rendered) if not path]
+    return elapsed, len(bodies) - len(failed), failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do render LaTeX em lote')
+    parser.add_argument('input', nargs='?', default=os.path.join(REPO_ROOT, 'circuits'),
+                        help='Arquivo ou diretorio SPICE (padrao: circuits/)')
+    parser.add_argument('--limit', type=int, help='Usar apenas os N primeiros circuitos')
+    parser.add_argument('--latex-format', action='store_true',
+                        help='Medir tambem com o formato pre-compilado')
+    args = parser.parse_args()
+
+    missing = [tool for tool in ('pdflatex', 'pdftocairo') if not shutil.which(tool)]
+    if missing:
+        print(f"Ferramentas ausentes: {', '.join(missing)}")
+        return 1
+
+    bodies = collect_bodies(args.input, args.limit)
+    if not bodies:
+        print(f"Nenhum circuito encontrado em: {args.input}")
+        return 1
+
+    latex_format = None
+    if args.latex_format:
+        latex_format = spice_to_schematic.ensure_latex_format()
+        if latex_format is None:
+            print("Aviso: formato pre-compilado indisponivel (mylatexformat?)")
+
+    formats = [('', None)]
+    if latex_format:
+        formats.append((' +fmt', latex_format))
+
+    rows = []
+    failed = []
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_latex_"))
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        for suffix, fmt in formats:
+            single_dir = work_dir / f"single{suffix.strip()}"
+            batch_dir = work_dir / f"batch{suffix.strip()}"
+            single_dir.mkdir()
+            batch_dir.mkdir()
+            single_time, single_ok = bench_per_file(bodies, single_dir, fmt)
+            rows.append((f"por arquivo{suffix}", single_ok, single_time))
+            batch_time, batch_ok, batch_failed = bench_batch(bodies, batch_dir, fmt)
+            rows.append((f"lote{suffix}", batch_ok, batch_time))
+            failed.extend(batch_failed)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    n = len(bodies)
+    baseline = rows[0][2]
+    print(f"Circuitos: {n}")
+    print("-" * 68)
+    print(f"{'modo':>17} {'ok':>5} {'total (s)':>11} {'por circuito (ms)':>19} {'aceleracao':>11}")
+    for label, ok, elapsed in rows:
+        speedup = baseline / elapsed if elapsed > 0 else float('inf')
+        print(f"{label:>17} {ok:>5} {elapsed:>11.2f} {elapsed / n * 1e3:>19.1f} {speedup:>10.1f}x")
+    for name in sorted(set(failed)):
+        print(f"  falha no lote: {name}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
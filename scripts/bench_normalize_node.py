@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+bench_normalize_node.py - Micro-benchmark do custo de normalize_node
+
+Mede quantas vezes normalize_node e chamado, e quanto tempo ele consome,
+ao parsear e gerar o layout circuitikz (sem LaTeX) dos maiores circuitos
+em circuits/. Compara o codigo atual (NodeTable + cache LRU) com uma
+revisao anterior do script, carregada direto do git.
+
+Uso:
+    python scripts/bench_normalize_node.py
+    python scripts/bench_normalize_node.py --top 10 --baseline-rev <commit>
+
+Por padrao a revisao de referencia e o primeiro commit do repositorio.
+"""
+
+import sys
+import os
+import time
+import types
+import argparse
+import subprocess
+
+import spice_to_schematic
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+
+
+def load_revision(rev):
+    """Carrega spice_to_schematic.py de uma revisao git como modulo."""
+    source = subprocess.run(
+        ['git', 'show', f'{rev}:scripts/spice_to_schematic.py'],
+        cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True, check=True,
+    ).stdout
+    module = types.ModuleType(f"spice_to_schematic_{rev[:8]}")
+    module.__file__ = os.path.join(SCRIPT_DIR, 'spice_to_schematic.py')
+    exec(compile(source, module.__file__, 'exec'), module.__dict__)
+    return module
+
+
+def root_revision():
+    out = subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'],
+                         cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True, check=True).stdout
+    return out.split()[0]
+
+
+def instrument(module):
+    """Envolve module.normalize_node e retorna o dicionario de contadores."""
+    stats = {'calls': 0, 'seconds': 0.0}
+    original = module.normalize_node
+    clock = time.perf_counter
+
+    def counted(node):
+        start = clock()
+        result = original(node)
+        stats['seconds'] += clock() - start
+        stats['calls'] += 1
+        return result
+
+    module.normalize_node = counted
+    return stats, original
+
+
+def run_pipeline(module, path):
+    components, title = module.parse_spice_file(path)
+    if components:
+        module._circuitikz_generic(components, title)
+    return len(components)
+
+
+def measure(module, paths):
+    cached = getattr(module, '_normalize_node_cached', None)
+    if cached is not None:
+        cached.cache_clear()
+    stats, original = instrument(module)
+    start = time.perf_counter()
+    try:
+        for path in paths:
+            run_pipeline(module, path)
+    finally:
+        module.normalize_node = original
+    stats['total'] = time.perf_counter() - start
+    return stats
+
+
+def biggest_circuits(top):
+    sizes = []
+    for path in spice_to_schematic.find_spice_files(os.path.join(REPO_ROOT, 'circuits')):
+        components, _ = spice_to_schematic.parse_spice_file(path)
+        sizes.append((len(components), path))
+    sizes.sort(reverse=True)
+    return sizes[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark de normalize_node')
+    parser.add_argument('--top', type=int, default=8, help='Quantos circuitos (maiores primeiro)')
+    parser.add_argument('--baseline-rev', help='Revisao git de referencia (padrao: primeiro commit)')
+    parser.add_argument('--repeat', type=int, default=5, help='Repeticoes (melhor tempo)')
+    args = parser.parse_args()
+
+    rev = args.baseline_rev or root_revision()
+    baseline = load_revision(rev)
+    circuits = biggest_circuits(args.top)
+    paths = [path for _, path in circuits]
+
+    print("Circuitos:")
+    for count, path in circuits:
+        print(f"  {count:5d} componentes  {os.path.relpath(path, REPO_ROOT)}")
+    print("-" * 64)
+    print(f"{'versao':>12} {'chamadas':>10} {'normalize (ms)':>15} {'pipeline (ms)':>14}")
+    for label, module in ((rev[:10], baseline), ('atual', spice_to_schematic)):
+        best = None
+        for _ in range(args.repeat):
+            stats = measure(module, paths)
+            if best is None or stats['seconds'] < best['seconds']:
+                best = stats
+        print(f"{label:>12} {best['calls']:>10} {best['seconds'] * 1e3:>15.2f} {best['total'] * 1e3:>14.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+bench_rawfile.py - rawfile binario (rawfile.py) x texto do wrdata (wrdata.py)
+
+Grava os mesmos dados sinteticos de um .tran (tempo + N vetores) nos dois
+formatos e compara:
+  - tempo para abrir o arquivo e para ler todos os vetores (tocar todas
+    as paginas do memmap);
+  - pico de memoria alocada (tracemalloc) e tamanho em disco;
+  - resultados conferidos (mesmos valores), e casos de borda do leitor:
+    plot complexo (AC), varios plots no mesmo arquivo (.op + .tran + .ac)
+    e arquivo truncado no meio dos dados.
+
+Os rawfiles seguem o formato que o ngspice grava com `write` (ou -r):
+cabecalho de texto e pontos em float64/complex128 little-endian.
+
+Uso:
+    python scripts/bench_rawfile.py
+    python scripts/bench_rawfile.py --rows 100000 1000000 --vectors 4
+"""
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from rawfile import read_rawfile
+from wrdata import load_wrdata
+
+PLOT_TYPES = {'time': 'time', 'frequency': 'frequency'}
+
+
+def write_rawfile(path, plots, title='bench_rawfile'):
+    """Grava plots [(plotname, nomes, dados 2D)] no formato binario do ngspice."""
+    with open(path, 'wb') as f:
+        for plotname, names, data in plots:
+            flags = 'complex' if np.iscomplexobj(data) else 'real'
+            lines = [
+                f"Title: {title}",
+                "Date: Thu Jan  1 00:00:00  1970",
+                f"Plotname: {plotname}",
+                f"Flags: {flags}",
+                f"No. Variables: {len(names)}",
+                f"No. Points: {len(data)}",
+                "Variables:",
+            ]
+            for i, name in enumerate(names):
+                vtype = PLOT_TYPES.get(name, 'current' if name.startswith('i(') else 'voltage')
+                lines.append(f"\t{i}\t{name}\t{vtype}")
+            lines.append("Binary:")
+            f.write(('\n'.join(lines) + '\n').encode())
+            f.write(np.ascontiguousarray(data, dtype='<c16' if flags == 'complex' else '<f8').tobytes())
+
+
+def synthetic_tran(rows, vectors, seed=0):
+    rng = np.random.default_rng(seed)
+    data = np.empty((rows, vectors + 1))
+    data[:, 0] = np.linspace(0.0, 1e-3, rows)
+    data[:, 1:] = rng.normal(0.0, 1.0, (rows, vectors))
+    names = ['time'] + [f'v(n{i})' for i in range(vectors)]
+    return names, data
+
+
+def check_edge_cases(tmp):
+    """Casos de borda do leitor; retorna a lista de falhas."""
+    failed = []
+    names, tran = synthetic_tran(1000, 3)
+    freq = np.logspace(0, 6, 61)
+    ac = np.empty((61, 2), dtype=np.complex128)
+    ac[:, 0] = freq
+    ac[:, 1] = 1 / (1 + 1j * freq / 1e3)
+    op = np.array([[1.5, 2.5e-3]])
+
+    path = os.path.join(tmp, 'multi.raw')
+    write_rawfile(path, [('Operating Point', ['v(out)', 'i(v1)'], op),
+                         ('Transient Analysis', names, tran),
+                         ('AC Analysis', ['frequency', 'v(out)'], ac)])
+    plots = read_rawfile(path)
+    if [p.plotname for p in plots] != ['Operating Point', 'Transient Analysis', 'AC Analysis']:
+        failed.append('varios plots: nomes')
+    else:
+        if not np.array_equal(plots[0].data, op):
+            failed.append('varios plots: .op')
+        if not np.array_equal(plots[1].data, tran) or not np.array_equal(plots[1]['V(N1)'], tran[:, 2]):
+            failed.append('varios plots: .tran')
+        if not plots[2].is_complex or not np.array_equal(plots[2]['v(out)'], ac[:, 1]):
+            failed.append('varios plots: .ac complexo')
+        if plots[1].data.base is None or plots[1].data.flags.writeable:
+            failed.append('memmap somente leitura')
+
+    # Truncado no meio de um ponto: ficam so os pontos completos
+    truncated = os.path.join(tmp, 'truncated.raw')
+    write_rawfile(truncated, [('Transient Analysis', names, tran)])
+    with open(truncated, 'r+b') as f:
+        f.truncate(os.path.getsize(truncated) - 500 * tran.shape[1] * 8 - 3)
+    plots = read_rawfile(truncated)
+    if plots[0].points != 499 or not np.array_equal(plots[0].data, tran[:499]):
+        failed.append('truncado')
+    return failed
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def raw_open(path):
+    return read_rawfile(path)[0]
+
+
+def raw_all(path):
+    plot = read_rawfile(path)[0]
+    return [float(plot[name].sum()) for name in plot.names]
+
+
+def text_all(path):
+    header, data = load_wrdata(path)
+    return [float(data[:, i].sum()) for i in range(data.shape[1])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do leitor de rawfiles binarios')
+    parser.add_argument('--rows', type=int, nargs='+', default=[15000, 200000, 1000000],
+                        help='Pontos do .tran sintetico')
+    parser.add_argument('--vectors', type=int, default=4, help='Vetores alem do tempo')
+    parser.add_argument('--repeat', type=int, default=3, help='Execucoes por medida (vale a menor)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        edge = check_edge_cases(tmp)
+        print(f"Casos de borda: {'ok' if not edge else 'FALHOU'}")
+        for name in edge:
+            print(f"  FALHOU: {name}")
+        failed = bool(edge)
+
+        print(f"\n{'pontos':>8} | {'disco (MB)':>15} | {'abrir (ms)':>17} | {'ler tudo (ms)':>17} | "
+              f"{'pico (MB)':>15} | ok")
+        print(f"{'':>8} | {'texto':>7} {'raw':>7} | {'texto':>8} {'raw':>8} | {'texto':>8} {'raw':>8} | "
+              f"{'texto':>7} {'raw':>7} |")
+        for rows in args.rows:
+            names, data = synthetic_tran(rows, args.vectors)
+            raw_path = os.path.join(tmp, f"tran{rows}.raw")
+            csv_path = os.path.join(tmp, f"tran{rows}.csv")
+            write_rawfile(raw_path, [('Transient Analysis', names, data)])
+            # wrdata: (tempo, vetor) por vetor, como o ngspice sem wr_singlescale
+            wr = np.empty((rows, 2 * args.vectors))
+            wr[:, 0::2] = data[:, :1]
+            wr[:, 1::2] = data[:, 1:]
+            np.savetxt(csv_path, wr, fmt=' %.8e ', delimiter='')
+
+            plot = raw_open(raw_path)
+            _, text = load_wrdata(csv_path)
+            same = (np.array_equal(plot.data, data)
+                    and np.allclose(text[:, 1::2], plot.data[:, 1:], rtol=1e-8, atol=0))
+            failed = failed or not same
+
+            text_open = best_time(lambda: load_wrdata(csv_path), args.repeat)
+            raw_open_t = best_time(lambda: raw_open(raw_path), args.repeat)
+            text_read = best_time(lambda: text_all(csv_path), args.repeat)
+            raw_read = best_time(lambda: raw_all(raw_path), args.repeat)
+            text_peak = peak_memory(lambda: load_wrdata(csv_path)) / 1e6
+            raw_peak = peak_memory(lambda: raw_all(raw_path)) / 1e6
+            print(f"{rows:>8} | {os.path.getsize(csv_path) / 1e6:>7.1f} {os.path.getsize(raw_path) / 1e6:>7.1f} | "
+                  f"{text_open * 1e3:>8.1f} {raw_open_t * 1e3:>8.2f} | "
+                  f"{text_read * 1e3:>8.1f} {raw_read * 1e3:>8.1f} | "
+                  f"{text_peak:>7.1f} {raw_peak:>7.1f} | {'sim' if same else 'NAO'}")
+            os.remove(raw_path)
+            os.remove(csv_path)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+bench_routing.py - Benchmark dos testes de colisao do roteamento
+
+Compara, dentro de _circuitikz_generic, a varredura linear original
+(LinearRouteIndex, abaixo), o indice espacial (route_index.RouteIndex) e o
+indice espacial com as dobras conhecidas pontuadas em lote pelo
+ArrayRouteIndex (NumPy):
+  - somadores ripple-carry CMOS sinteticos de tamanho crescente
+    (synthetic_netlists.py), medindo o tempo gasto em bend_score,
+    bend_scores e bend_hits_node e o tempo total de layout;
+  - com --check, todos os circuitos de circuits/, exigindo corpos
+    circuitikz identicos nas tres versoes.
+
+Uso:
+    python scripts/bench_routing.py
+    python scripts/bench_routing.py --bits 4 8 16 32 64 --check
+"""
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+from collections import defaultdict
+
+import spice_to_schematic
+import synthetic_netlists
+from route_index import RouteIndex, ArrayRouteIndex, HAVE_NUMPY
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+
+
+class LinearRouteIndex:
+    """Varredura linear original de _circuitikz_generic (referencia)."""
+
+    def __init__(self, route_grid, node_positions, component_segments, bus_segments):
+        self.route_grid = route_grid
+        self.node_positions = node_positions
+        self.component_segments = component_segments
+        self.bus_segments = bus_segments
+
+    def segment_hits_nodes(self, x1, y1, x2, y2, ignore):
+        hits = 0
+        if x1 == x2:
+            ymin, ymax = sorted([y1, y2])
+            for node, (nx, ny) in self.node_positions.items():
+                if node in ignore:
+                    continue
+                if abs(nx - x1) < 0.01 and ymin < ny < ymax:
+                    hits += 1
+        elif y1 == y2:
+            xmin, xmax = sorted([x1, x2])
+            for node, (nx, ny) in self.node_positions.items():
+                if node in ignore:
+                    continue
+                if abs(ny - y1) < 0.01 and xmin < nx < xmax:
+                    hits += 1
+        return hits
+
+    def segment_hits_components(self, x1, y1, x2, y2, ignore_comps=frozenset()):
+        hits = 0
+        route_grid = self.route_grid
+        if abs(x1 - x2) < 0.01 and abs(y1 - y2) < 0.01:
+            return hits
+        for cx1, cy1, cx2, cy2, cname in self.component_segments:
+            if cname in ignore_comps:
+                continue
+            if abs(x1 - x2) < 0.1:
+                y_seg_min, y_seg_max = sorted([y1, y2])
+                if abs(cy1 - cy2) < 0.1:
+                    x_comp_min, x_comp_max = sorted([cx1, cx2])
+                    if (x_comp_min - route_grid) < x1 < (x_comp_max + route_grid):
+                        if (y_seg_min - route_grid) < cy1 < (y_seg_max + route_grid):
+                            hits += 10
+            elif abs(y1 - y2) < 0.1:
+                x_seg_min, x_seg_max = sorted([x1, x2])
+                if abs(cx1 - cx2) < 0.1:
+                    y_comp_min, y_comp_max = sorted([cy1, cy2])
+                    if (y_comp_min - route_grid) < y1 < (y_comp_max + route_grid):
+                        if (x_seg_min - route_grid) < cx1 < (x_seg_max + route_grid):
+                            hits += 10
+        return hits
+
+    def segment_hits_bus(self, x1, y1, x2, y2):
+        hits = 0
+        if x1 == x2 and y1 == y2:
+            return hits
+        for bx1, by1, bx2, by2 in self.bus_segments:
+            if bx1 == bx2 and by1 == by2:
+                continue
+            if x1 == x2 and by1 == by2:
+                if min(bx1, bx2) < x1 < max(bx1, bx2) and min(y1, y2) < by1 < max(y1, y2):
+                    hits += 1
+            if y1 == y2 and bx1 == bx2:
+                if min(x1, x2) < bx1 < max(x1, x2) and min(by1, by2) < y1 < max(by1, by2):
+                    hits += 1
+        return hits
+
+    def bend_score(self, bx, by, x1, y1, x2, y2, ignore):
+        hits = self.segment_hits_nodes(x1, y1, bx, by, ignore)
+        hits += self.segment_hits_nodes(bx, by, x2, y2, ignore)
+        hits += self.segment_hits_bus(x1, y1, bx, by)
+        hits += self.segment_hits_bus(bx, by, x2, y2)
+        hits += self.segment_hits_components(x1, y1, bx, by)
+        hits += self.segment_hits_components(bx, by, x2, y2)
+        length = abs(x1 - bx) + abs(y1 - by) + abs(x2 - bx) + abs(y2 - by)
+        return hits, length
+
+    def bend_hits_node(self, bx, by, ignore):
+        for node, (nx, ny) in self.node_positions.items():
+            if node in ignore:
+                continue
+            if abs(nx - bx) < 0.01 and abs(ny - by) < 0.01:
+                return True
+        return False
+
+
+def timed(index_cls, stats):
+    """Subclasse de index_cls que acumula tempo de construcao e de consulta em stats."""
+    clock = time.perf_counter
+
+    class Timed(index_cls):
+        def __init__(self, *args):
+            start = clock()
+            super().__init__(*args)
+            stats['build'] += clock() - start
+            stats['elements'] += len(args[1]) + len(args[2]) + len(args[3])
+
+        def bend_score(self, *args):
+            start = clock()
+            result = super().bend_score(*args)
+            stats['query'] += clock() - start
+            stats['calls'] += 1
+            return result
+
+        def bend_scores(self, candidates):
+            start = clock()
+            result = super().bend_scores(candidates)
+            stats['query'] += clock() - start
+            stats['calls'] += len(candidates)
+            return result
+
+        def bend_hits_node(self, *args):
+            start = clock()
+            result = super().bend_hits_node(*args)
+            stats['query'] += clock() - start
+            stats['calls'] += 1
+            return result
+
+    return Timed
+
+
+def run_layout(index_cls, components, title, batch=False):
+    """Roda _circuitikz_generic com index_cls (e o lote NumPy se batch); retorna (corpo, stats)."""
+    stats = defaultdict(float)
+    original = (spice_to_schematic.RouteIndex, spice_to_schematic.ArrayRouteIndex,
+                spice_to_schematic.HAVE_NUMPY)
+    spice_to_schematic.RouteIndex = timed(index_cls, stats)
+    spice_to_schematic.ArrayRouteIndex = timed(ArrayRouteIndex, stats) if batch else None
+    spice_to_schematic.HAVE_NUMPY = batch
+    try:
+        start = time.perf_counter()
+        body = spice_to_schematic._circuitikz_generic(components, title)
+        stats['total'] = time.perf_counter() - start
+    finally:
+        (spice_to_schematic.RouteIndex, spice_to_schematic.ArrayRouteIndex,
+         spice_to_schematic.HAVE_NUMPY) = original
+    return body, stats
+
+
+def check_circuits():
+    """Compara os corpos das tres versoes em todos os circuitos; retorna quantos diferem."""
+    differing = 0
+    paths = sorted(spice_to_schematic.find_spice_files(os.path.join(REPO_ROOT, 'circuits')))
+    for path in paths:
+        components, title = spice_to_schematic.parse_spice_file(path)
+        if not components:
+            continue
+        linear, _ = run_layout(LinearRouteIndex, components, title)
+        indexed, _ = run_layout(RouteIndex, components, title)
+        batched = run_layout(RouteIndex, components, title, batch=True)[0] if HAVE_NUMPY else linear
+        if not linear == indexed == batched:
+            differing += 1
+            print(f"  DIFERENTE: {os.path.relpath(path, REPO_ROOT)}")
+    print(f"Circuitos verificados: {len(paths)}, diferentes: {differing}")
+    return differing
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do indice espacial de roteamento')
+    parser.add_argument('--bits', type=int, nargs='+', default=[4, 8, 16, 32, 64],
+                        help='Tamanhos dos somadores sinteticos (bits)')
+    parser.add_argument('--check', action='store_true',
+                        help='Verificar corpos identicos em todos os circuitos de circuits/')
+    args = parser.parse_args()
+
+    if args.check and check_circuits():
+        return 1
+
+    print(f"{'bits':>5} {'comps':>6} {'elem':>6} {'consultas':>10} {'linear (ms)':>12} "
+          f"{'indice (ms)':>12} {'lote (ms)':>10} {'us/consulta':>12} {'layout (ms)':>12} "
+          f"{'c/ lote (ms)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for bits in args.bits:
+            path = os.path.join(tmp, f"somador{bits}.cir")
+            synthetic_netlists.write_lines(path, synthetic_netlists.iter_ripple_adder_lines(bits))
+            components, title = spice_to_schematic.parse_spice_file(path)
+            linear_body, linear = run_layout(LinearRouteIndex, components, title)
+            body, indexed = run_layout(RouteIndex, components, title)
+            batch_body, batched = run_layout(RouteIndex, components, title, batch=HAVE_NUMPY)
+            if not body == linear_body == batch_body:
+                print(f"  ERRO: corpo diferente para {bits} bits")
+                return 1
+            linear_ms = (linear['build'] + linear['query']) * 1e3
+            indexed_ms = (indexed['build'] + indexed['query']) * 1e3
+            batched_ms = (batched['build'] + batched['query']) * 1e3
+            per_query = indexed['query'] / indexed['calls'] * 1e6 if indexed['calls'] else 0.0
+            print(f"{bits:>5} {len(components):>6} {int(indexed['elements']):>6} "
+                  f"{int(indexed['calls']):>10} {linear_ms:>12.1f} {indexed_ms:>12.1f} "
+                  f"{batched_ms:>10.1f} {per_query:>12.2f} {indexed['total'] * 1e3:>12.1f} "
+                  f"{batched['total'] * 1e3:>13.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+bench_schematic.py - Benchmark de ponta a ponta do spice_to_schematic.py (sem LaTeX)
+
+Roda parse + layout + emissao do TeX (para antes do pdflatex) e mede cada
+fase com span_timer (mesmas fases do --profile) em:
+  - todos os netlists de circuits/;
+  - netlists sinteticos parametricos (synthetic_netlists.py): escadas
+    R-2R, osciladores em anel de N estagios, somadores CMOS de N bits e
+    arranjos de amp-ops em nivel de transistor.
+Caches de parse, layout, render e de bibliotecas ficam de fora. Cada caso
+roda --repeat vezes e vale a execucao de menor tempo total.
+
+Os resultados saem em JSON (-o), com chaves ordenadas, para guardar como
+base e comparar depois (--baseline): tempo por fase, contadores
+(cruzamentos, fios, ...) e o hash do TeX gerado, que acusa mudancas de
+layout. Com --baseline, casos mais lentos que --threshold (e acima de
+--min-ms) contam como regressao e o script sai com codigo 1.
+
+Uso:
+    python scripts/bench_schematic.py -o bench.json
+    python scripts/bench_schematic.py --baseline bench.json
+    python scripts/bench_schematic.py --quick --only ring adder
+"""
+
+import sys
+import os
+import json
+import time
+import hashlib
+import platform
+import argparse
+import tempfile
+
+import spice_to_schematic
+import synthetic_netlists
+import span_timer
+from crossing_reduction import EFFORTS, DEFAULT_EFFORT
+from route_index import HAVE_NUMPY
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+RESULTS_VERSION = 1
+
+# familia -> (gerador, tamanhos padrao, tamanhos com --quick)
+SYNTHETIC = {
+    'ladder': (synthetic_netlists.iter_resistor_ladder_lines, [50, 500], [20]),
+    'ring': (synthetic_netlists.iter_ring_oscillator_lines, [11, 101], [5]),
+    'adder': (synthetic_netlists.iter_ripple_adder_lines, [4, 16, 64], [4]),
+    'opamps': (synthetic_netlists.iter_opamp_array_lines, [10, 50], [4]),
+}
+
+# Colunas da tabela: fase -> caminho do span (ver --profile)
+PHASES = {
+    'parse': 'total/parse',
+    'flatten': 'total/flatten',
+    'layout': 'total/layout',
+    'emit': 'total/layout/emit',
+    'route': 'total/layout/emit/route',
+}
+
+
+def corpus(args, tmp):
+    """Lista de (nome, familia, tamanho, caminho) dos casos selecionados."""
+    cases = []
+    if not args.only or 'circuits' in args.only:
+        root = os.path.join(REPO_ROOT, 'circuits')
+        for path in sorted(spice_to_schematic.find_spice_files(root)):
+            cases.append((os.path.relpath(path, REPO_ROOT), 'circuits', None, path))
+    for family, (generator, sizes, quick_sizes) in SYNTHETIC.items():
+        if args.only and family not in args.only:
+            continue
+        for size in (quick_sizes if args.quick else sizes):
+            path = os.path.join(tmp, f"{family}{size}.cir")
+            synthetic_netlists.write_lines(path, generator(size))
+            cases.append((f"synthetic/{family}{size}", family, size, path))
+    return cases
+
+
+def run_case(path, effort):
+    """Uma execucao: retorna (SpanTimer, corpo TeX, numero de componentes)."""
+    # Bibliotecas (.include/.lib) sao parseadas de novo em toda execucao
+    spice_to_schematic.clear_library_cache()
+    timer = span_timer.SpanTimer(path)
+    with span_timer.activate(timer), span_timer.span('total'):
+        netlist = spice_to_schematic.parse_spice_netlist(path)
+        title = netlist.title or os.path.basename(path)
+        body = spice_to_schematic.circuitikz_body(netlist.components, title, layout_effort=effort)
+    return timer, body, len(netlist.components)
+
+
+def measure(path, family, size, repeat, effort):
+    best = None
+    for _ in range(repeat):
+        timer, body, count = run_case(path, effort)
+        total = timer.totals['total'][1]
+        if best is None or total < best[0]:
+            best = (total, timer, body, count)
+    total, timer, body, count = best
+    summary = timer.summary()
+    body = body or ''
+    return {
+        'family': family,
+        'size': size,
+        'components': count,
+        'seconds': {
+            'total': total,
+            **{phase: summary['spans'].get(span_path, [0, 0.0])[1]
+               for phase, span_path in PHASES.items()},
+        },
+        'spans': {path: seconds for path, (calls, seconds) in summary['spans'].items()},
+        'counters': summary['counters'],
+        'tex_bytes': len(body),
+        'tex_sha256': hashlib.sha256(body.encode()).hexdigest(),
+    }
+
+
+def print_table(results):
+    print(f"{'caso':<62} {'comps':>6} " + ' '.join(f"{p:>8}" for p in ['total'] + list(PHASES)))
+    for name, case in results.items():
+        secs = case['seconds']
+        print(f"{name[-62:]:<62} {case['components']:>6} "
+              + ' '.join(f"{secs[p] * 1e3:>8.1f}" for p in ['total'] + list(PHASES)))
+
+
+def compare(results, baseline, threshold, min_ms, partial=False):
+    """Compara com a base; retorna o numero de regressoes de tempo.
+
+    partial: execucao com --only/--quick; casos da base fora dela nao sao
+    listados como ausentes, so contados.
+    """
+    regressions = 0
+    changed = 0
+    total_new = total_old = 0.0
+    print(f"\nComparacao com a base (limite {threshold:.2f}x, minimo {min_ms:.0f} ms):")
+    for name, case in results.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"  novo: {name}")
+            continue
+        new_s = case['seconds']['total']
+        old_s = old['seconds']['total']
+        total_new += new_s
+        total_old += old_s
+        notes = []
+        if old_s > 0 and new_s / old_s > threshold and (new_s - old_s) * 1e3 > min_ms:
+            regressions += 1
+            notes.append(f"REGRESSAO {old_s * 1e3:.1f} -> {new_s * 1e3:.1f} ms ({new_s / old_s:.2f}x)")
+        elif old_s > 0 and old_s / max(new_s, 1e-9) > threshold and (old_s - new_s) * 1e3 > min_ms:
+            notes.append(f"melhora {old_s * 1e3:.1f} -> {new_s * 1e3:.1f} ms ({old_s / max(new_s, 1e-9):.2f}x)")
+        if case['tex_sha256'] != old.get('tex_sha256'):
+            changed += 1
+            notes.append("TeX mudou")
+        for key in ('crossings_after', 'wires_routed'):
+            before = old.get('counters', {}).get(key)
+            after = case['counters'].get(key)
+            if before is not None and before != after:
+                notes.append(f"{key} {before} -> {after}")
+        if notes:
+            print(f"  {name}: {'; '.join(notes)}")
+    missing = [name for name in baseline if name not in results]
+    if partial and missing:
+        print(f"  {len(missing)} caso(s) da base fora desta execucao")
+    else:
+        for name in missing:
+            print(f"  ausente: {name}")
+    if total_old:
+        print(f"  total comum: {total_old * 1e3:.1f} -> {total_new * 1e3:.1f} ms "
+              f"({total_new / total_old:.2f}x), {regressions} regressao(oes), "
+              f"{changed} saida(s) TeX diferente(s)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do spice_to_schematic (sem LaTeX)')
+    parser.add_argument('-o', '--output', help='Gravar os resultados em JSON')
+    parser.add_argument('--baseline', help='JSON de uma execucao anterior para comparar')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='Razao de tempo a partir da qual um caso conta como regressao (padrao: 1.25)')
+    parser.add_argument('--min-ms', type=float, default=5.0,
+                        help='Diferenca minima em ms para contar regressao/melhora (padrao: 5)')
+    parser.add_argument('--repeat', type=int, default=3, help='Execucoes por caso (vale a menor)')
+    parser.add_argument('--quick', action='store_true', help='Tamanhos sinteticos pequenos')
+    parser.add_argument('--only', nargs='+', choices=['circuits'] + list(SYNTHETIC),
+                        help='Rodar so estes conjuntos')
+    parser.add_argument('--layout-effort', choices=EFFORTS, default=DEFAULT_EFFORT,
+                        help='Esforco da reducao de cruzamentos (padrao: normal)')
+    args = parser.parse_args()
+
+    results = {}
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, family, size, path in corpus(args, tmp):
+            results[name] = measure(path, family, size, max(1, args.repeat), args.layout_effort)
+    elapsed = time.perf_counter() - start
+    print_table(results)
+    print(f"{len(results)} caso(s) em {elapsed:.1f}s")
+
+    if args.output:
+        data = {
+            'version': RESULTS_VERSION,
+            'python': platform.python_version(),
+            'numpy': HAVE_NUMPY,
+            'repeat': args.repeat,
+            'layout_effort': args.layout_effort,
+            'cases': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+            f.write('\n')
+        print(f"Resultados: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('version') != RESULTS_VERSION:
+            print(f"Aviso: base com versao {baseline.get('version')} (atual {RESULTS_VERSION})")
+        if compare(results, baseline.get('cases', {}), args.threshold, args.min_ms,
+                   partial=bool(args.only or args.quick)):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+bench_spice_parser.py - Benchmark do parser de netlists SPICE
+
+Compara o parser em streaming de spice_to_schematic.parse_spice_file com
+o parser original (readlines + lista de linhas juntadas + segunda passada)
+em decks sinteticos de 10k, 100k e 1M de linhas.
+
+Uso:
+    python scripts/bench_spice_parser.py
+    python scripts/bench_spice_parser.py --sizes 10000 100000
+
+Cada medicao roda em um subprocesso separado para que o pico de RSS
+(ru_maxrss) reflita apenas o parser medido.
+"""
+
+import sys
+import os
+import re
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+from spice_to_schematic import (
+    SpiceComponent,
+    SubcircuitDefinition,
+    SubcircuitInstance,
+    expand_subcircuit,
+    parse_value,
+    parse_spice_file,
+    _strip_inline_comment,
+    _split_subckt_pins,
+    _split_subckt_instance,
+)
+from synthetic_netlists import write_flat_deck
+
+
+def legacy_parse_spice_file(filepath):
+    """Parser original (readlines + duas passadas), mantido como referencia."""
+    components = []
+    title = ""
+    current_subckt = None
+    subckt_defs = {}
+    instances = []
+    in_control = False
+
+    with open(filepath, 'r') as f:
+        lines = f.readlines()
+
+    if not lines:
+        return components, title
+
+    title = lines[0].strip()
+    if title.startswith('*'):
+        title = title[1:].strip()
+
+    # Juntar linhas continuadas (+)
+    joined_lines = []
+    current_line = ""
+
+    for line in lines[1:]:
+        line = line.rstrip()
+        if line.lstrip().startswith('+'):
+            cont = _strip_inline_comment(line.lstrip()[1:]).strip()
+            if not cont:
+                continue
+            if current_line:
+                current_line += ' ' + cont
+            else:
+                current_line = cont
+        else:
+            if current_line:
+                joined_lines.append(current_line)
+            cleaned = _strip_inline_comment(line)
+            if not cleaned or cleaned.lstrip().startswith('*'):
+                current_line = ""
+                continue
+            current_line = cleaned
+    if current_line:
+        joined_lines.append(current_line)
+
+    for line in joined_lines:
+        line = line.strip()
+
+        if not line or line.startswith('*'):
+            continue
+
+        if not line:
+            continue
+
+        line_upper = line.upper()
+
+        if line_upper.startswith('.CONTROL'):
+            in_control = True
+            continue
+        if line_upper.startswith('.ENDC'):
+            in_control = False
+            continue
+
+        if in_control:
+            continue
+
+        if line_upper.startswith('.SUBCKT'):
+            parts = line.split()
+            if len(parts) >= 2:
+                name = parts[1].upper()
+                pins = _split_subckt_pins(parts[2:])
+                subckt_defs[name] = SubcircuitDefinition(name, pins)
+                current_subckt = name
+            continue
+        if line_upper.startswith('.ENDS'):
+            current_subckt = None
+            continue
+
+        if line.startswith('.') or current_subckt is not None and line_upper.startswith('.ENDS'):
+            continue
+
+        parts = line.split()
+        if not parts:
+            continue
+
+        name = parts[0].upper()
+        comp_type = name[0]
+
+        target = components if current_subckt is None else subckt_defs[current_subckt].components
+
+        try:
+            if comp_type in ['R', 'C', 'L']:
+                nodes = [parts[1], parts[2]]
+                value = parse_value(parts[3]) if len(parts) > 3 else ""
+                target.append(SpiceComponent(name, comp_type, nodes, value))
+
+            elif comp_type == 'D':
+                nodes = [parts[1], parts[2]]
+                model = parts[3] if len(parts) > 3 else ""
+                target.append(SpiceComponent(name, 'D', nodes, model=model))
+
+            elif comp_type == 'Q':
+                if len(parts) >= 5:
+                    nodes = [parts[1], parts[2], parts[3]]  # C, B, E
+                    model = parts[4]
+                    target.append(SpiceComponent(name, 'Q', nodes, model=model))
+
+            elif comp_type == 'M':
+                if len(parts) >= 6:
+                    nodes = [parts[1], parts[2], parts[3], parts[4]]  # D, G, S, B
+                    model = parts[5]
+                    target.append(SpiceComponent(name, 'M', nodes, model=model))
+
+            elif comp_type == 'J':
+                if len(parts) >= 5:
+                    nodes = [parts[1], parts[2], parts[3]]  # D, G, S
+                    model = parts[4]
+                    target.append(SpiceComponent(name, 'J', nodes, model=model))
+
+            elif comp_type == 'V':
+                nodes = [parts[1], parts[2]]
+                value = ""
+                rest = ' '.join(parts[3:]).upper()
+                dc_match = re.search(r'DC\s+([^\s]+)', rest)
+                if dc_match:
+                    value = parse_value(dc_match.group(1))
+                elif len(parts) > 3 and parts[3].upper() not in ['AC', 'PULSE', 'SIN', 'PWL', 'EXP']:
+                    value = parse_value(parts[3])
+                target.append(SpiceComponent(name, 'V', nodes, value))
+
+            elif comp_type == 'I':
+                nodes = [parts[1], parts[2]]
+                value = ""
+                rest = ' '.join(parts[3:]).upper()
+                dc_match = re.search(r'DC\s+([^\s]+)', rest)
+                if dc_match:
+                    value = parse_value(dc_match.group(1))
+                elif len(parts) > 3 and parts[3].upper() not in ['AC', 'PULSE', 'SIN', 'PWL']:
+                    value = parse_value(parts[3])
+                target.append(SpiceComponent(name, 'I', nodes, value))
+
+            elif comp_type == 'X' and len(parts) >= 3:
+                node_list, subckt_name = _split_subckt_instance(parts[1:])
+                if not subckt_name:
+                    continue
+                inst = SubcircuitInstance(name, subckt_name.upper(), node_list)
+                if current_subckt:
+                    subckt_defs[current_subckt].instances.append(inst)
+                else:
+                    instances.append(inst)
+
+        except (IndexError, ValueError):
+            continue
+
+    for inst in instances:
+        components.extend(expand_subcircuit(inst, subckt_defs))
+
+    return components, title
+
+
+PARSERS = {
+    'legacy': legacy_parse_spice_file,
+    'streaming': parse_spice_file,
+}
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KiB, macOS em bytes
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def run_worker(parser_name, path):
+    """Executa um parser e imprime o resultado em JSON (modo subprocesso)."""
+    baseline_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    components, _ = PARSERS[parser_name](path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'elapsed': elapsed,
+        'components': len(components),
+        'peak_rss_mb': _peak_rss_mb(),
+        'baseline_rss_mb': baseline_rss,
+    }))
+
+
+def measure(parser_name, path):
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', parser_name, path]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do parser SPICE')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='Numero de linhas dos decks sinteticos')
+    parser.add_argument('--worker', nargs=2, metavar=('PARSER', 'FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return 0
+
+    print(f"{'linhas':>9} {'parser':>10} {'tempo (s)':>10} {'linhas/s':>12} "
+          f"{'RSS pico (MB)':>14} {'componentes':>12}")
+    print("-" * 72)
+    with tempfile.TemporaryDirectory(prefix="bench_parser_") as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"deck_{size}.cir")
+            n_lines = write_flat_deck(path, size)
+            for name in PARSERS:
+                res = measure(name, path)
+                rate = n_lines / res['elapsed'] if res['elapsed'] else float('inf')
+                print(f"{n_lines:>9} {name:>10} {res['elapsed']:>10.3f} {rate:>12,.0f} "
+                      f"{res['peak_rss_mb']:>14.1f} {res['components']:>12}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+bench_subckt_flatten.py - Benchmark do achatamento de subcircuitos
+
+Compara a expansao recursiva original (um novo passeio pela definicao a
+cada instancia X) com o SubcircuitFlattener baseado em templates, usando
+somadores ripple-carry hierarquicos de 4 a 256 bits.
+
+Uso:
+    python scripts/bench_subckt_flatten.py
+    python scripts/bench_subckt_flatten.py --bits 64 256
+"""
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+from spice_to_schematic import (
+    SpiceComponent,
+    SubcircuitFlattener,
+    SubcircuitInstance,
+    normalize_node,
+    parse_spice_netlist,
+)
+from synthetic_netlists import iter_ripple_adder_lines, write_lines
+
+
+def legacy_expand_subcircuit(instance, subckt_defs, depth=0):
+    """Expansao recursiva original, mantida como referencia."""
+    if depth > 8:
+        return []
+    subckt_key = instance.subckt.upper()
+    if subckt_key not in subckt_defs:
+        return []
+
+    sub = subckt_defs[subckt_key]
+    pin_map = {}
+    for pin, node in zip(sub.pins, instance.nodes):
+        pin_map[pin] = normalize_node(node)
+
+    flattened = []
+    prefix = instance.name
+
+    def map_node(n):
+        nn = normalize_node(n)
+        if nn == '0':
+            return '0'
+        if nn in pin_map:
+            return pin_map[nn]
+        return f"{prefix}_{nn}"
+
+    for comp in sub.components:
+        mapped = [map_node(n) for n in comp.nodes]
+        flattened.append(SpiceComponent(f"{prefix}_{comp.name}", comp.comp_type, mapped, comp.value, comp.model))
+
+    for inst in sub.instances:
+        mapped_nodes = [map_node(n) for n in inst.nodes]
+        flat = legacy_expand_subcircuit(SubcircuitInstance(f"{prefix}_{inst.name}", inst.subckt, mapped_nodes),
+                                        subckt_defs, depth + 1)
+        flattened.extend(flat)
+
+    return flattened
+
+
+def _best_of(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do achatamento de subcircuitos')
+    parser.add_argument('--bits', type=int, nargs='+', default=[4, 16, 64, 256],
+                        help='Larguras dos somadores sinteticos')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticoes (melhor tempo)')
+    args = parser.parse_args()
+
+    print(f"{'bits':>5} {'instancias':>11} {'componentes':>12} {'legado (ms)':>12} "
+          f"{'templates (ms)':>15} {'ganho':>7}")
+    print("-" * 68)
+    with tempfile.TemporaryDirectory(prefix="bench_flatten_") as tmp:
+        for bits in args.bits:
+            path = os.path.join(tmp, f"somador_{bits}.cir")
+            write_lines(path, iter_ripple_adder_lines(bits))
+            netlist = parse_spice_netlist(path)
+
+            def run_legacy():
+                flat = []
+                for inst in netlist.instances:
+                    flat.extend(legacy_expand_subcircuit(inst, netlist.subckt_defs))
+                return flat
+
+            def run_templates():
+                flattener = SubcircuitFlattener(netlist.subckt_defs)
+                return flattener, flattener.flatten(netlist.instances)
+
+            t_legacy, flat_legacy = _best_of(run_legacy, args.repeat)
+            t_new, (flattener, flat_new) = _best_of(run_templates, args.repeat)
+            if [repr(c) for c in flat_legacy] != [repr(c) for c in flat_new]:
+                print(f"  ERRO: resultado diferente para {bits} bits")
+                return 1
+            print(f"{bits:>5} {flattener.instance_count:>11} {flattener.component_count:>12} "
+                  f"{t_legacy * 1e3:>12.1f} {t_new * 1e3:>15.1f} {t_legacy / t_new:>6.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+bench_wrdata.py - Vazao e pico de memoria da leitura de arquivos wrdata
+
+Compara o parse_ngspice_csv original (copia abaixo: readlines, float() por
+token, lista de listas e np.array no fim) com wrdata.load_wrdata em
+arquivos sinteticos no formato do ngspice (tempo repetido antes de cada
+vetor, como o wrdata sem wr_singlescale):
+  - vazao em MB/s (melhor de --repeat execucoes, sem tracemalloc);
+  - pico de memoria alocada (tracemalloc, que tambem conta os buffers do
+    numpy), comparado com o tamanho do array final;
+  - resultados conferidos (mesmo cabecalho, mesmos valores) nos arquivos
+    do benchmark e em casos de borda (comentarios, linhas nao numericas,
+    cabecalho, arquivo sem dados);
+  - o mesmo com dedupe=True (copias do tempo descartadas na leitura),
+    conferido contra o resultado antigo sem as colunas repetidas.
+
+Uso:
+    python scripts/bench_wrdata.py
+    python scripts/bench_wrdata.py --rows 100000 1000000 --cols 8
+"""
+
+import re
+import sys
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from wrdata import load_wrdata
+
+EDGE_CASES = {
+    'cabecalho': "time v(out) i(v1)\n0 1 2\n1e-3 2.5 -3e-6\n",
+    'sem_cabecalho': " 0.0  1.0 \n 1.0  2.0 \n",
+    'comentarios': "t v\n# comentario\n* outro\n\n   \n1 2\n3 4 # fim\n5 6\n",
+    'nao_numerico': "1 2\nabc def\n3 4\n1_0 2\nnan inf\n",
+    'primeira_em_branco': "\n1 2\n3 4\n",
+    'cabecalho_comentario': "# cabecalho estranho\n1 2\n",
+    'uma_coluna': "x\n1\n2\n3\n",
+    'espacos_unicode': "1\x0c2\n3 4\n",
+    'so_cabecalho': "time v(out)\n",
+    'vazio': "",
+    'colunas_variando': "1 2\n3 4 5\n",
+}
+
+
+DEDUPE_CASES = {
+    'nomes_repetidos': "time v(a) time v(b)\n0 1 0 2\n1 3 1 4\n",
+    'gilbert': "".join(f" {t} {t} {t} {t * 2} {t} {t * 3}\n" for t in range(50)),
+    'rampa_diverge': "".join(f" {t} {t} {t if t < 40 else 0} {t}\n" for t in range(50)),
+    'dc_sweep_sem_cabecalho': "".join(f" {v} {v} {v} {v * 2}\n" for v in range(50)),
+    'sem_copias': "1 2\n3 4\n",
+    'dc_sweep': "v-sweep v(in) v(out) v-sweep_dup1\n" + "".join(f"{v} {v} {v * 2} {v}\n" for v in range(50)),
+}
+
+
+def legacy_parse(filepath):
+    """parse_ngspice_csv original."""
+    with open(filepath, 'r') as f:
+        lines = f.readlines()
+
+    if not lines:
+        raise ValueError(f"Arquivo vazio: {filepath}")
+
+    first_line = lines[0].strip()
+    has_header = False
+    header = []
+
+    try:
+        [float(x) for x in first_line.split()]
+    except ValueError:
+        has_header = True
+        header = first_line.split()
+
+    data_lines = lines[1:] if has_header else lines
+    data = []
+
+    for line in data_lines:
+        line = line.strip()
+        if not line or line.startswith('#') or line.startswith('*'):
+            continue
+        try:
+            values = [float(x) for x in line.split()]
+            if values:
+                data.append(values)
+        except ValueError:
+            continue
+
+    if not data:
+        raise ValueError(f"Nenhum dado numerico encontrado em: {filepath}")
+
+    data = np.array(data)
+
+    if not header:
+        header = [f'col_{i}' for i in range(data.shape[1])]
+
+    return header, data
+
+
+def legacy_dedupe(filepath):
+    """Resultado antigo sem as copias da escala (iguais no arquivo todo, com nome da escala ou em posicao de escala)."""
+    header, data = legacy_parse(filepath)
+    ncols = data.shape[1]
+    named = len(header) == ncols and not header[0].startswith('col_')
+    scale = header[0].lower()
+
+    def is_copy(j):
+        if not np.array_equal(data[:, j], data[:, 0]):
+            return False
+        if not named:
+            return ncols % 2 == 0 and j % 2 == 0
+        name = header[j].lower()
+        return name == scale or re.fullmatch(re.escape(scale) + r'_dup\d+', name)
+
+    keep = [j for j in range(ncols) if j == 0 or not is_copy(j)]
+    return [header[j] for j in keep], data[:, keep]
+
+
+def load_dedupe(filepath, **kwargs):
+    return load_wrdata(filepath, dedupe=True, **kwargs)
+
+
+def write_wrdata(path, rows, cols, seed=0):
+    """Arquivo no formato do wrdata: pares (tempo, vetor), sem cabecalho."""
+    rng = np.random.default_rng(seed)
+    time_col = np.linspace(0.0, 1e-3, rows)
+    data = np.empty((rows, cols))
+    for j in range(cols):
+        data[:, j] = time_col if j % 2 == 0 else rng.normal(0.0, 1.0, rows)
+    np.savetxt(path, data, fmt=' %.8e ', delimiter='')
+    return data
+
+
+def same_result(a, b):
+    """Compara (cabecalho, dados) ou a excecao de cada leitor."""
+    if isinstance(a, Exception) or isinstance(b, Exception):
+        return type(a) is type(b)
+    return a[0] == b[0] and a[1].shape == b[1].shape and np.array_equal(a[1], b[1], equal_nan=True)
+
+
+def run(func, path, **kwargs):
+    try:
+        return func(path, **kwargs)
+    except ValueError as e:
+        return e
+
+
+def check_edge_cases(tmp):
+    failed = []
+    for name, text in EDGE_CASES.items():
+        path = os.path.join(tmp, f"{name}.csv")
+        with open(path, 'w') as f:
+            f.write(text)
+        # Blocos pequenos tambem: forca fronteiras de bloco no meio do arquivo
+        for chunk in (1 << 20, 4):
+            if not same_result(run(legacy_parse, path), run(load_wrdata, path, chunk_bytes=chunk)):
+                failed.append(f"{name} (bloco {chunk})")
+    for name, text in DEDUPE_CASES.items():
+        path = os.path.join(tmp, f"dedupe_{name}.csv")
+        with open(path, 'w') as f:
+            f.write(text)
+        for chunk in (1 << 20, 64):
+            if not same_result(run(legacy_dedupe, path), run(load_dedupe, path, chunk_bytes=chunk)):
+                failed.append(f"dedupe_{name} (bloco {chunk})")
+    return failed
+
+
+def best_time(func, path, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(func, path):
+    tracemalloc.start()
+    result = func(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da leitura de arquivos wrdata')
+    parser.add_argument('--rows', type=int, nargs='+', default=[15000, 200000, 1000000],
+                        help='Numero de linhas dos arquivos sinteticos')
+    parser.add_argument('--cols', type=int, default=8,
+                        help='Colunas por linha (tempo + vetor em pares)')
+    parser.add_argument('--repeat', type=int, default=3, help='Execucoes por medida (vale a menor)')
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        edge = check_edge_cases(tmp)
+        total = len(EDGE_CASES) + len(DEDUPE_CASES)
+        print(f"Casos de borda: {total - len({e.split(' ')[0] for e in edge})}/{total} iguais")
+        for name in edge:
+            print(f"  DIFERENTE: {name}")
+        failed = bool(edge)
+
+        print(f"\n{'linhas':>8} {'MB':>7} | {'tempo (ms)':>26} | {'MB/s':>15} | "
+              f"{'pico de memoria (MB)':>26} | {'array (MB)':>13} | ok")
+        print(f"{'':>8} {'':>7} | {'antigo':>8} {'novo':>8} {'dedupe':>8} | {'antigo':>7} {'novo':>7} | "
+              f"{'antigo':>8} {'novo':>8} {'dedupe':>8} | {'todo':>6} {'dedupe':>6} |")
+        for rows in args.rows:
+            path = os.path.join(tmp, f"wrdata{rows}.csv")
+            write_wrdata(path, rows, args.cols)
+            size_mb = os.path.getsize(path) / 1e6
+            same = (same_result(legacy_parse(path), load_wrdata(path))
+                    and same_result(legacy_dedupe(path), load_dedupe(path)))
+            failed = failed or not same
+            old_t = best_time(legacy_parse, path, args.repeat)
+            new_t = best_time(load_wrdata, path, args.repeat)
+            dedupe_t = best_time(load_dedupe, path, args.repeat)
+            old_mem = peak_memory(legacy_parse, path) / 1e6
+            new_mem = peak_memory(load_wrdata, path) / 1e6
+            dedupe_mem = peak_memory(load_dedupe, path) / 1e6
+            array_mb = rows * args.cols * 8 / 1e6
+            dedupe_mb = rows * load_dedupe(path)[1].shape[1] * 8 / 1e6
+            print(f"{rows:>8} {size_mb:>7.1f} | {old_t * 1e3:>8.1f} {new_t * 1e3:>8.1f} {dedupe_t * 1e3:>8.1f} | "
+                  f"{size_mb / old_t:>7.1f} {size_mb / new_t:>7.1f} | "
+                  f"{old_mem:>8.1f} {new_mem:>8.1f} {dedupe_mem:>8.1f} | {array_mb:>6.1f} {dedupe_mb:>6.1f} | "
+                  f"{'sim' if same else 'NAO'}")
+            os.remove(path)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
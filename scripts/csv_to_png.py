@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
 """
-csv_to_png.py - Converte arquivos CSV gerados pelo ngspice em graficos PNG
+csv_to_png.py - Converte arquivos CSV (wrdata) e rawfiles (.raw) do ngspice em graficos PNG
 
 Uso:
-    python scripts/csv_to_png.py                    # processa todos os CSVs em circuits/
+    python scripts/csv_to_png.py                    # processa todos os CSVs/.raw em circuits/
     python scripts/csv_to_png.py arquivo.csv        # processa um arquivo especifico
-    python scripts/csv_to_png.py circuits/01_*/     # processa CSVs em um diretorio
+    python scripts/csv_to_png.py circuits/01_*/     # processa CSVs/.raw em um diretorio
+    python scripts/csv_to_png.py saida.raw          # rawfile binario (um PNG por plot)
 
 O script detecta automaticamente o tipo de dados (tempo, frequencia, tensao DC)
 e ajusta os eixos e escalas apropriadamente.
@@ -15,9 +16,13 @@ import sys
 import os
 import glob
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 import numpy as np
 
 try:
+    import matplotlib
     import matplotlib.pyplot as plt
     import matplotlib.ticker as ticker
 except ImportError:
@@ -25,8 +30,29 @@ except ImportError:
     print("Instale com: pip install matplotlib")
     sys.exit(1)
 
+from wrdata import load_wrdata, WaveformCache, DEFAULT_WAVEFORM_CACHE_DIR
+from rawfile import read_rawfile
+
+# Sufixo do PNG de cada plot de um rawfile, pela primeira palavra do Plotname
+RAW_PLOT_SUFFIXES = {
+    'transient': 'tran', 'ac': 'ac', 'dc': 'dc', 'noise': 'noise',
+    'spectrum': 'sp', 'pole-zero': 'pz', 'transfer': 'tf', 'distortion': 'disto',
+}
+
+_plotting_ready = False
+
 
-def parse_ngspice_csv(filepath):
+def setup_plotting():
+    """Backend Agg (so arquivos, sem janela) e estilo dos graficos, uma vez por processo."""
+    global _plotting_ready
+    if _plotting_ready:
+        return
+    matplotlib.use('Agg')
+    plt.style.use('seaborn-v0_8-whitegrid' if 'seaborn-v0_8-whitegrid' in plt.style.available else 'ggplot')
+    _plotting_ready = True
+
+
+def parse_ngspice_csv(filepath, dedupe=False):
     """
     Le arquivo CSV gerado pelo ngspice (wrdata).
 
@@ -35,52 +61,45 @@ def parse_ngspice_csv(filepath):
     - Dados separados por espacos ou tabs
     - Numeros podem estar em notacao cientifica
 
+    A leitura fica em wrdata.load_wrdata (tokenizador em C do numpy,
+    por blocos, com as mesmas regras de cabecalho e comentarios). Com
+    dedupe, as copias da variavel independente que o wrdata repete antes
+    de cada vetor sao descartadas na leitura.
+
     Retorna: (nomes_colunas, dados_numpy)
     """
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
+    return load_wrdata(filepath, dedupe=dedupe)
 
-    if not lines:
-        raise ValueError(f"Arquivo vazio: {filepath}")
 
-    # Detectar se primeira linha e cabecalho
-    first_line = lines[0].strip()
-    has_header = False
-    header = []
-
-    # Tentar parsear primeira linha como numeros
-    try:
-        [float(x) for x in first_line.split()]
-    except ValueError:
-        # Nao e numero, entao e cabecalho
-        has_header = True
-        header = first_line.split()
-
-    # Parsear dados
-    data_lines = lines[1:] if has_header else lines
-    data = []
-
-    for line in data_lines:
-        line = line.strip()
-        if not line or line.startswith('#') or line.startswith('*'):
-            continue
-        try:
-            values = [float(x) for x in line.split()]
-            if values:
-                data.append(values)
-        except ValueError:
-            continue
-
-    if not data:
-        raise ValueError(f"Nenhum dado numerico encontrado em: {filepath}")
-
-    data = np.array(data)
+def parse_ngspice_raw(filepath):
+    """
+    Le rawfile binario do ngspice (rawfile.read_rawfile).
 
-    # Gerar nomes de colunas se nao houver cabecalho
-    if not header:
-        header = [f'col_{i}' for i in range(data.shape[1])]
+    Plots reais vao direto para o grafico (memmap, sem copia). Plots
+    complexos (AC) viram magnitude em dB: colunas db(nome), com a parte real
+    da frequencia no eixo X. Plots com menos de 2 pontos (ex.: .op) ficam
+    de fora.
 
-    return header, data
+    Retorna: lista de (nome_plot, nomes_colunas, dados_numpy)
+    """
+    result = []
+    for plot in read_rawfile(filepath):
+        if plot.points < 2:
+            continue
+        if plot.is_complex:
+            data = np.empty(plot.data.shape, dtype=np.float64)
+            data[:, 0] = plot.scale.real
+            with np.errstate(divide='ignore'):
+                data[:, 1:] = 20 * np.log10(np.abs(plot.data[:, 1:]))
+            header = [plot.names[0]] + [f'db({name})' for name in plot.names[1:]]
+        else:
+            data = plot.data
+            header = plot.names
+        result.append((plot.plotname, header, data))
+
+    if not result:
+        raise ValueError(f"Nenhum plot com mais de um ponto em: {filepath}")
+    return result
 
 
 def detect_data_type(header, data):
@@ -131,12 +150,14 @@ def format_engineering(value, unit=''):
     return f"{scaled:.3g} {prefix}{unit}"
 
 
-def create_plot(header, data, data_type, title, output_path):
+def create_plot(header, data, data_type, title, output_path, y_axis_label=None):
     """
     Cria grafico PNG a partir dos dados.
+
+    y_axis_label: rotulo do eixo Y; se None, vem dos nomes das colunas.
     """
-    # Configurar estilo
-    plt.style.use('seaborn-v0_8-whitegrid' if 'seaborn-v0_8-whitegrid' in plt.style.available else 'ggplot')
+    # Configurar estilo (no primeiro grafico do processo)
+    setup_plotting()
 
     fig, ax = plt.subplots(figsize=(10, 6), dpi=150)
 
@@ -184,7 +205,9 @@ def create_plot(header, data, data_type, title, output_path):
 
     # Detectar unidade Y
     y_labels = [h for h in header[1:] if h]
-    if any('v(' in h.lower() for h in y_labels):
+    if y_axis_label is not None:
+        ax.set_ylabel(y_axis_label)
+    elif any('v(' in h.lower() for h in y_labels):
         ax.set_ylabel('Tensao (V)')
     elif any('i(' in h.lower() for h in y_labels):
         ax.set_ylabel('Corrente (A)')
@@ -218,10 +241,14 @@ def create_plot(header, data, data_type, title, output_path):
     return output_path
 
 
-def process_csv(csv_path, output_dir=None):
+def process_csv(csv_path, output_dir=None, cache=None, dedupe=True):
     """
     Processa um arquivo CSV e gera PNG.
 
+    cache: WaveformCache opcional (dados ja convertidos, abertos via mmap).
+    dedupe: descarta as colunas repetidas da variavel independente (senao
+    elas aparecem no grafico como sinais).
+
     Retorna: caminho do arquivo PNG gerado
     """
     if not os.path.exists(csv_path):
@@ -236,7 +263,10 @@ def process_csv(csv_path, output_dir=None):
     output_path = os.path.join(output_dir, f"{base_name}.png")
 
     # Ler dados
-    header, data = parse_ngspice_csv(csv_path)
+    if cache is not None:
+        header, data = cache.read(csv_path, dedupe=dedupe)
+    else:
+        header, data = parse_ngspice_csv(csv_path, dedupe=dedupe)
 
     # Detectar tipo
     data_type = detect_data_type(header, data)
@@ -250,15 +280,136 @@ def process_csv(csv_path, output_dir=None):
     return output_path
 
 
-def find_csv_files(search_path):
+def process_raw(raw_path, output_dir=None):
+    """
+    Processa um rawfile binario e gera um PNG por plot (<nome>_tran.png,
+    <nome>_ac.png, ...).
+
+    Retorna: lista com os caminhos dos PNGs gerados
     """
-    Encontra todos os arquivos CSV em um diretorio (recursivamente).
+    if not os.path.exists(raw_path):
+        raise FileNotFoundError(f"Arquivo nao encontrado: {raw_path}")
+
+    if output_dir is None:
+        output_dir = os.path.dirname(raw_path)
+
+    base_name = os.path.splitext(os.path.basename(raw_path))[0]
+    outputs = []
+    used = set()
+    for plotname, header, data in parse_ngspice_raw(raw_path):
+        words = plotname.lower().split()
+        suffix = RAW_PLOT_SUFFIXES.get(words[0] if words else '', 'plot')
+        name = suffix
+        n = 2
+        while name in used:
+            name = f"{suffix}{n}"
+            n += 1
+        used.add(name)
+
+        output_path = os.path.join(output_dir, f"{base_name}_{name}.png")
+        title = f"{base_name.replace('_', ' ').title()} - {plotname}"
+        # Plots complexos viram db(v(...)): o rotulo pelos nomes diria "Tensao"
+        y_axis_label = 'Magnitude (dB)' if all(h.startswith('db(') for h in header[1:]) else None
+        create_plot(header, data, detect_data_type(header, data), title, output_path, y_axis_label)
+        outputs.append(output_path)
+
+    return outputs
+
+
+def process_file(path, output_dir=None, cache=None, dedupe=True):
+    """
+    Processa um CSV (wrdata) ou um rawfile (.raw).
+
+    Retorna: lista com os caminhos dos PNGs gerados
+    """
+    if path.endswith('.raw'):
+        return process_raw(path, output_dir)
+    return [process_csv(path, output_dir, cache, dedupe)]
+
+
+class FileResult:
+    """Resultado de um arquivo (enviado de volta pelo worker com --jobs).
+
+    lines: saida de console do arquivo, impressa em ordem pelo processo principal.
+    cache_hits/cache_misses: contadores do WaveformCache usado no arquivo.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.ok = False
+        self.lines = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+_process_caches = {}
+
+
+def _process_cache(args):
+    """WaveformCache do processo (um por worker), reaproveitado entre os arquivos."""
+    key = (args.cache_dir, args.cache_max_mb)
+    cache = _process_caches.get(key)
+    if cache is None:
+        cache = WaveformCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+        _process_caches[key] = cache
+    return cache
+
+
+def render_file(path, args):
+    """Processa um arquivo com as opcoes da linha de comando, guardando a saida em FileResult."""
+    result = FileResult(path)
+    cache = None
+    if not args.no_cache:
+        cache = _process_cache(args)
+        hits, misses = cache.hits, cache.misses
+    if args.verbose:
+        result.lines.append(f"Processando: {path}")
+    try:
+        for output_path in process_file(path, args.output_dir, cache, not args.no_dedupe):
+            result.lines.append(f"  {path} -> {output_path}")
+        result.ok = True
+    except Exception as e:
+        result.lines.append(f"  ERRO em {path}: {e}")
+    if cache is not None:
+        result.cache_hits = cache.hits - hits
+        result.cache_misses = cache.misses - misses
+    return result
+
+
+def _map_files(paths, args, jobs):
+    """Processa os arquivos (em paralelo se jobs > 1) e produz os resultados na ordem de entrada."""
+    if jobs <= 1:
+        setup_plotting()
+        for path in paths:
+            yield render_file(path, args)
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=setup_plotting) as pool:
+        futures = [pool.submit(render_file, path, args) for path in paths]
+        for path, future in zip(paths, futures):
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                # Um worker morreu (sinal, falta de memoria): os arquivos que nao
+                # terminaram viram erros, os ja concluidos seguem normalmente
+                result = FileResult(path)
+                result.lines.append(f"  ERRO em {path}: processo worker terminou inesperadamente")
+                yield result
+            except Exception as e:
+                result = FileResult(path)
+                result.lines.append(f"  ERRO em {path}: {e}")
+                yield result
+
+
+def find_input_files(search_path):
+    """
+    Encontra todos os arquivos CSV e rawfiles .raw em um diretorio (recursivamente).
     """
     if os.path.isfile(search_path):
-        return [search_path] if search_path.endswith('.csv') else []
+        return [search_path] if search_path.endswith(('.csv', '.raw')) else []
 
     if os.path.isdir(search_path):
-        return glob.glob(os.path.join(search_path, '**', '*.csv'), recursive=True)
+        return (glob.glob(os.path.join(search_path, '**', '*.csv'), recursive=True)
+                + glob.glob(os.path.join(search_path, '**', '*.raw'), recursive=True))
 
     # Pode ser um glob pattern
     return glob.glob(search_path, recursive=True)
@@ -266,14 +417,15 @@ def find_csv_files(search_path):
 
 def main():
     parser = argparse.ArgumentParser(
-        description='Converte arquivos CSV do ngspice em graficos PNG',
+        description='Converte arquivos CSV (wrdata) e rawfiles (.raw) do ngspice em graficos PNG',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Exemplos:
-  python csv_to_png.py                           # Processa todos CSVs em circuits/
+  python csv_to_png.py                           # Processa todos CSVs/.raw em circuits/
   python csv_to_png.py dados.csv                 # Processa arquivo especifico
-  python csv_to_png.py circuits/01_fundamentos/  # Processa CSVs em um diretorio
+  python csv_to_png.py circuits/01_fundamentos/  # Processa CSVs/.raw em um diretorio
   python csv_to_png.py "circuits/**/*.csv"       # Usa glob pattern
+  python csv_to_png.py saida.raw                 # Rawfile binario do ngspice
         """
     )
 
@@ -281,12 +433,12 @@ Exemplos:
         'input',
         nargs='?',
         default='circuits',
-        help='Arquivo CSV, diretorio ou glob pattern (padrao: circuits/)'
+        help='Arquivo CSV/.raw, diretorio ou glob pattern (padrao: circuits/)'
     )
 
     parser.add_argument(
         '-o', '--output-dir',
-        help='Diretorio de saida para os PNGs (padrao: mesmo diretorio do CSV)'
+        help='Diretorio de saida para os PNGs (padrao: mesmo diretorio de cada arquivo)'
     )
 
     parser.add_argument(
@@ -295,36 +447,75 @@ Exemplos:
         help='Mostra informacoes detalhadas'
     )
 
+    parser.add_argument(
+        '--no-dedupe',
+        action='store_true',
+        help='Mantem as colunas repetidas da variavel independente (wrdata sem wr_singlescale)'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Sempre le o texto do CSV (nao le nem grava o cache de formas de onda)'
+    )
+
+    parser.add_argument(
+        '--cache-dir',
+        default=str(DEFAULT_WAVEFORM_CACHE_DIR),
+        help='Diretorio do cache de formas de onda (padrao: .cache/waveforms/)'
+    )
+
+    parser.add_argument(
+        '--cache-max-mb',
+        type=int,
+        default=1024,
+        help='Tamanho maximo do cache em MB; as entradas menos usadas saem primeiro (padrao: 1024)'
+    )
+
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=None,
+        help='Processos em paralelo (padrao ou 0: numero de CPUs; 1 = serial)'
+    )
+
     args = parser.parse_args()
+    if args.jobs is not None and args.jobs < 0:
+        parser.error('--jobs deve ser >= 0')
 
-    # Encontrar arquivos CSV
-    csv_files = find_csv_files(args.input)
+    # Encontrar arquivos CSV e .raw
+    input_files = find_input_files(args.input)
 
-    if not csv_files:
-        print(f"Nenhum arquivo CSV encontrado em: {args.input}")
-        print("Execute uma simulacao ngspice primeiro para gerar os arquivos CSV.")
+    if not input_files:
+        print(f"Nenhum arquivo CSV ou .raw encontrado em: {args.input}")
+        print("Execute uma simulacao ngspice primeiro para gerar os arquivos CSV (wrdata) ou .raw.")
         return 1
 
-    print(f"Encontrados {len(csv_files)} arquivo(s) CSV")
+    print(f"Encontrados {len(input_files)} arquivo(s) CSV/.raw")
     print("-" * 50)
 
     success_count = 0
     error_count = 0
-
-    for csv_path in csv_files:
-        try:
-            if args.verbose:
-                print(f"Processando: {csv_path}")
-
-            output_path = process_csv(csv_path, args.output_dir)
-            print(f"  {csv_path} -> {output_path}")
+    cache_hits = 0
+    cache_misses = 0
+    jobs = max(1, min(args.jobs or os.cpu_count() or 1, len(input_files)))
+
+    for result in _map_files(input_files, args, jobs):
+        for line in result.lines:
+            print(line)
+        if result.ok:
             success_count += 1
-
-        except Exception as e:
-            print(f"  ERRO em {csv_path}: {e}")
+        else:
             error_count += 1
+        cache_hits += result.cache_hits
+        cache_misses += result.cache_misses
 
     print("-" * 50)
+    if not args.no_cache:
+        # Cada processo so varre o cache ao estourar o limite pela propria
+        # conta; aqui o limite vale para o diretorio todo, uma vez por execucao
+        WaveformCache(args.cache_dir, args.cache_max_mb * 1024 * 1024).evict()
+        print(f"Cache de formas de onda: {cache_hits} acerto(s), {cache_misses} falta(s)")
     print(f"Concluido: {success_count} sucesso, {error_count} erro(s)")
 
     return 0 if error_count == 0 else 1
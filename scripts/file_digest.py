@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+file_digest.py - sha256 de arquivos para validar os caches em disco
+
+Usado pelo cache de parse do spice_to_schematic.py (dependencias
+.include/.lib de cada netlist) e pelo WaveformCache do wrdata.py (dumps
+de formas de onda, que podem ter varios GB). O arquivo e lido em blocos,
+entao a memoria nao cresce com o tamanho do arquivo.
+"""
+
+import hashlib
+
+DIGEST_BLOCK_BYTES = 1 << 20
+
+
+def file_digest(path, block=DIGEST_BLOCK_BYTES):
+    """sha256 (hex) do conteudo de path, ou None se o arquivo nao puder ser lido."""
+    h = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for data in iter(lambda: f.read(block), b''):
+                h.update(data)
+    except OSError:
+        return None
+    return h.hexdigest()
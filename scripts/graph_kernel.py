@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+graph_kernel.py - Travessias sobre a adjacencia de ids inteiros do layout
+
+Os nos do layout sao ids inteiros (NodeTable, GROUND_ID = 0) e a
+adjacencia e um dict id -> set de ids, simetrico (todo vizinho tambem e
+chave). Este modulo junta as travessias que
+os helpers de layout de spice_to_schematic.py usavam, cada um com sua
+copia:
+  - bfs_levels: niveis BFS a partir de raizes, com fila deque (O(1) por
+    no, em vez de list.pop(0));
+  - connected_components: DFS com pilha e marcacao em bytearray
+    pre-alocado (um byte por id), ja que visita todos os nos;
+  - reachable: DFS com pilha e marcacao em set, porque costuma
+    alcancar poucos nos (um bytearray do tamanho de todos os ids
+    custaria mais que a propria busca);
+  - degree_table, induced_subgraph, edge_count: graus e subgrafos.
+
+A ordem de visita e a mesma das versoes originais, entao os sets
+devolvidos tem a mesma ordem de iteracao e o layout nao muda.
+"""
+
+from collections import deque
+
+_EMPTY = frozenset()
+
+
+def _mark_table(adj, nodes):
+    """bytearray com uma posicao por id (ids sao inteiros >= 0)."""
+    return bytearray(max(max(adj, default=-1), max(nodes, default=-1)) + 1)
+
+
+def bfs_levels(adj, roots, members=None):
+    """Nivel BFS de cada no alcancavel a partir de roots (nivel 0).
+
+    members: se dado, a busca nao sai desse conjunto. Retorna dict no -> nivel
+    na ordem de visita.
+    """
+    level = {root: 0 for root in roots}
+    queue = deque(level)
+    popleft = queue.popleft
+    push = queue.append
+    get = adj.get
+    while queue:
+        cur = popleft()
+        next_level = level[cur] + 1
+        for nxt in get(cur, _EMPTY):
+            if nxt in level or (members is not None and nxt not in members):
+                continue
+            level[nxt] = next_level
+            push(nxt)
+    return level
+
+
+def connected_components(adj, nodes=None):
+    """Componentes conexos (sets) na ordem de descoberta.
+
+    nodes: ordem em que as sementes sao tentadas (padrao: chaves de adj).
+    """
+    if nodes is None:
+        nodes = list(adj)
+    seen = _mark_table(adj, nodes)
+    groups = []
+    get = adj.get
+    for start in nodes:
+        if seen[start]:
+            continue
+        group = set()
+        add = group.add
+        stack = [start]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            cur = pop()
+            if seen[cur]:
+                continue
+            seen[cur] = 1
+            add(cur)
+            for nxt in get(cur, _EMPTY):
+                if not seen[nxt]:
+                    push(nxt)
+        groups.append(group)
+    return groups
+
+
+def reachable(adj, start, blocked=_EMPTY):
+    """Nos alcancaveis a partir de start sem entrar em blocked (inclui start)."""
+    visited = {start}
+    stack = [start]
+    while stack:
+        cur = stack.pop()
+        for nxt in adj.get(cur, _EMPTY):
+            if nxt in visited or nxt in blocked:
+                continue
+            visited.add(nxt)
+            stack.append(nxt)
+    return visited
+
+
+def degree_table(adj, nodes):
+    """Tabela no -> grau."""
+    return {n: len(adj.get(n, _EMPTY)) for n in nodes}
+
+
+def induced_subgraph(adj, nodes):
+    """Adjacencia restrita a nodes (so arestas com as duas pontas em nodes)."""
+    nodes = nodes if isinstance(nodes, (set, frozenset)) else set(nodes)
+    return {n: adj.get(n, _EMPTY) & nodes for n in nodes}
+
+
+def edge_count(adj, nodes):
+    """Numero de arestas do subgrafo induzido por nodes."""
+    sub = induced_subgraph(adj, nodes)
+    return sum(len(ns) for ns in sub.values()) // 2
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+maze_router.py - Roteador A* em grade para os fios de _circuitikz_generic
+
+Alternativa (--router astar) ao ortho_path, que so compara as duas dobras
+em L. Os fios sao roteados na grade de route_grid:
+  - A* sobre estados (celula, direcao), com custo por passo, por dobra,
+    por cruzamento com fio de outra rede e custos altos para sobrepor fios,
+    passar sobre nos de outras redes ou sobre componentes;
+  - cada rede guarda seu estado (NetState): as celulas ja conectadas viram
+    alvo das proximas buscas da mesma rede, que podem terminar em qualquer
+    ponto da arvore ja desenhada;
+  - a ocupacao da grade e atualizada a cada fio confirmado (add_wire);
+  - cada busca tem um orcamento de tempo; estourado, route() retorna None
+    e o chamador usa a heuristica de duas dobras.
+
+RoutingGrid tambem mede fios desenhados por outros caminhos (heuristica),
+acumulando comprimento total e cruzamentos para comparar os roteadores.
+"""
+
+import time
+import heapq
+
+H_WIRE = 1
+V_WIRE = 2
+
+STEP_COST = 1.0
+BEND_COST = 1.0
+CROSS_COST = 6.0
+OVERLAP_COST = 40.0
+PIN_COST = 40.0
+COMPONENT_COST = 40.0
+SEARCH_MARGIN = 4
+BUDGET_CHECK_EVERY = 256
+
+# (di, dj, eixo)
+_MOVES = ((1, 0, H_WIRE), (-1, 0, H_WIRE), (0, 1, V_WIRE), (0, -1, V_WIRE))
+_REVERSE = (1, 0, 3, 2)
+_NO_DIR = 4
+
+
+class NetState:
+    """Celulas ja conectadas de uma rede (alvos das proximas buscas)."""
+
+    __slots__ = ('cells', 'min_i', 'min_j', 'max_i', 'max_j')
+
+    def __init__(self):
+        self.cells = set()
+        self.min_i = self.min_j = None
+        self.max_i = self.max_j = None
+
+    def add(self, cell):
+        if cell in self.cells:
+            return
+        self.cells.add(cell)
+        i, j = cell
+        if self.min_i is None:
+            self.min_i = self.max_i = i
+            self.min_j = self.max_j = j
+            return
+        self.min_i = min(self.min_i, i)
+        self.max_i = max(self.max_i, i)
+        self.min_j = min(self.min_j, j)
+        self.max_j = max(self.max_j, j)
+
+    def distance(self, cell):
+        """Distancia Manhattan ate a caixa envolvente da rede (heuristica admissivel)."""
+        i, j = cell
+        di = self.min_i - i if i < self.min_i else (i - self.max_i if i > self.max_i else 0)
+        dj = self.min_j - j if j < self.min_j else (j - self.max_j if j > self.max_j else 0)
+        return di + dj
+
+
+class RoutingGrid:
+    """Ocupacao da grade de roteamento + A* por rede."""
+
+    def __init__(self, pitch):
+        self.pitch = pitch
+        self.wires = {}        # celula -> {rede: mascara H_WIRE/V_WIRE}
+        self.components = set()
+        self.pins = {}         # celula -> rede
+        self.nets = {}
+        self.bounds = None
+        self.total_length = 0.0
+        self.crossings = 0
+        self.seconds = 0.0
+        self.routed = 0
+        self.fallbacks = 0
+
+    def cell(self, x, y):
+        return (round(x / self.pitch), round(y / self.pitch))
+
+    def point(self, cell):
+        return (cell[0] * self.pitch, cell[1] * self.pitch)
+
+    def net(self, net):
+        state = self.nets.get(net)
+        if state is None:
+            state = self.nets[net] = NetState()
+        return state
+
+    def _grow(self, cell):
+        i, j = cell
+        if self.bounds is None:
+            self.bounds = [i, j, i, j]
+            return
+        b = self.bounds
+        if i < b[0]:
+            b[0] = i
+        if j < b[1]:
+            b[1] = j
+        if i > b[2]:
+            b[2] = i
+        if j > b[3]:
+            b[3] = j
+
+    @staticmethod
+    def _walk(a, b):
+        """Celulas do segmento ortogonal a -> b (inclusive) e o eixo."""
+        (i1, j1), (i2, j2) = a, b
+        if j1 == j2:
+            step = 1 if i2 >= i1 else -1
+            return [(i, j1) for i in range(i1, i2 + step, step)], H_WIRE
+        step = 1 if j2 >= j1 else -1
+        return [(i1, j) for j in range(j1, j2 + step, step)], V_WIRE
+
+    def _segments(self, points):
+        """Converte pontos em segmentos de celulas; diagonais viram L (horizontal primeiro)."""
+        cells = [self.cell(x, y) for x, y in points]
+        for a, b in zip(cells, cells[1:]):
+            if a == b:
+                continue
+            if a[0] != b[0] and a[1] != b[1]:
+                corner = (b[0], a[1])
+                yield self._walk(a, corner)
+                yield self._walk(corner, b)
+            else:
+                yield self._walk(a, b)
+
+    def add_pin(self, net, x, y):
+        cell = self.cell(x, y)
+        self.pins[cell] = net
+        self.net(net).add(cell)
+        self._grow(cell)
+
+    def add_component(self, x1, y1, x2, y2):
+        """Corpo de um bipolo (ortogonal): celulas internas sao obstaculo."""
+        for cells, _ in self._segments([(x1, y1), (x2, y2)]):
+            for cell in cells[1:-1]:
+                self.components.add(cell)
+            for cell in cells:
+                self._grow(cell)
+
+    def add_wire(self, net, points, measure=True):
+        """Confirma um fio (polilinha) da rede: atualiza ocupacao, comprimento e cruzamentos.
+
+        measure=False so ocupa a grade (ex.: barramentos ja desenhados).
+        """
+        state = self.net(net)
+        crossings = 0
+        for cells, axis in self._segments(points):
+            if measure:
+                self.total_length += (len(cells) - 1) * self.pitch
+            for idx, cell in enumerate(cells):
+                self._grow(cell)
+                state.add(cell)
+                interior = 0 < idx < len(cells) - 1
+                occupants = self.wires.get(cell)
+                if occupants is None:
+                    occupants = self.wires[cell] = {}
+                if interior:
+                    if cell in self.components:
+                        crossings += 1
+                    for other, mask in occupants.items():
+                        if other != net and mask & ~axis:
+                            crossings += 1
+                occupants[net] = occupants.get(net, 0) | axis
+        if measure:
+            self.crossings += crossings
+        return crossings
+
+    def _step_cost(self, cell, axis, net):
+        cost = STEP_COST
+        pin = self.pins.get(cell)
+        if pin is not None and pin != net:
+            cost += PIN_COST
+        if cell in self.components:
+            cost += COMPONENT_COST
+        occupants = self.wires.get(cell)
+        if occupants:
+            for other, mask in occupants.items():
+                if other == net:
+                    continue
+                if mask & axis:
+                    cost += OVERLAP_COST
+                else:
+                    cost += CROSS_COST
+        return cost
+
+    def route(self, net, start, budget=0.05):
+        """A* de start (x, y) ate qualquer celula ja conectada da rede.
+
+        Retorna a lista de pontos (cantos) do caminho, do start ao alvo, ou
+        None se a rede nao tiver alvo ou o orcamento (segundos) estourar.
+        """
+        clock = time.perf_counter
+        began = clock()
+        state = self.nets.get(net)
+        if state is None or not state.cells:
+            return None
+        source = self.cell(*start)
+        self._grow(source)
+        if source in state.cells:
+            self.seconds += clock() - began
+            return [self.point(source)]
+
+        min_i, min_j, max_i, max_j = self.bounds
+        min_i -= SEARCH_MARGIN
+        min_j -= SEARCH_MARGIN
+        max_i += SEARCH_MARGIN
+        max_j += SEARCH_MARGIN
+        targets = state.cells
+        wires = self.wires
+        start_state = (source, _NO_DIR)
+        best = {start_state: 0.0}
+        parent = {start_state: None}
+        counter = 0
+        heap = [(state.distance(source), 0.0, counter, source, _NO_DIR)]
+        found = None
+        pops = 0
+        while heap:
+            f, g, _, cell, direction = heapq.heappop(heap)
+            if g > best.get((cell, direction), float('inf')):
+                continue
+            if cell in targets:
+                found = (cell, direction)
+                break
+            pops += 1
+            if pops % BUDGET_CHECK_EVERY == 0 and clock() - began > budget:
+                break
+            i, j = cell
+            for move, (di, dj, axis) in enumerate(_MOVES):
+                if direction != _NO_DIR and move == _REVERSE[direction]:
+                    continue
+                ni, nj = i + di, j + dj
+                if ni < min_i or ni > max_i or nj < min_j or nj > max_j:
+                    continue
+                nxt = (ni, nj)
+                cost = g + (STEP_COST if nxt not in wires and nxt not in self.pins
+                            and nxt not in self.components
+                            else self._step_cost(nxt, axis, net))
+                if direction != _NO_DIR and move != direction:
+                    cost += BEND_COST
+                key = (nxt, move)
+                if cost < best.get(key, float('inf')):
+                    best[key] = cost
+                    parent[key] = (cell, direction)
+                    counter += 1
+                    heapq.heappush(heap, (cost + state.distance(nxt), cost, counter, nxt, move))
+
+        self.seconds += clock() - began
+        if found is None:
+            return None
+
+        cells = []
+        key = found
+        while key is not None:
+            cells.append(key[0])
+            key = parent[key]
+        cells.reverse()
+        return [self.point(cell) for cell in _corners(cells)]
+
+
+def _corners(cells):
+    """Mantem apenas inicio, fim e celulas onde o caminho muda de direcao."""
+    if len(cells) <= 2:
+        return cells
+    out = [cells[0]]
+    for prev, cur, nxt in zip(cells, cells[1:], cells[2:]):
+        if (cur[0] - prev[0], cur[1] - prev[1]) != (nxt[0] - cur[0], nxt[1] - cur[1]):
+            out.append(cur)
+    out.append(cells[-1])
+    return out
@@ -9,20 +9,36 @@ import matplotlib.pyplot as plt
 import numpy as np
 from pathlib import Path
 
+from wrdata import WaveformCache
+from rawfile import read_rawfile
+
 # Diretórios
 base_dir = Path(__file__).parent.parent
 data_dir = base_dir / "circuits" / "06_rf_comunicacoes"
 
-# Carregar dados (ngspice wrdata não gera cabeçalhos)
-time_full = pd.read_csv(data_dir / "gilbert_time_full.csv", sep=r'\s+', header=None,
-                        names=['time', 'time_dup1', 'time_dup2', 'v_rf_ref', 'time_dup3', 'v_lo_ref', 'time_dup4', 'v_out'])
-
-fft_data = pd.read_csv(data_dir / "gilbert_fft.csv", sep=r'\s+', header=None,
-                       names=['freq', 'freq_dup1', 'freq_dup2', 'db', 'freq_dup3', 'mag'])
-
-# Remover colunas duplicadas (ngspice wrdata repete a coluna independente)
-time_full = time_full[['time', 'v_rf_ref', 'v_lo_ref', 'v_out']]
-fft_data = fft_data[['freq', 'db', 'mag']]
+# Cache .npy dos CSVs (mmap nas execucoes seguintes; ver wrdata.py)
+waveforms = WaveformCache()
+
+# Carregar dados: rawfile binario (`write ... gilbert_time_full.raw ...` no .control) se
+# existir, senao o CSV do wrdata (sem cabecalhos). O wrdata repete a coluna
+# independente antes de cada vetor; dedupe=True descarta as copias na leitura
+time_raw = data_dir / "gilbert_time_full.raw"
+if time_raw.exists():
+    plot = read_rawfile(time_raw)[0]
+    time_full = pd.DataFrame({'time': plot.scale, 'v_rf_ref': plot['v(v_rf_ref)'],
+                              'v_lo_ref': plot['v(v_lo_ref)'], 'v_out': plot['v(v_out)']})
+else:
+    _, data = waveforms.read(data_dir / "gilbert_time_full.csv", dedupe=True)
+    time_full = pd.DataFrame(data, copy=False, columns=['time', 'v_rf_ref', 'v_lo_ref', 'v_out'])
+
+fft_raw = data_dir / "gilbert_fft.raw"
+if fft_raw.exists():
+    plot = read_rawfile(fft_raw)[0]
+    fft_data = pd.DataFrame({'freq': np.real(plot.scale), 'db': np.real(plot['v_out_fft_db']),
+                             'mag': np.real(plot['v_out_fft_mag'])})
+else:
+    _, data = waveforms.read(data_dir / "gilbert_fft.csv", dedupe=True)
+    fft_data = pd.DataFrame(data, copy=False, columns=['freq', 'db', 'mag'])
 
 print("Colunas time_full:", time_full.columns.tolist())
 print("Colunas fft_data:", fft_data.columns.tolist())
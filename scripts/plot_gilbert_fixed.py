@@ -9,22 +9,38 @@ import matplotlib.pyplot as plt
 import numpy as np
 from pathlib import Path
 
+from wrdata import WaveformCache
+from rawfile import read_rawfile
+
 # Diretórios
 base_dir = Path(__file__).parent.parent
 data_dir = base_dir / "circuits" / "06_rf_comunicacoes"
 
-print("Carregando dados do Gilbert Cell Mixer (versão corrigida)...")
-
-# Carregar dados (ngspice wrdata não gera cabeçalhos e repete coluna independente)
-time_data = pd.read_csv(data_dir / "gilbert_fixed_time.csv", sep=r'\s+', header=None,
-                        names=['time', 'time_dup1', 'time_dup2', 'v_rf_mon', 'time_dup3', 'v_lo_mon', 'time_dup4', 'v_out'])
+# Cache .npy dos CSVs (mmap nas execucoes seguintes; ver wrdata.py)
+waveforms = WaveformCache()
 
-fft_data = pd.read_csv(data_dir / "gilbert_fixed_fft.csv", sep=r'\s+', header=None,
-                       names=['freq', 'freq_dup1', 'freq_dup2', 'db', 'freq_dup3', 'mag'])
+print("Carregando dados do Gilbert Cell Mixer (versão corrigida)...")
 
-# Remover colunas duplicadas
-time_data = time_data[['time', 'v_rf_mon', 'v_lo_mon', 'v_out']]
-fft_data = fft_data[['freq', 'db', 'mag']]
+# Carregar dados: rawfile binario (`write ... gilbert_fixed_time.raw ...` no .control) se
+# existir, senao o CSV do wrdata (sem cabecalhos). O wrdata repete a coluna
+# independente antes de cada vetor; dedupe=True descarta as copias na leitura
+time_raw = data_dir / "gilbert_fixed_time.raw"
+if time_raw.exists():
+    plot = read_rawfile(time_raw)[0]
+    time_data = pd.DataFrame({'time': plot.scale, 'v_rf_mon': plot['v(v_rf_mon)'],
+                              'v_lo_mon': plot['v(v_lo_mon)'], 'v_out': plot['v(v_out)']})
+else:
+    _, data = waveforms.read(data_dir / "gilbert_fixed_time.csv", dedupe=True)
+    time_data = pd.DataFrame(data, copy=False, columns=['time', 'v_rf_mon', 'v_lo_mon', 'v_out'])
+
+fft_raw = data_dir / "gilbert_fixed_fft.raw"
+if fft_raw.exists():
+    plot = read_rawfile(fft_raw)[0]
+    fft_data = pd.DataFrame({'freq': np.real(plot.scale), 'db': np.real(plot['v_out_fft_db']),
+                             'mag': np.real(plot['v_out_fft_mag'])})
+else:
+    _, data = waveforms.read(data_dir / "gilbert_fixed_fft.csv", dedupe=True)
+    fft_data = pd.DataFrame(data, copy=False, columns=['freq', 'db', 'mag'])
 
 print(f"✓ Dados carregados:")
 print(f"  Time range: {time_data['time'].min():.4f} to {time_data['time'].max():.4f} s ({len(time_data)} pontos)")
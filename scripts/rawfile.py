@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+rawfile.py - Leitura dos rawfiles binarios do ngspice
+
+O rawfile (ngspice -r saida.raw, ou `write saida.raw ...` no .control) e
+uma sequencia de plots, cada um com um cabecalho de texto seguido dos
+dados binarios:
+
+    Title: ...
+    Date: ...
+    Plotname: Transient Analysis
+    Flags: real                  (ou complex)
+    No. Variables: 3
+    No. Points: 1001
+    Variables:
+            0       time    time
+            1       v(out)  voltage
+            ...
+    Binary:
+    <pontos x variaveis float64, ou complex128 com Flags: complex>
+
+Os dados sao gravados ponto a ponto (todas as variaveis de um ponto
+juntas), em float64 little-endian. read_rawfile devolve um RawPlot por
+plot, cujo array `data` (pontos x variaveis) e um np.memmap somente
+leitura sobre o arquivo: cada vetor (plot['v(out)']) e uma view sem copia
+e so as paginas tocadas sao lidas do disco. Um arquivo truncado (simulacao
+interrompida) devolve os pontos completos que existirem.
+
+O formato ASCII (Values:, set filetype=ascii) nao e suportado.
+
+Uso:
+    from rawfile import read_rawfile
+    for plot in read_rawfile('saida.raw'):
+        print(plot.plotname, plot.names, plot.points)
+        t, vout = plot.scale, plot['v(out)']
+"""
+
+import os
+
+import numpy as np
+
+
+class RawPlot:
+    """Um plot do rawfile: metadados do cabecalho e os dados (memmap)."""
+
+    def __init__(self, title, date, plotname, flags, variables, points, data, commands=()):
+        self.title = title
+        self.date = date
+        self.plotname = plotname
+        self.flags = flags
+        self.variables = variables      # [(nome, tipo)] na ordem do arquivo
+        self.points = points
+        self.data = data                # pontos x variaveis (float64 ou complex128)
+        self.commands = list(commands)
+        self._index = {name.lower(): i for i, (name, _) in enumerate(variables)}
+
+    @property
+    def is_complex(self):
+        return 'complex' in self.flags
+
+    @property
+    def names(self):
+        return [name for name, _ in self.variables]
+
+    @property
+    def scale(self):
+        """Variavel independente (a primeira: time, frequency, v-sweep, ...)."""
+        return self.data[:, 0]
+
+    def __contains__(self, name):
+        return name.lower() in self._index
+
+    def __getitem__(self, name):
+        """Vetor pelo nome (sem diferenciar maiusculas, como o ngspice)."""
+        try:
+            return self.data[:, self._index[name.lower()]]
+        except KeyError:
+            raise KeyError(f"Vetor '{name}' nao existe no plot '{self.plotname}'") from None
+
+    def __repr__(self):
+        kind = 'complex' if self.is_complex else 'real'
+        return f"RawPlot({self.plotname!r}, {len(self.variables)} variaveis, {self.points} pontos, {kind})"
+
+
+def _header_value(line):
+    return line.split(':', 1)[1].strip()
+
+
+def _read_header(f, filepath):
+    """Le o cabecalho de um plot; retorna dict ou None no fim do arquivo."""
+    header = {'commands': []}
+    while True:
+        raw = f.readline()
+        if not raw:
+            if len(header) > 1:
+                raise ValueError(f"Cabecalho incompleto em {filepath}")
+            return None
+        line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+        if not line.strip():
+            continue
+        key = line.split(':', 1)[0].strip().lower()
+        if key == 'title':
+            header['title'] = _header_value(line)
+        elif key == 'date':
+            header['date'] = _header_value(line)
+        elif key == 'plotname':
+            header['plotname'] = _header_value(line)
+        elif key == 'flags':
+            header['flags'] = _header_value(line).lower().split()
+        elif key == 'no. variables':
+            header['nvars'] = int(_header_value(line))
+        elif key == 'no. points':
+            header['points'] = int(_header_value(line))
+        elif key == 'command':
+            header['commands'].append(_header_value(line))
+        elif key == 'variables':
+            if 'nvars' not in header:
+                raise ValueError(f"'Variables:' antes de 'No. Variables:' em {filepath}")
+            variables = []
+            for _ in range(header['nvars']):
+                fields = f.readline().decode('utf-8', errors='replace').split()
+                if len(fields) < 3:
+                    raise ValueError(f"Linha de variavel invalida em {filepath}")
+                variables.append((fields[1], fields[2]))
+            header['variables'] = variables
+        elif key == 'binary':
+            return header
+        elif key == 'values':
+            raise ValueError(f"Rawfile ASCII nao suportado: {filepath} "
+                             f"(use 'set filetype=binary' no ngspice)")
+        # Outras linhas (Option:, Dimensions:, ...) sao ignoradas
+
+
+def read_rawfile(filepath):
+    """
+    Le um rawfile binario do ngspice.
+
+    Retorna: lista de RawPlot, na ordem do arquivo
+    """
+    size = os.path.getsize(filepath)
+    plots = []
+    with open(filepath, 'rb') as f:
+        while True:
+            header = _read_header(f, filepath)
+            if header is None:
+                break
+            for required in ('plotname', 'nvars', 'points', 'variables'):
+                if required not in header:
+                    raise ValueError(f"Cabecalho sem '{required}' em {filepath}")
+            flags = header.get('flags', ['real'])
+            dtype = np.dtype('<c16' if 'complex' in flags else '<f8')
+            nvars = header['nvars']
+            offset = f.tell()
+            row_bytes = nvars * dtype.itemsize
+            points = min(header['points'], (size - offset) // row_bytes if row_bytes else 0)
+            if points > 0:
+                data = np.memmap(filepath, dtype=dtype, mode='r', offset=offset, shape=(points, nvars))
+            else:
+                data = np.empty((0, nvars), dtype=dtype)
+            plots.append(RawPlot(
+                header.get('title', ''), header.get('date', ''), header['plotname'],
+                flags, header['variables'], points, data, header['commands']))
+            f.seek(offset + points * row_bytes)
+            if points < header['points']:
+                break
+
+    if not plots:
+        raise ValueError(f"Nenhum plot encontrado em: {filepath}")
+    return plots
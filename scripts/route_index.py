@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+route_index.py - Indice espacial para os testes de colisao do roteamento
+
+Usado por _circuitikz_generic (spice_to_schematic.py) para pontuar as
+dobras dos fios sem varrer todos os nos, componentes e barramentos a cada
+consulta:
+  - nos ficam em baldes da grade (colunas, linhas e celulas) alinhados a
+    route_grid, ordenados pela outra coordenada para busca binaria;
+  - segmentos horizontais e verticais (componentes e barramentos) ficam em
+    estruturas separadas: baldes pela coordenada fixa e, em cada balde,
+    uma arvore de intervalos sobre a extensao do segmento.
+
+Os resultados sao identicos aos da varredura linear original: mesmas
+tolerancias, mesmos limites abertos e mesma classificacao de orientacao.
+
+ArrayRouteIndex guarda os mesmos dados em arrays NumPy (separados em
+horizontais e verticais) e pontua um lote inteiro de dobras candidatas
+com operacoes vetoriais (bend_scores).
+"""
+
+import math
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+try:
+    import numpy as np
+except ImportError:  # numpy e opcional: sem ele so RouteIndex fica disponivel
+    np = None
+
+HAVE_NUMPY = np is not None
+
+NODE_TOL = 0.01
+AXIS_TOL = 0.1
+COMPONENT_HIT = 10
+
+
+class IntervalTree:
+    """Arvore de intervalos estatica (centrada) para consultas lo < x < hi."""
+
+    __slots__ = ('center', 'by_lo', 'by_hi', 'left', 'right')
+
+    def __init__(self, intervals):
+        """intervals: lista de (lo, hi, item) com lo <= hi."""
+        self.left = None
+        self.right = None
+        if not intervals:
+            self.center = None
+            self.by_lo = self.by_hi = ()
+            return
+        points = sorted(lo + hi for lo, hi, _ in intervals)
+        center = points[len(points) // 2] / 2
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        self.center = center
+        self.by_lo = sorted(here, key=lambda iv: iv[0])
+        self.by_hi = sorted(here, key=lambda iv: iv[1], reverse=True)
+        if left:
+            self.left = IntervalTree(left)
+        if right:
+            self.right = IntervalTree(right)
+
+    def stab(self, x):
+        """Itens cujo intervalo contem x estritamente."""
+        node = self
+        while node is not None and node.center is not None:
+            if x < node.center:
+                for lo, hi, item in node.by_lo:
+                    if lo >= x:
+                        break
+                    yield item
+                node = node.left
+            elif x > node.center:
+                for lo, hi, item in node.by_hi:
+                    if hi <= x:
+                        break
+                    yield item
+                node = node.right
+            else:
+                for lo, hi, item in node.by_lo:
+                    if lo < x < hi:
+                        yield item
+                return
+
+
+def _bucket(value, cell):
+    # Baldes centrados nos pontos da grade: coordenadas ja alinhadas a
+    # route_grid ficam no meio do balde e as tolerancias nao atravessam a borda.
+    return math.floor(value / cell + 0.5)
+
+
+class SegmentBuckets:
+    """Segmentos de uma orientacao.
+
+    Cada segmento tem uma coordenada fixa c (y para horizontais, x para
+    verticais) e uma extensao (lo, hi) na outra direcao. Os segmentos sao
+    agrupados em baldes de c e cada balde guarda uma IntervalTree.
+    """
+
+    def __init__(self, cell, segments):
+        """segments: lista de (c, lo, hi, item)."""
+        self.cell = cell
+        groups = defaultdict(list)
+        for c, lo, hi, item in segments:
+            groups[_bucket(c, cell)].append((lo, hi, (c, item)))
+        self.keys = sorted(groups)
+        self.trees = [IntervalTree(groups[key]) for key in self.keys]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def query(self, c_min, c_max, t):
+        """Itens com c_min < c < c_max cuja extensao contem t (estrito)."""
+        if not self.keys:
+            return
+        first = bisect_left(self.keys, _bucket(c_min, self.cell))
+        last = bisect_right(self.keys, _bucket(c_max, self.cell))
+        for tree in self.trees[first:last]:
+            for c, item in tree.stab(t):
+                if c_min < c < c_max:
+                    yield item
+
+
+class PointBuckets:
+    """Pontos (nos) em colunas, linhas e celulas da grade.
+
+    Em cada coluna (linha) os pontos sao separados pelo valor exato de x (y)
+    e guardam a outra coordenada ordenada, de modo que contar os pontos de
+    um trecho e uma busca binaria; os pontos ignorados sao descontados um a um.
+    """
+
+    def __init__(self, cell, points):
+        """points: dict item -> (x, y)."""
+        self.cell = cell
+        self.points = points
+        columns = defaultdict(lambda: defaultdict(list))
+        rows = defaultdict(lambda: defaultdict(list))
+        cells = defaultdict(list)
+        for item, (x, y) in points.items():
+            kx = _bucket(x, cell)
+            ky = _bucket(y, cell)
+            columns[kx][x].append(y)
+            rows[ky][y].append(x)
+            cells[(kx, ky)].append((x, y, item))
+        self.columns = {key: [(fixed, sorted(values)) for fixed, values in lines.items()]
+                        for key, lines in columns.items()}
+        self.rows = {key: [(fixed, sorted(values)) for fixed, values in lines.items()]
+                     for key, lines in rows.items()}
+        self.cells = dict(cells)
+
+    def _count_line(self, lines, axis, fixed, lo, hi, ignore, tol):
+        if hi <= lo:
+            return 0
+        hits = 0
+        for key in range(_bucket(fixed - tol, self.cell), _bucket(fixed + tol, self.cell) + 1):
+            for value, others in lines.get(key, ()):
+                if abs(value - fixed) >= tol:
+                    continue
+                hits += bisect_left(others, hi) - bisect_right(others, lo)
+                for item in ignore:
+                    position = self.points.get(item)
+                    if position is not None and position[1 - axis] == value and lo < position[axis] < hi:
+                        hits -= 1
+        return hits
+
+    def count_on_vertical(self, x, y_min, y_max, ignore, tol=NODE_TOL):
+        """Pontos com |px - x| < tol e y_min < py < y_max."""
+        return self._count_line(self.columns, 1, x, y_min, y_max, ignore, tol)
+
+    def count_on_horizontal(self, y, x_min, x_max, ignore, tol=NODE_TOL):
+        """Pontos com |py - y| < tol e x_min < px < x_max."""
+        return self._count_line(self.rows, 0, y, x_min, x_max, ignore, tol)
+
+    def any_near(self, x, y, ignore, tol=NODE_TOL):
+        """Existe ponto (fora de ignore) a menos de tol de (x, y) nos dois eixos?"""
+        for kx in range(_bucket(x - tol, self.cell), _bucket(x + tol, self.cell) + 1):
+            for ky in range(_bucket(y - tol, self.cell), _bucket(y + tol, self.cell) + 1):
+                for px, py, item in self.cells.get((kx, ky), ()):
+                    if item in ignore:
+                        continue
+                    if abs(px - x) < tol and abs(py - y) < tol:
+                        return True
+        return False
+
+
+class RouteIndex:
+    """Consultas de colisao usadas por bend_score/ortho_path.
+
+    node_positions: dict no -> (x, y)
+    component_segments: lista de (x1, y1, x2, y2, nome) dos bipolos
+    bus_segments: lista de (x1, y1, x2, y2) dos barramentos de shunt
+    """
+
+    def __init__(self, route_grid, node_positions, component_segments, bus_segments):
+        self.route_grid = route_grid
+        self.nodes = PointBuckets(route_grid, node_positions)
+
+        # Componentes: o teste vertical so ve componentes horizontais e
+        # vice-versa; a extensao ganha route_grid de folga (como no original).
+        comp_h, comp_v = [], []
+        for cx1, cy1, cx2, cy2, name in component_segments:
+            if abs(cy1 - cy2) < AXIS_TOL:
+                x_min, x_max = sorted([cx1, cx2])
+                comp_h.append((cy1, x_min - route_grid, x_max + route_grid, name))
+            if abs(cx1 - cx2) < AXIS_TOL:
+                y_min, y_max = sorted([cy1, cy2])
+                comp_v.append((cx1, y_min - route_grid, y_max + route_grid, name))
+        self.comp_h = SegmentBuckets(route_grid, comp_h)
+        self.comp_v = SegmentBuckets(route_grid, comp_v)
+
+        bus_h, bus_v = [], []
+        for idx, (bx1, by1, bx2, by2) in enumerate(bus_segments):
+            if bx1 == bx2 and by1 == by2:
+                continue
+            if by1 == by2:
+                bus_h.append((by1, min(bx1, bx2), max(bx1, bx2), idx))
+            if bx1 == bx2:
+                bus_v.append((bx1, min(by1, by2), max(by1, by2), idx))
+        self.bus_h = SegmentBuckets(route_grid, bus_h)
+        self.bus_v = SegmentBuckets(route_grid, bus_v)
+
+    def segment_hits_nodes(self, x1, y1, x2, y2, ignore):
+        if x1 == x2:
+            y_min, y_max = sorted([y1, y2])
+            return self.nodes.count_on_vertical(x1, y_min, y_max, ignore)
+        if y1 == y2:
+            x_min, x_max = sorted([x1, x2])
+            return self.nodes.count_on_horizontal(y1, x_min, x_max, ignore)
+        return 0
+
+    def segment_hits_components(self, x1, y1, x2, y2, ignore_comps=frozenset()):
+        """Detecta se um segmento cruza sobre componentes bipolares."""
+        if abs(x1 - x2) < NODE_TOL and abs(y1 - y2) < NODE_TOL:
+            return 0
+        rg = self.route_grid
+        if abs(x1 - x2) < AXIS_TOL:
+            y_min, y_max = sorted([y1, y2])
+            names = self.comp_h.query(y_min - rg, y_max + rg, x1)
+        elif abs(y1 - y2) < AXIS_TOL:
+            x_min, x_max = sorted([x1, x2])
+            names = self.comp_v.query(x_min - rg, x_max + rg, y1)
+        else:
+            return 0
+        return COMPONENT_HIT * sum(1 for name in names if name not in ignore_comps)
+
+    def segment_hits_bus(self, x1, y1, x2, y2):
+        if x1 == x2 and y1 == y2:
+            return 0
+        hits = 0
+        if x1 == x2:
+            hits += sum(1 for _ in self.bus_h.query(min(y1, y2), max(y1, y2), x1))
+        if y1 == y2:
+            hits += sum(1 for _ in self.bus_v.query(min(x1, x2), max(x1, x2), y1))
+        return hits
+
+    def bend_score(self, bx, by, x1, y1, x2, y2, ignore):
+        hits = self.segment_hits_nodes(x1, y1, bx, by, ignore)
+        hits += self.segment_hits_nodes(bx, by, x2, y2, ignore)
+        hits += self.segment_hits_bus(x1, y1, bx, by)
+        hits += self.segment_hits_bus(bx, by, x2, y2)
+        hits += self.segment_hits_components(x1, y1, bx, by)
+        hits += self.segment_hits_components(bx, by, x2, y2)
+        length = abs(x1 - bx) + abs(y1 - by) + abs(x2 - bx) + abs(y2 - by)
+        return hits, length
+
+    def bend_hits_node(self, bx, by, ignore):
+        return self.nodes.any_near(bx, by, ignore)
+
+
+class ArrayRouteIndex:
+    """Mesmas consultas de RouteIndex, vetorizadas com NumPy.
+
+    bend_scores pontua um lote de candidatos de uma vez: os trechos sao
+    separados por orientacao, ordenados pela coordenada fixa e processados
+    em blocos; cada bloco so compara contra os elementos dentro da sua
+    caixa envolvente. bend_score/bend_hits_node mantem a interface de um
+    candidato so (para consultas avulsas RouteIndex e mais rapido).
+    """
+
+    BLOCK = 128
+
+    def __init__(self, route_grid, node_positions, component_segments, bus_segments):
+        if not HAVE_NUMPY:
+            raise ImportError("ArrayRouteIndex requer numpy")
+        self.route_grid = route_grid
+        rg = route_grid
+        items = list(node_positions.items())
+        self.node_ids = np.array([node for node, _ in items], dtype=np.int64)
+        self.node_x = np.array([pos[0] for _, pos in items], dtype=np.float64)
+        self.node_y = np.array([pos[1] for _, pos in items], dtype=np.float64)
+
+        comp_h, comp_v = [], []
+        for cx1, cy1, cx2, cy2, _ in component_segments:
+            if abs(cy1 - cy2) < AXIS_TOL:
+                x_min, x_max = sorted([cx1, cx2])
+                comp_h.append((cy1, x_min - rg, x_max + rg))
+            if abs(cx1 - cx2) < AXIS_TOL:
+                y_min, y_max = sorted([cy1, cy2])
+                comp_v.append((cx1, y_min - rg, y_max + rg))
+        # colunas: coordenada fixa, inicio e fim da extensao (ja com folga)
+        self.comp_h = np.array(comp_h, dtype=np.float64).reshape(-1, 3)
+        self.comp_v = np.array(comp_v, dtype=np.float64).reshape(-1, 3)
+
+        bus_h, bus_v = [], []
+        for bx1, by1, bx2, by2 in bus_segments:
+            if bx1 == bx2 and by1 == by2:
+                continue
+            if by1 == by2:
+                bus_h.append((by1, min(bx1, bx2), max(bx1, bx2)))
+            if bx1 == bx2:
+                bus_v.append((bx1, min(by1, by2), max(by1, by2)))
+        self.bus_h = np.array(bus_h, dtype=np.float64).reshape(-1, 3)
+        self.bus_v = np.array(bus_v, dtype=np.float64).reshape(-1, 3)
+
+    def _blocks(self, fixed, lo, hi):
+        """Indices dos trechos ordenados por (fixa, inicio, fim), em blocos."""
+        order = np.lexsort((hi, lo, fixed))
+        for start in range(0, len(order), self.BLOCK):
+            yield order[start:start + self.BLOCK]
+
+    def _count_points(self, fixed, lo, hi, ignore, point_fixed, point_along):
+        """Nos com |fixa - fixed| < NODE_TOL e lo < ao longo < hi, fora de ignore."""
+        counts = np.zeros(len(fixed), dtype=np.int64)
+        if not len(point_fixed) or not len(fixed):
+            return counts
+        ids = self.node_ids
+        margin = 2 * NODE_TOL
+        for blk in self._blocks(fixed, lo, hi):
+            f, a, b = fixed[blk], lo[blk], hi[blk]
+            near = np.flatnonzero((point_fixed > f[0] - margin) & (point_fixed < f[-1] + margin)
+                                  & (point_along > a.min()) & (point_along < b.max()))
+            if not len(near):
+                continue
+            pf, pa, pid = point_fixed[near], point_along[near], ids[near]
+            hit = ((np.abs(pf[None, :] - f[:, None]) < NODE_TOL)
+                   & (a[:, None] < pa[None, :]) & (pa[None, :] < b[:, None]))
+            for k in range(ignore.shape[1]):
+                hit &= pid[None, :] != ignore[blk, k][:, None]
+            counts[blk] = hit.sum(axis=1)
+        return counts
+
+    def _count_crossings(self, fixed, lo, hi, segments):
+        """Segmentos (fixa, inicio, fim) com inicio < fixed < fim e lo < fixa < hi."""
+        counts = np.zeros(len(fixed), dtype=np.int64)
+        if not len(segments) or not len(fixed):
+            return counts
+        seg_fixed, seg_lo, seg_hi = segments[:, 0], segments[:, 1], segments[:, 2]
+        for blk in self._blocks(fixed, lo, hi):
+            f, a, b = fixed[blk], lo[blk], hi[blk]
+            near = np.flatnonzero((seg_lo < f[-1]) & (seg_hi > f[0])
+                                  & (seg_fixed > a.min()) & (seg_fixed < b.max()))
+            if not len(near):
+                continue
+            sf, sl, sh = seg_fixed[near], seg_lo[near], seg_hi[near]
+            hit = ((sl[None, :] < f[:, None]) & (f[:, None] < sh[None, :])
+                   & (a[:, None] < sf[None, :]) & (sf[None, :] < b[:, None]))
+            counts[blk] = hit.sum(axis=1)
+        return counts
+
+    def _segment_hits(self, x1, y1, x2, y2, ignore):
+        """Hits (nos + barramentos + componentes) de cada trecho; array de tamanho Q.
+
+        ignore: matriz Q x K de ids de nos ignorados (-1 = vazio).
+        """
+        rg = self.route_grid
+        hits = np.zeros(len(x1), dtype=np.int64)
+        lo_x, hi_x = np.minimum(x1, x2), np.maximum(x1, x2)
+        lo_y, hi_y = np.minimum(y1, y2), np.maximum(y1, y2)
+
+        # Nos: vertical se x1 == x2, senao horizontal se y1 == y2
+        vertical = np.flatnonzero(x1 == x2)
+        horizontal = np.flatnonzero((x1 != x2) & (y1 == y2))
+        hits[vertical] += self._count_points(x1[vertical], lo_y[vertical], hi_y[vertical],
+                                             ignore[vertical], self.node_x, self.node_y)
+        hits[horizontal] += self._count_points(y1[horizontal], lo_x[horizontal], hi_x[horizontal],
+                                               ignore[horizontal], self.node_y, self.node_x)
+
+        # Barramentos: igualdade exata, trecho degenerado nao conta
+        degenerate = (x1 == x2) & (y1 == y2)
+        bus_vertical = np.flatnonzero((x1 == x2) & ~degenerate)
+        bus_horizontal = np.flatnonzero((y1 == y2) & ~degenerate)
+        hits[bus_vertical] += self._count_crossings(
+            x1[bus_vertical], lo_y[bus_vertical], hi_y[bus_vertical], self.bus_h)
+        hits[bus_horizontal] += self._count_crossings(
+            y1[bus_horizontal], lo_x[bus_horizontal], hi_x[bus_horizontal], self.bus_v)
+
+        # Componentes: tolerancia AXIS_TOL; vertical tem prioridade
+        small = (np.abs(x1 - x2) < NODE_TOL) & (np.abs(y1 - y2) < NODE_TOL)
+        comp_vertical = ~small & (np.abs(x1 - x2) < AXIS_TOL)
+        comp_horizontal = np.flatnonzero(~small & ~comp_vertical & (np.abs(y1 - y2) < AXIS_TOL))
+        comp_vertical = np.flatnonzero(comp_vertical)
+        hits[comp_vertical] += COMPONENT_HIT * self._count_crossings(
+            x1[comp_vertical], lo_y[comp_vertical] - rg, hi_y[comp_vertical] + rg, self.comp_h)
+        hits[comp_horizontal] += COMPONENT_HIT * self._count_crossings(
+            y1[comp_horizontal], lo_x[comp_horizontal] - rg, hi_x[comp_horizontal] + rg, self.comp_v)
+        return hits
+
+    @staticmethod
+    def _ignore_matrix(ignores):
+        width = max((len(ignore) for ignore in ignores), default=0) or 1
+        matrix = np.full((len(ignores), width), -1, dtype=np.int64)
+        for row, ignore in enumerate(ignores):
+            for col, node in enumerate(ignore):
+                matrix[row, col] = node
+        return matrix
+
+    def bend_scores(self, candidates):
+        """Pontua varios candidatos (bx, by, x1, y1, x2, y2, ignore) de uma vez.
+
+        Retorna a lista de (hits, comprimento), como bend_score.
+        """
+        if not candidates:
+            return []
+        coords = np.array([cand[:6] for cand in candidates], dtype=np.float64)
+        bx, by, x1, y1, x2, y2 = coords.T
+        ignore = self._ignore_matrix([cand[6] for cand in candidates])
+        hits = self._segment_hits(np.concatenate([x1, bx]), np.concatenate([y1, by]),
+                                  np.concatenate([bx, x2]), np.concatenate([by, y2]),
+                                  np.concatenate([ignore, ignore]))
+        n = len(candidates)
+        hits = hits[:n] + hits[n:]
+        length = np.abs(x1 - bx) + np.abs(y1 - by) + np.abs(x2 - bx) + np.abs(y2 - by)
+        return list(zip(hits.tolist(), length.tolist()))
+
+    def bend_score(self, bx, by, x1, y1, x2, y2, ignore):
+        return self.bend_scores([(bx, by, x1, y1, x2, y2, ignore)])[0]
+
+    def bend_hits_node(self, bx, by, ignore):
+        if not len(self.node_ids):
+            return False
+        near = (np.abs(self.node_x - bx) < NODE_TOL) & (np.abs(self.node_y - by) < NODE_TOL)
+        for node in ignore:
+            near &= self.node_ids != node
+        return bool(near.any())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+span_timer.py - Tempo por fase (spans) e contadores para --profile
+
+Instrumentacao do spice_to_schematic.py:
+  - span(nome): bloco `with` cronometrado; spans aninhados viram caminhos
+    ('layout/fixed_for_group') na tabela;
+  - begin(nome) / end(marca): o mesmo para fases sequenciais de funcoes
+    longas, sem reindentar o codigo;
+  - add(nome, segundos): tempo ja medido por outro meio (ex.: roteamento
+    acumulado fio a fio);
+  - count(nome, n): contadores (fios roteados, testes de colisao, ...).
+
+Sem um SpanTimer ativo (activate), span devolve um objeto nulo
+compartilhado e begin/end/add/count retornam na primeira linha: o custo
+desligado e uma chamada de funcao e um teste de None.
+
+Cada SpanTimer guarda totais por caminho (chamadas, segundos), contadores
+e eventos no formato Chrome trace ('ph': 'X', microssegundos de
+time.perf_counter, que e monotono e compartilhado entre processos no
+Linux). summary() e merge_summaries() produzem dicts simples (vao de volta
+dos workers por pickle); format_table, write_json e write_chrome_trace
+fazem a saida.
+"""
+
+import os
+import json
+import time
+from contextlib import contextmanager
+
+_active = None
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('timer', 'name', 'token')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.token = None
+
+    def __enter__(self):
+        self.token = self.timer.begin(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.end(self.token)
+        return False
+
+
+class SpanTimer:
+    """Acumula spans, contadores e eventos de trace de um arquivo (ou do lote)."""
+
+    def __init__(self, label=None, tid=0):
+        self.label = label
+        self.tid = tid
+        self.pid = os.getpid()
+        self.totals = {}
+        self.counters = {}
+        self.events = []
+        self._stack = []
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def begin(self, name):
+        self._stack.append(name)
+        return (len(self._stack), '/'.join(self._stack), time.perf_counter())
+
+    def end(self, token):
+        finished = time.perf_counter()
+        depth, path, started = token
+        del self._stack[depth - 1:]
+        self._record(path, started, finished - started)
+
+    def add(self, name, seconds, calls=1):
+        path = '/'.join(self._stack + [name])
+        self._record(path, time.perf_counter() - seconds, seconds, calls)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def _record(self, path, started, seconds, calls=1):
+        entry = self.totals.get(path)
+        if entry is None:
+            self.totals[path] = [calls, seconds]
+        else:
+            entry[0] += calls
+            entry[1] += seconds
+        self.events.append((path, started, seconds))
+
+    def summary(self):
+        """Dict {'spans': {caminho: [chamadas, segundos]}, 'counters': {...}}."""
+        return {
+            'spans': {path: list(entry) for path, entry in self.totals.items()},
+            'counters': dict(self.counters),
+        }
+
+    def trace_events(self):
+        """Eventos Chrome trace (lista de dicts) deste timer."""
+        events = []
+        for path, started, seconds in self.events:
+            events.append({
+                'name': path.rsplit('/', 1)[-1],
+                'cat': path,
+                'ph': 'X',
+                'ts': round(started * 1e6, 3),
+                'dur': round(seconds * 1e6, 3),
+                'pid': self.pid,
+                'tid': self.tid,
+                'args': {'arquivo': self.label} if self.label else {},
+            })
+        return events
+
+
+@contextmanager
+def activate(timer):
+    """Torna timer o destino de span/begin/end/add/count dentro do bloco (None desliga)."""
+    global _active
+    previous = _active
+    _active = timer
+    try:
+        yield timer
+    finally:
+        if timer is not None:
+            timer._stack.clear()
+        _active = previous
+
+
+def enabled():
+    return _active is not None
+
+
+def span(name):
+    timer = _active
+    if timer is None:
+        return _NULL_SPAN
+    return timer.span(name)
+
+
+def begin(name):
+    timer = _active
+    if timer is None:
+        return None
+    return timer.begin(name)
+
+
+def end(token):
+    if token is None or _active is None:
+        return
+    _active.end(token)
+
+
+def add(name, seconds, calls=1):
+    if _active is not None:
+        _active.add(name, seconds, calls)
+
+
+def count(name, n=1):
+    if _active is not None:
+        _active.count(name, n)
+
+
+def merge_summaries(summaries):
+    """Soma varios summary() em um so (agregado do lote)."""
+    spans = {}
+    counters = {}
+    for summary in summaries:
+        for path, (calls, seconds) in summary['spans'].items():
+            entry = spans.setdefault(path, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+        for name, value in summary['counters'].items():
+            counters[name] = counters.get(name, 0) + value
+    return {'spans': spans, 'counters': counters}
+
+
+def format_table(summary, indent="  "):
+    """Linhas da tabela por fase (tempo inclusivo, % do total de nivel superior) e contadores."""
+    spans = summary['spans']
+    total = sum(seconds for path, (calls, seconds) in spans.items() if '/' not in path)
+    lines = [f"{indent}{'fase':<34} {'chamadas':>8} {'ms':>10} {'%':>6}"]
+    # Ordem de arvore: pais antes dos filhos, irmaos pelo tempo
+    children = {}
+    for path in spans:
+        parent = path.rsplit('/', 1)[0] if '/' in path else ''
+        children.setdefault(parent, []).append(path)
+
+    def walk(parent, depth):
+        for path in sorted(children.get(parent, ()), key=lambda p: -spans[p][1]):
+            calls, seconds = spans[path]
+            share = 100.0 * seconds / total if total else 0.0
+            name = "  " * depth + path.rsplit('/', 1)[-1]
+            lines.append(f"{indent}{name:<34} {calls:>8} {seconds * 1e3:>10.1f} {share:>5.1f}%")
+            walk(path, depth + 1)
+    walk('', 0)
+    for name in sorted(summary['counters']):
+        lines.append(f"{indent}{name:<34} {summary['counters'][name]:>8}")
+    return lines
+
+
+def write_json(path, files, aggregate):
+    """Grava {'files': [{'path', 'spans', 'counters'}], 'aggregate': {...}} em path."""
+    data = {'files': files, 'aggregate': aggregate}
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+
+
+def write_chrome_trace(path, events):
+    """Grava os eventos no formato Chrome trace (chrome://tracing, Perfetto)."""
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -27,10 +27,25 @@ import os
 import re
 import glob
 import argparse
+import pickle
+import hashlib
+import shutil
 import tempfile
 import subprocess
+import time
+from array import array
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from route_index import RouteIndex, ArrayRouteIndex, HAVE_NUMPY
+from maze_router import RoutingGrid
+from crossing_reduction import EFFORTS, DEFAULT_EFFORT, reduce_crossings
+from graph_kernel import bfs_levels, connected_components, reachable, degree_table, edge_count
+import span_timer
+from file_digest import file_digest
 
 
 # =============================================================================
@@ -51,6 +66,201 @@ class SpiceComponent:
         return f"{self.comp_type}:{self.name}({self.nodes}) = {self.value or self.model}"
 
 
+# Codigos de tipo usados pelo ComponentTable ('X': bloco do modo hierarquico)
+COMPONENT_TYPES = 'RCLDQMJVIX'
+_TYPE_CODES = {t: i for i, t in enumerate(COMPONENT_TYPES)}
+MAX_PINS = 4
+NO_NODE = -1
+NO_STRING = -1
+GROUND_ID = 0
+NODE_CACHE_SIZE = 65536
+
+
+class NodeTable:
+    """Tabela de nos internados: token bruto -> id inteiro estavel.
+
+    Cada token e normalizado uma unica vez; repeticoes do mesmo token
+    resolvem direto pelo dicionario de tokens brutos. O terra ('0') sempre
+    recebe GROUND_ID.
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        self._raw_ids = {}
+        self.add('0')
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        """Registra um nome ja normalizado e retorna seu id."""
+        nid = self.ids.get(name)
+        if nid is None:
+            nid = len(self.names)
+            self.ids[name] = nid
+            self.names.append(name)
+        return nid
+
+    def intern(self, token):
+        """Normaliza um token bruto e retorna seu id inteiro."""
+        nid = self._raw_ids.get(token)
+        if nid is None:
+            nid = self.add(normalize_node(token))
+            self._raw_ids[token] = nid
+        return nid
+
+    def name(self, nid):
+        return self.names[nid]
+
+    def __len__(self):
+        return len(self.names)
+
+
+class ComponentView:
+    """Visao leve de uma linha do ComponentTable com a API do SpiceComponent.
+
+    Os nos expostos em nodes ja estao normalizados (normalize_node).
+    """
+
+    __slots__ = ('_table', 'index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self.index = index
+
+    @property
+    def name(self):
+        return self._table.names[self.index]
+
+    @property
+    def comp_type(self):
+        return COMPONENT_TYPES[self._table.type_codes[self.index]]
+
+    @property
+    def node_ids(self):
+        table = self._table
+        base = self.index * table.max_pins
+        return tuple(table.pins[base:base + table.pin_counts[self.index]])
+
+    @property
+    def nodes(self):
+        table = self._table
+        node_names = table.node_names
+        base = self.index * table.max_pins
+        return [node_names[i] for i in table.pins[base:base + table.pin_counts[self.index]]]
+
+    @property
+    def value(self):
+        return self._table.string(self._table.value_ids[self.index])
+
+    @property
+    def model(self):
+        return self._table.string(self._table.model_ids[self.index])
+
+    def __repr__(self):
+        return f"{self.comp_type}:{self.name}({self.nodes}) = {self.value or self.model}"
+
+
+class ComponentTable:
+    """Armazenamento colunar dos componentes de um circuito.
+
+    Cada componente ocupa uma posicao em arrays compactos: codigo de tipo,
+    ate max_pins ids inteiros de nos (normalizados uma unica vez na
+    insercao) e ids de valor/modelo em um pool de strings. Iterar sobre a
+    tabela produz ComponentView, que mantem a API de SpiceComponent.
+    max_pins so passa de MAX_PINS nas tabelas com blocos (hierarchy_pages).
+    """
+
+    def __init__(self, node_table=None, max_pins=MAX_PINS):
+        self.max_pins = max_pins
+        self.names = []
+        self.type_codes = array('b')
+        self.pin_counts = array('b')
+        self.pins = array('i')
+        self.value_ids = array('i')
+        self.model_ids = array('i')
+        self.node_table = node_table if node_table is not None else NodeTable()
+        self.node_names = self.node_table.names
+        self.strings = []
+        self._string_ids = {}
+
+    @classmethod
+    def from_components(cls, components):
+        """Cria uma tabela a partir de qualquer sequencia de componentes."""
+        if isinstance(components, cls):
+            return components
+        table = cls()
+        for comp in components:
+            table.append(comp.name, comp.comp_type, comp.nodes, comp.value, comp.model)
+        return table
+
+    def intern_node(self, node):
+        """Normaliza um no e retorna seu id inteiro."""
+        return self.node_table.intern(node)
+
+    def with_sorted_nodes(self):
+        """Copia a tabela renumerando os nos em ordem alfabetica.
+
+        O terra continua com GROUND_ID e os demais ids passam a seguir a
+        ordem dos nomes, entao ordenar ids equivale a ordenar nomes. O
+        layout usa essa copia para trabalhar apenas com inteiros.
+        """
+        names = self.node_names
+        order = sorted(range(1, len(names)), key=names.__getitem__)
+        remap = [GROUND_ID] * len(names)
+        for new_id, old_id in enumerate(order, 1):
+            remap[old_id] = new_id
+
+        table = ComponentTable(NodeTable(names[i] for i in order), self.max_pins)
+        table.names = list(self.names)
+        table.type_codes = array('b', self.type_codes)
+        table.pin_counts = array('b', self.pin_counts)
+        table.pins = array('i', [NO_NODE if p == NO_NODE else remap[p] for p in self.pins])
+        table.value_ids = array('i', self.value_ids)
+        table.model_ids = array('i', self.model_ids)
+        table.strings = list(self.strings)
+        table._string_ids = dict(self._string_ids)
+        return table
+
+    def intern_string(self, text):
+        if text is None:
+            return NO_STRING
+        sid = self._string_ids.get(text)
+        if sid is None:
+            sid = len(self.strings)
+            self._string_ids[text] = sid
+            self.strings.append(text)
+        return sid
+
+    def string(self, sid):
+        return None if sid == NO_STRING else self.strings[sid]
+
+    def append(self, name, comp_type, nodes, value=None, model=None):
+        ids = [self.intern_node(n) for n in nodes[:self.max_pins]]
+        self.names.append(name)
+        self.type_codes.append(_TYPE_CODES[comp_type])
+        self.pin_counts.append(len(ids))
+        self.pins.extend(ids + [NO_NODE] * (self.max_pins - len(ids)))
+        self.value_ids.append(self.intern_string(value))
+        self.model_ids.append(self.intern_string(model))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [ComponentView(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return ComponentView(self, index)
+
+    def __iter__(self):
+        for i in range(len(self.names)):
+            yield ComponentView(self, i)
+
+
 class SubcircuitDefinition:
     """Define um subcircuito com pinos e componentes."""
 
@@ -70,40 +280,133 @@ class SubcircuitInstance:
         self.nodes = nodes
 
 
-def expand_subcircuit(instance, subckt_defs, depth=0):
-    """Expande uma instancia em componentes planos."""
-    if depth > 8:
-        return []
-    subckt_key = instance.subckt.upper()
-    if subckt_key not in subckt_defs:
-        return []
+DEFAULT_MAX_SUBCKT_DEPTH = 8
+
+
+class SubcircuitTemplate:
+    """Subcircuito compilado uma unica vez para instanciacao rapida.
+
+    Cada no distinto do subcircuito recebe um slot local. A tabela de pinos
+    diz quais slots vem dos nos da instancia; os demais sao nos internos que
+    recebem o prefixo da instancia. Componentes e instancias filhas guardam
+    apenas indices de slots, entao instanciar e so renomear uma lista.
+    """
+
+    def __init__(self, definition):
+        self.name = definition.name
+        self.slot_names = []
+        self.slot_pins = []
+        self.components = []
+        self.instances = []
+        self._slot_of = {}
+
+        pin_indices = defaultdict(list)
+        for idx, pin in enumerate(definition.pins):
+            pin_indices[pin].append(idx)
+        self._pin_indices = pin_indices
+
+        for comp in definition.components:
+            refs = tuple(self._slot(n) for n in comp.nodes)
+            self.components.append((comp.name, comp.comp_type, refs, comp.value, comp.model))
+        for inst in definition.instances:
+            refs = tuple(self._slot(n) for n in inst.nodes)
+            self.instances.append((inst.name, inst.subckt.upper(), refs))
+
+    def _slot(self, node):
+        nn = normalize_node(node)
+        slot = self._slot_of.get(nn)
+        if slot is None:
+            slot = len(self.slot_names)
+            self._slot_of[nn] = slot
+            self.slot_names.append(nn)
+            # Terra nunca e renomeado, mesmo se for pino
+            self.slot_pins.append(() if nn == '0' else tuple(self._pin_indices.get(nn, ())))
+        return slot
+
+    def bind(self, prefix, actual_nodes):
+        """Retorna os nomes globais de todos os slots para uma instancia."""
+        n_actual = len(actual_nodes)
+        names = []
+        for nn, pins in zip(self.slot_names, self.slot_pins):
+            if nn == '0':
+                names.append('0')
+                continue
+            bound = None
+            # Pinos repetidos: vale o ultimo ligado pela instancia
+            for idx in pins:
+                if idx < n_actual:
+                    bound = idx
+            if bound is not None:
+                names.append(normalize_node(actual_nodes[bound]))
+            else:
+                names.append(f"{prefix}_{nn}")
+        return names
 
-    sub = subckt_defs[subckt_key]
-    pin_map = {}
-    for pin, node in zip(sub.pins, instance.nodes):
-        pin_map[pin] = normalize_node(node)
 
-    flattened = []
-    prefix = instance.name
+class SubcircuitFlattener:
+    """Achata instancias X usando templates compilados e uma worklist explicita.
+
+    Apos flatten(), instance_count e component_count informam quantas
+    instancias foram expandidas e quantos componentes planos foram gerados;
+    truncated_count e missing_count contam instancias abandonadas por
+    excederem max_depth ou por referenciarem subcircuitos inexistentes.
+    """
+
+    def __init__(self, subckt_defs, max_depth=DEFAULT_MAX_SUBCKT_DEPTH):
+        self.subckt_defs = subckt_defs
+        self.max_depth = max_depth
+        self.templates = {}
+        self.instance_count = 0
+        self.component_count = 0
+        self.truncated_count = 0
+        self.missing_count = 0
+
+    def template(self, key):
+        tpl = self.templates.get(key)
+        if tpl is None and key in self.subckt_defs:
+            tpl = SubcircuitTemplate(self.subckt_defs[key])
+            self.templates[key] = tpl
+        return tpl
+
+    def flatten(self, instances, depth=0, table=None):
+        """Expande instancias (em ordem) em uma lista de SpiceComponent.
+
+        Se table (ComponentTable) for dado, os componentes sao gravados
+        diretamente nela e a lista retornada fica vazia.
+        """
+        flattened = []
+        emitted = 0
+        # Pilha em ordem reversa preserva a ordem de pre-ordem da recursao
+        worklist = [(inst.name, inst.subckt.upper(), inst.nodes, depth) for inst in reversed(instances)]
+        while worklist:
+            prefix, key, actual_nodes, level = worklist.pop()
+            if level > self.max_depth:
+                self.truncated_count += 1
+                continue
+            tpl = self.template(key)
+            if tpl is None:
+                self.missing_count += 1
+                continue
+            self.instance_count += 1
 
-    def map_node(n):
-        nn = normalize_node(n)
-        if nn == '0':
-            return '0'
-        if nn in pin_map:
-            return pin_map[nn]
-        return f"{prefix}_{nn}"
+            names = tpl.bind(prefix, actual_nodes)
+            for name, comp_type, refs, value, model in tpl.components:
+                mapped = [names[r] for r in refs]
+                if table is not None:
+                    table.append(f"{prefix}_{name}", comp_type, mapped, value, model)
+                else:
+                    flattened.append(SpiceComponent(f"{prefix}_{name}", comp_type, mapped, value, model))
+            emitted += len(tpl.components)
+            for name, sub_key, refs in reversed(tpl.instances):
+                worklist.append((f"{prefix}_{name}", sub_key, [names[r] for r in refs], level + 1))
 
-    for comp in sub.components:
-        mapped = [map_node(n) for n in comp.nodes]
-        flattened.append(SpiceComponent(f"{prefix}_{comp.name}", comp.comp_type, mapped, comp.value, comp.model))
+        self.component_count += emitted
+        return flattened
 
-    for inst in sub.instances:
-        mapped_nodes = [map_node(n) for n in inst.nodes]
-        flat = expand_subcircuit(SubcircuitInstance(f"{prefix}_{inst.name}", inst.subckt, mapped_nodes), subckt_defs, depth + 1)
-        flattened.extend(flat)
 
-    return flattened
+def expand_subcircuit(instance, subckt_defs, depth=0, max_depth=DEFAULT_MAX_SUBCKT_DEPTH):
+    """Expande uma instancia em componentes planos."""
+    return SubcircuitFlattener(subckt_defs, max_depth).flatten([instance], depth)
 
 
 def parse_value(value_str):
@@ -156,163 +459,755 @@ def _split_subckt_instance(tokens):
     return node_list, subckt_name
 
 
-def parse_spice_file(filepath):
-    """Parseia arquivo SPICE e retorna lista de componentes."""
-    components = []
-    title = ""
-    current_subckt = None
-    subckt_defs = {}
-    instances = []
-    in_control = False
-
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
+_DC_VALUE_RE = re.compile(r'DC\s+([^\s]+)')
+_V_NON_DC_KEYWORDS = ('AC', 'PULSE', 'SIN', 'PWL', 'EXP')
+_I_NON_DC_KEYWORDS = ('AC', 'PULSE', 'SIN', 'PWL')
 
-    if not lines:
-        return components, title
 
-    title = lines[0].strip()
-    if title.startswith('*'):
-        title = title[1:].strip()
+def _iter_logical_lines(lines):
+    """Gera linhas logicas, juntando continuacoes (+) e removendo comentarios.
 
-    # Juntar linhas continuadas (+)
-    joined_lines = []
+    Mantem apenas a linha logica corrente em memoria, de modo que arquivos
+    muito grandes podem ser lidos em streaming direto do handle do arquivo.
+    """
     current_line = ""
-
-    for line in lines[1:]:
+    for line in lines:
         line = line.rstrip()
-        if line.lstrip().startswith('+'):
-            cont = _strip_inline_comment(line.lstrip()[1:]).strip()
+        stripped = line.lstrip()
+        if stripped.startswith('+'):
+            cont = _strip_inline_comment(stripped[1:]).strip()
             if not cont:
                 continue
             if current_line:
                 current_line += ' ' + cont
             else:
                 current_line = cont
-        else:
-            if current_line:
-                joined_lines.append(current_line)
-            cleaned = _strip_inline_comment(line)
-            if not cleaned or cleaned.lstrip().startswith('*'):
-                current_line = ""
-                continue
-            current_line = cleaned
+            continue
+        if current_line:
+            yield current_line
+        cleaned = _strip_inline_comment(line)
+        if not cleaned or cleaned.startswith('*'):
+            current_line = ""
+            continue
+        current_line = cleaned
     if current_line:
-        joined_lines.append(current_line)
-
-    for line in joined_lines:
-        line = line.strip()
+        yield current_line
 
-        if not line or line.startswith('*'):
-            continue
 
-        if not line:
+def _iter_spice_cards(lines):
+    """Gera cartoes SPICE (linha, linha_maiuscula) fora de blocos .control."""
+    in_control = False
+    for line in _iter_logical_lines(lines):
+        if line.startswith('*'):
             continue
-
         line_upper = line.upper()
-
         if line_upper.startswith('.CONTROL'):
             in_control = True
             continue
         if line_upper.startswith('.ENDC'):
             in_control = False
             continue
-
         if in_control:
             continue
+        yield line, line_upper
+
+
+def _source_value(parts, non_dc_keywords):
+    """Extrai o valor DC de uma fonte V/I."""
+    if len(parts) <= 3:
+        return ""
+    dc_match = _DC_VALUE_RE.search(' '.join(parts[3:]).upper())
+    if dc_match:
+        return parse_value(dc_match.group(1))
+    if parts[3].upper() not in non_dc_keywords:
+        return parse_value(parts[3])
+    return ""
+
+
+def _parse_two_terminal(name, comp_type, parts):
+    value = parse_value(parts[3]) if len(parts) > 3 else ""
+    return SpiceComponent(name, comp_type, [parts[1], parts[2]], value)
+
+
+def _parse_diode(name, comp_type, parts):
+    model = parts[3] if len(parts) > 3 else ""
+    return SpiceComponent(name, 'D', [parts[1], parts[2]], model=model)
+
+
+def _parse_three_terminal(name, comp_type, parts):
+    # Q: C, B, E / J: D, G, S
+    if len(parts) < 5:
+        return None
+    return SpiceComponent(name, comp_type, [parts[1], parts[2], parts[3]], model=parts[4])
+
+
+def _parse_mosfet(name, comp_type, parts):
+    # D, G, S, B
+    if len(parts) < 6:
+        return None
+    return SpiceComponent(name, 'M', [parts[1], parts[2], parts[3], parts[4]], model=parts[5])
+
+
+def _parse_voltage_source(name, comp_type, parts):
+    value = _source_value(parts, _V_NON_DC_KEYWORDS)
+    return SpiceComponent(name, 'V', [parts[1], parts[2]], value)
+
+
+def _parse_current_source(name, comp_type, parts):
+    value = _source_value(parts, _I_NON_DC_KEYWORDS)
+    return SpiceComponent(name, 'I', [parts[1], parts[2]], value)
+
+
+# Despacho por letra inicial do cartao de elemento
+_ELEMENT_PARSERS = {
+    'R': _parse_two_terminal,
+    'C': _parse_two_terminal,
+    'L': _parse_two_terminal,
+    'D': _parse_diode,
+    'Q': _parse_three_terminal,
+    'J': _parse_three_terminal,
+    'M': _parse_mosfet,
+    'V': _parse_voltage_source,
+    'I': _parse_current_source,
+}
+
+
+class SpiceModel:
+    """Cartao .model: nome, tipo e parametros (texto cru)."""
+
+    __slots__ = ('name', 'model_type', 'params')
+
+    def __init__(self, name, model_type, params=''):
+        self.name = name
+        self.model_type = model_type
+        self.params = params
+
+    def __repr__(self):
+        return f"SpiceModel({self.name}, {self.model_type})"
+
+
+_MODEL_RE = re.compile(r'^\.model\s+(\S+)\s+([A-Za-z_]\w*)\s*(.*)$', re.IGNORECASE)
+
+
+def _parse_model_card(line):
+    match = _MODEL_RE.match(line)
+    if not match:
+        return None
+    name, model_type, params = match.groups()
+    params = params.strip()
+    if params.startswith('(') and params.endswith(')'):
+        params = params[1:-1].strip()
+    return SpiceModel(name.upper(), model_type.upper(), params)
+
+
+_INCLUDE_CARDS = ('.INCLUDE', '.INC', '.LIB')
 
+
+def _include_ref(line, line_upper, base_dir):
+    """Interpreta .include/.inc/.lib.
+
+    Retorna (caminho_resolvido, secao) para cartoes que referenciam arquivo,
+    ou (None, nome) para `.lib nome`, que abre uma secao dentro de uma
+    biblioteca. Caminhos relativos partem do arquivo que contem o cartao.
+    """
+    parts = line.split()
+    card = line_upper.split(None, 1)[0]
+    if card not in _INCLUDE_CARDS or len(parts) < 2:
+        return None
+    if card == '.LIB':
+        if len(parts) < 3:
+            return None, parts[1].upper()
+        section = parts[2].upper()
+    else:
+        section = None
+    target = os.path.expanduser(parts[1].strip('"\''))
+    return (Path(base_dir) / target).resolve(), section
+
+
+class LibraryBlock:
+    """Conteudo de um arquivo incluido (ou de uma secao .lib dele).
+
+    Depois do parse o bloco e compartilhado entre todos os netlists que o
+    incluem e nao deve ser modificado.
+    """
+
+    def __init__(self):
+        self.subckt_defs = {}
+        self.models = {}
+        self.components = []
+        self.instances = []
+        self.includes = []
+
+
+class SpiceLibrary:
+    """Arquivo de biblioteca parseado: bloco principal + secoes .lib."""
+
+    def __init__(self, path, root, sections):
+        self.path = path
+        self.root = root
+        self.sections = sections
+
+    def block(self, section=None):
+        if section is None:
+            return self.root
+        return self.sections.get(section)
+
+
+def _parse_cards(cards, base_dir, root, add_component=None, on_include=None, sections=None):
+    """Despacha os cartoes de um arquivo para um LibraryBlock.
+
+    add_component recebe os elementos de nivel superior (padrao: a lista
+    do bloco). on_include e chamado a cada .include/.lib com arquivo;
+    sections (apenas em bibliotecas) recebe os blocos `.lib nome`/`.endl`.
+    """
+    block = root
+    current_subckt = None
+
+    for line, line_upper in cards:
         if line_upper.startswith('.SUBCKT'):
             parts = line.split()
             if len(parts) >= 2:
                 name = parts[1].upper()
                 pins = _split_subckt_pins(parts[2:])
-                subckt_defs[name] = SubcircuitDefinition(name, pins)
-                current_subckt = name
+                current_subckt = SubcircuitDefinition(name, pins)
+                block.subckt_defs[name] = current_subckt
             continue
         if line_upper.startswith('.ENDS'):
             current_subckt = None
             continue
-
-        if line.startswith('.') or current_subckt is not None and line_upper.startswith('.ENDS'):
+        if line_upper.startswith(_INCLUDE_CARDS):
+            ref = _include_ref(line, line_upper, base_dir)
+            if ref is None:
+                continue
+            path, section = ref
+            if path is None:
+                if sections is not None:
+                    block = sections.setdefault(section, LibraryBlock())
+                continue
+            block.includes.append(ref)
+            if on_include is not None:
+                on_include(path, section)
             continue
-
-        parts = line.split()
-        if not parts:
+        if line_upper.startswith('.ENDL'):
+            block = root
+            continue
+        if line_upper.startswith('.MODEL'):
+            model = _parse_model_card(line)
+            if model is not None:
+                block.models[model.name] = model
+            continue
+        if line.startswith('.'):
             continue
 
+        parts = line.split()
         name = parts[0].upper()
         comp_type = name[0]
 
-        target = components if current_subckt is None else subckt_defs[current_subckt].components
-
         try:
-            if comp_type in ['R', 'C', 'L']:
-                nodes = [parts[1], parts[2]]
-                value = parse_value(parts[3]) if len(parts) > 3 else ""
-                target.append(SpiceComponent(name, comp_type, nodes, value))
-
-            elif comp_type == 'D':
-                nodes = [parts[1], parts[2]]
-                model = parts[3] if len(parts) > 3 else ""
-                target.append(SpiceComponent(name, 'D', nodes, model=model))
-
-            elif comp_type == 'Q':
-                if len(parts) >= 5:
-                    nodes = [parts[1], parts[2], parts[3]]  # C, B, E
-                    model = parts[4]
-                    target.append(SpiceComponent(name, 'Q', nodes, model=model))
-
-            elif comp_type == 'M':
-                if len(parts) >= 6:
-                    nodes = [parts[1], parts[2], parts[3], parts[4]]  # D, G, S, B
-                    model = parts[5]
-                    target.append(SpiceComponent(name, 'M', nodes, model=model))
-
-            elif comp_type == 'J':
-                if len(parts) >= 5:
-                    nodes = [parts[1], parts[2], parts[3]]  # D, G, S
-                    model = parts[4]
-                    target.append(SpiceComponent(name, 'J', nodes, model=model))
-
-            elif comp_type == 'V':
-                nodes = [parts[1], parts[2]]
-                value = ""
-                rest = ' '.join(parts[3:]).upper()
-                dc_match = re.search(r'DC\s+([^\s]+)', rest)
-                if dc_match:
-                    value = parse_value(dc_match.group(1))
-                elif len(parts) > 3 and parts[3].upper() not in ['AC', 'PULSE', 'SIN', 'PWL', 'EXP']:
-                    value = parse_value(parts[3])
-                target.append(SpiceComponent(name, 'V', nodes, value))
-
-            elif comp_type == 'I':
-                nodes = [parts[1], parts[2]]
-                value = ""
-                rest = ' '.join(parts[3:]).upper()
-                dc_match = re.search(r'DC\s+([^\s]+)', rest)
-                if dc_match:
-                    value = parse_value(dc_match.group(1))
-                elif len(parts) > 3 and parts[3].upper() not in ['AC', 'PULSE', 'SIN', 'PWL']:
-                    value = parse_value(parts[3])
-                target.append(SpiceComponent(name, 'I', nodes, value))
-
-            elif comp_type == 'X' and len(parts) >= 3:
+            if comp_type == 'X':
+                if len(parts) < 3:
+                    continue
                 node_list, subckt_name = _split_subckt_instance(parts[1:])
                 if not subckt_name:
                     continue
                 inst = SubcircuitInstance(name, subckt_name.upper(), node_list)
-                if current_subckt:
-                    subckt_defs[current_subckt].instances.append(inst)
+                if current_subckt is not None:
+                    current_subckt.instances.append(inst)
                 else:
-                    instances.append(inst)
+                    block.instances.append(inst)
+                continue
+
+            element_parser = _ELEMENT_PARSERS.get(comp_type)
+            if element_parser is None:
+                continue
+            comp = element_parser(name, comp_type, parts)
+            if comp is None:
+                continue
+            if current_subckt is not None:
+                current_subckt.components.append(comp)
+            elif add_component is not None and block is root:
+                add_component(comp)
+            else:
+                block.components.append(comp)
 
         except (IndexError, ValueError):
             continue
 
-    for inst in instances:
-        components.extend(expand_subcircuit(inst, subckt_defs))
 
-    return components, title
+# Cache de bibliotecas do processo: caminho resolvido -> SpiceLibrary.
+# Cada arquivo incluido e parseado uma unica vez por execucao.
+_LIBRARY_CACHE = {}
+LIBRARY_STATS = {'parses': defaultdict(int), 'hits': defaultdict(int)}
+
+
+def load_library(path):
+    """Retorna o SpiceLibrary de path (resolvido), parseando so na primeira vez.
+
+    Retorna None se o arquivo nao puder ser lido.
+    """
+    path = Path(path)
+    library = _LIBRARY_CACHE.get(path)
+    if library is not None:
+        LIBRARY_STATS['hits'][path] += 1
+        return library
+    root = LibraryBlock()
+    sections = {}
+    try:
+        with open(path, 'r') as f:
+            _parse_cards(_iter_spice_cards(f), path.parent, root, sections=sections)
+    except (OSError, UnicodeDecodeError):
+        return None
+    LIBRARY_STATS['parses'][path] += 1
+    library = SpiceLibrary(path, root, sections)
+    _LIBRARY_CACHE[path] = library
+    return library
+
+
+def clear_library_cache():
+    """Esvazia o cache de bibliotecas e zera os contadores."""
+    _LIBRARY_CACHE.clear()
+    LIBRARY_STATS['parses'].clear()
+    LIBRARY_STATS['hits'].clear()
+
+
+class SpiceNetlist:
+    """Resultado do parse: componentes planos (ComponentTable), titulo e hierarquia original.
+
+    subckt_defs e models incluem as definicoes vindas de .include/.lib
+    (objetos compartilhados com o cache de bibliotecas). include_files lista
+    todos os arquivos alcancados, inclusive os ausentes (missing_includes).
+    As primeiras top_count linhas de components sao os elementos de nivel
+    superior; as demais vem do achatamento das instancias.
+    """
+
+    def __init__(self, components, title, subckt_defs, instances, flattener=None,
+                 models=None, include_files=(), missing_includes=(), top_count=None):
+        self.components = components
+        self.top_count = len(components) if top_count is None else top_count
+        self.title = title
+        self.subckt_defs = subckt_defs
+        self.instances = instances
+        self.flattener = flattener
+        self.models = models if models is not None else {}
+        self.include_files = list(include_files)
+        self.missing_includes = list(missing_includes)
+
+
+def parse_spice_netlist(filepath, max_depth=DEFAULT_MAX_SUBCKT_DEPTH, flatten=True):
+    """Parseia arquivo SPICE e retorna um SpiceNetlist.
+
+    O arquivo e lido em uma unica passada: continuacoes, comentarios,
+    blocos .control e o despacho de cartoes sao tratados em streaming.
+    Cartoes .include/.lib sao resolvidos na posicao em que aparecem,
+    usando o cache de bibliotecas do processo (load_library).
+
+    Com flatten=False (modo hierarquico) as instancias X nao sao
+    expandidas: components fica so com o nivel superior e o flattener
+    apenas compila, sob demanda, os templates usados por hierarchy_pages.
+    """
+    components = ComponentTable()
+    top = LibraryBlock()
+    subckt_defs = top.subckt_defs
+    models = top.models
+    instances = top.instances
+    include_files = []
+    missing = []
+    seen = set()
+
+    def add_component(comp):
+        components.append(comp.name, comp.comp_type, comp.nodes, comp.value, comp.model)
+
+    def include(path, section, active=()):
+        key = (path, section)
+        if key in active:
+            return
+        if path not in seen:
+            seen.add(path)
+            include_files.append(path)
+        library = load_library(path)
+        block = library.block(section) if library is not None else None
+        if block is None:
+            if key not in missing:
+                missing.append(key)
+            return
+        subckt_defs.update(block.subckt_defs)
+        models.update(block.models)
+        for comp in block.components:
+            add_component(comp)
+        instances.extend(block.instances)
+        for sub_path, sub_section in block.includes:
+            include(sub_path, sub_section, active + (key,))
+
+    filepath = Path(filepath)
+    with open(filepath, 'r') as f, span_timer.span('parse'):
+        first_line = next(f, None)
+        if first_line is None:
+            return SpiceNetlist(components, "", subckt_defs, instances)
+
+        title = first_line.strip()
+        if title.startswith('*'):
+            title = title[1:].strip()
+
+        _parse_cards(_iter_spice_cards(f), filepath.resolve().parent, top,
+                     add_component=add_component, on_include=include)
+
+    top_count = len(components)
+    flattener = SubcircuitFlattener(subckt_defs, max_depth)
+    if flatten:
+        with span_timer.span('flatten'):
+            flattener.flatten(instances, table=components)
+        span_timer.count('flattened_components', flattener.component_count)
+
+    return SpiceNetlist(components, title, subckt_defs, instances, flattener,
+                        models, include_files, missing, top_count)
+
+
+def parse_spice_file(filepath, max_depth=DEFAULT_MAX_SUBCKT_DEPTH, cache=None):
+    """Parseia arquivo SPICE e retorna (componentes, titulo)."""
+    if cache is not None:
+        netlist = cache.parse(filepath, max_depth)
+    else:
+        netlist = parse_spice_netlist(filepath, max_depth)
+    return netlist.components, netlist.title
+
+
+# =============================================================================
+# MODO HIERARQUICO (BLOCOS EM VEZ DE ACHATAR)
+# =============================================================================
+
+class SchematicPage:
+    """Uma pagina do modo hierarquico.
+
+    subckt: nome do subcircuito desenhado (None na pagina do nivel
+    superior); components: ComponentTable com os elementos da pagina e
+    uma linha 'X' por instancia (modelo = subcircuito, valor = nomes dos
+    pinos separados por espaco); ports: nos que sao pinos do subcircuito.
+    """
+
+    def __init__(self, subckt, title, components, ports=()):
+        self.subckt = subckt
+        self.title = title
+        self.components = components
+        self.ports = list(ports)
+
+
+def _block_table(components, instances, subckt_defs):
+    """ComponentTable com os componentes e uma linha 'X' por instancia.
+
+    instances: (nome, subcircuito, nos), como SubcircuitTemplate.instances.
+    """
+    max_pins = max([MAX_PINS] + [len(nodes) for _, _, nodes in instances])
+    table = ComponentTable(max_pins=max_pins)
+    for name, comp_type, nodes, value, model in components:
+        table.append(name, comp_type, nodes, value, model)
+    for name, key, nodes in instances:
+        definition = subckt_defs.get(key)
+        pins = ' '.join(definition.pins) if definition is not None else None
+        table.append(name, 'X', nodes, pins, key)
+    return table
+
+
+def _template_rows(tpl):
+    """Componentes e instancias do template com os nomes locais dos nos."""
+    names = tpl.slot_names
+    components = [(name, comp_type, [names[r] for r in refs], value, model)
+                  for name, comp_type, refs, value, model in tpl.components]
+    instances = [(name, key, [names[r] for r in refs]) for name, key, refs in tpl.instances]
+    return components, instances
+
+
+def hierarchy_pages(netlist):
+    """Paginas do modo hierarquico: nivel superior e cada subcircuito usado, uma vez.
+
+    A primeira pagina tem os elementos de nivel superior e as instancias X
+    como blocos. Seguem os subcircuitos alcancaveis a partir delas (em
+    ordem de descoberta), cada um montado uma unica vez a partir do seu
+    SubcircuitTemplate, com suas proprias instancias como blocos, nao
+    importa quantas vezes seja instanciado. Nada e achatado: o custo
+    depende do numero de subcircuitos unicos, nao de instancias.
+    Subcircuitos sem definicao aparecem so como blocos.
+    """
+    subckt_defs = netlist.subckt_defs
+    flattener = netlist.flattener or SubcircuitFlattener(subckt_defs)
+    top = [(c.name, c.comp_type, c.nodes, c.value, c.model)
+           for c in netlist.components[:netlist.top_count]]
+    top_instances = [(inst.name, inst.subckt.upper(), inst.nodes) for inst in netlist.instances]
+    pages = [SchematicPage(None, netlist.title, _block_table(top, top_instances, subckt_defs))]
+    seen = set()
+    queue = deque(key for _, key, _ in top_instances)
+    while queue:
+        key = queue.popleft()
+        if key in seen:
+            continue
+        seen.add(key)
+        tpl = flattener.template(key)
+        if tpl is None:
+            continue
+        definition = subckt_defs[key]
+        components, instances = _template_rows(tpl)
+        title = f"{definition.name} ({' '.join(definition.pins)})"
+        ports = [normalize_node(pin) for pin in definition.pins]
+        pages.append(SchematicPage(definition.name, title,
+                                   _block_table(components, instances, subckt_defs), ports))
+        queue.extend(sub_key for _, sub_key, _ in instances)
+    return pages
+
+
+def hierarchy_instance_count(netlist):
+    """Total de instancias X que o achatamento expandiria, sem achatar.
+
+    Conta por subcircuito unico (memoizado); ciclos contam zero.
+    """
+    flattener = netlist.flattener or SubcircuitFlattener(netlist.subckt_defs)
+    memo = {}
+
+    def below(key):
+        if key in memo:
+            return memo[key]
+        memo[key] = 0
+        tpl = flattener.template(key)
+        total = 0
+        if tpl is not None:
+            total = sum(1 + below(sub_key) for _, sub_key, _ in tpl.instances
+                        if sub_key in flattener.subckt_defs)
+        memo[key] = total
+        return total
+
+    return sum(1 + below(inst.subckt.upper()) for inst in netlist.instances
+               if inst.subckt.upper() in netlist.subckt_defs)
+
+
+# =============================================================================
+# CACHE PERSISTENTE DE PARSE
+# =============================================================================
+
+PARSE_CACHE_VERSION = 3
+DEFAULT_CACHE_ROOT = Path(__file__).resolve().parent.parent / '.cache'
+DEFAULT_PARSE_CACHE_DIR = DEFAULT_CACHE_ROOT / 'spice_parse'
+DEFAULT_PARSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def evict_cache_dir(cache_dir, max_bytes, pattern='*'):
+    """Remove as entradas menos usadas (mtime) ate o diretorio caber em max_bytes."""
+    entries = []
+    total = 0
+    for path in Path(cache_dir).glob(pattern):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+        total += st.st_size
+    entries.sort()
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+class ParseCache:
+    """Cache em disco dos resultados de parse_spice_netlist.
+
+    A chave combina o conteudo do netlist, o diretorio dele (que resolve
+    includes relativos), a profundidade maxima e a versao do formato. Cada
+    entrada guarda o hash de todos os arquivos alcancados por .include/.lib;
+    se algum mudar, a entrada e descartada e o arquivo e parseado de novo.
+    As entradas mais antigas (por uso) sao removidas quando o diretorio
+    passa de max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_PARSE_CACHE_DIR, max_bytes=DEFAULT_PARSE_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, filepath, max_depth, flatten=True):
+        path = Path(filepath).resolve()
+        h = hashlib.sha256()
+        h.update(f"v{PARSE_CACHE_VERSION}|{path.parent}|{max_depth}|flatten={int(flatten)}|".encode())
+        h.update(path.read_bytes())
+        return h.hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}.pickle"
+
+    def load(self, filepath, max_depth=DEFAULT_MAX_SUBCKT_DEPTH, flatten=True):
+        """Retorna o SpiceNetlist em cache ou None se ausente/invalido."""
+        entry_path = self._entry_path(self._key(filepath, max_depth, flatten))
+        try:
+            with open(entry_path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        if entry.get('version') != PARSE_CACHE_VERSION:
+            return None
+        for dep, digest in entry['deps']:
+            if file_digest(dep) != digest:
+                return None
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return entry['netlist']
+
+    def store(self, filepath, netlist, max_depth=DEFAULT_MAX_SUBCKT_DEPTH, flatten=True):
+        deps = [(str(dep), file_digest(dep)) for dep in netlist.include_files]
+        entry = {'version': PARSE_CACHE_VERSION, 'deps': deps, 'netlist': netlist}
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry_path = self._entry_path(self._key(filepath, max_depth, flatten))
+        fd, tmp = tempfile.mkstemp(prefix='.tmp_', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, entry_path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            return
+        evict_cache_dir(self.cache_dir, self.max_bytes, '*.pickle')
+
+    def parse(self, filepath, max_depth=DEFAULT_MAX_SUBCKT_DEPTH, flatten=True):
+        """parse_spice_netlist com cache (entradas separadas com e sem achatamento)."""
+        with span_timer.span('parse_cache'):
+            netlist = self.load(filepath, max_depth, flatten)
+        if netlist is not None:
+            self.hits += 1
+            return netlist
+        self.misses += 1
+        netlist = parse_spice_netlist(filepath, max_depth, flatten)
+        self.store(filepath, netlist, max_depth, flatten)
+        return netlist
+
+
+# =============================================================================
+# CACHE PERSISTENTE DE LAYOUT POR GRUPO
+# =============================================================================
+
+LAYOUT_CACHE_VERSION = 3
+DEFAULT_LAYOUT_CACHE_DIR = DEFAULT_CACHE_ROOT / 'layout'
+DEFAULT_LAYOUT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+class LayoutCache:
+    """Cache em disco do layout de _circuitikz_generic.
+
+    Dois niveis, ambos com chave estrutural (ids dos nos, tipos e nos dos
+    componentes; valores nao entram):
+      - grupo conexo: coordenadas locais do grupo (componentes que tocam o
+        grupo, na ordem do netlist, e seus nos de alimentacao). Grupos
+        inalterados sao reaproveitados; so os alterados sao refeitos.
+      - circuito inteiro (roteador heuristico): o corpo circuitikz com os
+        rotulos trocados por marcadores. Se so valores mudaram, o corpo
+        sai do cache e apenas os rotulos sao preenchidos.
+    Os ids vem da numeracao alfabetica dos nos do circuito inteiro; renomear
+    ou criar nos pode deslocar a numeracao e invalidar grupos vizinhos.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_LAYOUT_CACHE_DIR, max_bytes=DEFAULT_LAYOUT_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.circuit_hits = 0
+        self._stored = False
+
+    @staticmethod
+    def _hash(kind, structure):
+        h = hashlib.sha256(f"v{LAYOUT_CACHE_VERSION}|{kind}|".encode())
+        h.update(repr(structure).encode())
+        return h.hexdigest()
+
+    @classmethod
+    def group_key(cls, group, group_components, supply_nodes, effort):
+        return cls._hash('group', (
+            effort,
+            sorted(group),
+            [(comp.comp_type, comp.node_ids) for comp in group_components],
+            sorted(supply_nodes & group),
+        ))
+
+    @classmethod
+    def circuit_key(cls, components, effort, ports=()):
+        # Nomes viram ids TikZ; o modelo so decide o simbolo dos transistores.
+        # Blocos desenham subcircuito (modelo) e nomes dos pinos (valor).
+        return cls._hash('circuit', (effort, [
+            (comp.comp_type, comp.name, comp.node_ids,
+             comp.model if comp.comp_type in ('Q', 'M', 'J', 'X') else None,
+             comp.value if comp.comp_type == 'X' else None)
+            for comp in components
+        ], sorted(ports)))
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}.pickle"
+
+    def _load(self, key):
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        if entry.get('version') != LAYOUT_CACHE_VERSION:
+            return None
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return entry['data']
+
+    def _store(self, key, data):
+        entry = {'version': LAYOUT_CACHE_VERSION, 'data': data}
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix='.tmp_', dir=self.cache_dir)
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._entry_path(key))
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            return
+        self._stored = True
+
+    def load_group(self, key):
+        """Retorna o dict no -> (x, y) do grupo ou None."""
+        local = self._load(key)
+        if local is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return local
+
+    def store_group(self, key, local):
+        self._store(key, local)
+
+    def load_circuit(self, key):
+        """Retorna o corpo com marcadores de rotulo ou None."""
+        template = self._load(key)
+        if template is not None:
+            self.circuit_hits += 1
+        return template
+
+    def store_circuit(self, key, template):
+        self._store(key, template)
+        self.evict()
+
+    def evict(self):
+        """Aplica o limite de tamanho se algo foi gravado desde a ultima chamada."""
+        if self._stored:
+            self._stored = False
+            evict_cache_dir(self.cache_dir, self.max_bytes, '*.pickle')
 
 
 # =============================================================================
@@ -321,7 +1216,12 @@ def parse_spice_file(filepath):
 
 def normalize_node(node):
     """Normaliza nome de no para netlist interno."""
-    node = str(node).lower().strip()
+    return _normalize_node_cached(str(node))
+
+
+@lru_cache(maxsize=NODE_CACHE_SIZE)
+def _normalize_node_cached(node):
+    node = node.lower().strip()
     # Substituir 0 por 0 (terra)
     if node == '0' or node == 'gnd':
         return '0'
@@ -359,28 +1259,27 @@ def _label_attr_for(comp, value_only=False):
     return ""
 
 
-def _collect_supply_nodes(components):
-    supply_nodes = set()
-    for comp in components:
-        if comp.comp_type != 'V' or len(comp.nodes) < 2:
-            continue
-        n1 = normalize_node(comp.nodes[0])
-        n2 = normalize_node(comp.nodes[1])
-        if n1 == '0' and n2 != '0':
-            supply_nodes.add(n2)
-        elif n2 == '0' and n1 != '0':
-            supply_nodes.add(n1)
-    return supply_nodes
+_LABEL_MARK_RE = re.compile(r'\x00(\d+)\x00')
+
+
+def _label_mark(comp):
+    """Marcador do rotulo de comp (indice na tabela) para corpos em cache."""
+    return f"\x00{comp.index}\x00"
+
+
+def _fill_label_marks(template, components):
+    """Troca os marcadores de _label_mark pelos rotulos atuais dos componentes."""
+    return _LABEL_MARK_RE.sub(lambda m: _label_attr_for(components[int(m.group(1))]), template)
 
 
 def _build_adj_for_types(components, group, types):
     adj = defaultdict(set)
     for comp in components:
-        if comp.comp_type not in types or len(comp.nodes) < 2:
+        if comp.comp_type not in types or len(comp.node_ids) < 2:
             continue
-        n1 = normalize_node(comp.nodes[0])
-        n2 = normalize_node(comp.nodes[1])
-        if n1 == '0' or n2 == '0':
+        n1 = comp.node_ids[0]
+        n2 = comp.node_ids[1]
+        if n1 == GROUND_ID or n2 == GROUND_ID:
             continue
         if n1 in group and n2 in group:
             adj[n1].add(n2)
@@ -388,84 +1287,147 @@ def _build_adj_for_types(components, group, types):
     return adj
 
 
-def _connected_components(adj):
-    comps = []
-    visited = set()
-    for node in adj:
-        if node in visited:
-            continue
-        stack = [node]
-        group = set()
-        while stack:
-            cur = stack.pop()
-            if cur in group:
-                continue
-            group.add(cur)
-            for nxt in adj[cur]:
-                if nxt not in group:
-                    stack.append(nxt)
-        visited |= group
-        comps.append(group)
-    return comps
+def _layout_adjacency(components, bipoles):
+    """Adjacencia (id -> set de ids) usada pelo layout; o terra nao liga nada.
+
+    Bipolos ligam seus dois nos; transistores e blocos (X) ligam o primeiro
+    pino aos demais.
+    """
+    adj = defaultdict(set)
+    for comp in components:
+        if comp.comp_type in bipoles and len(comp.node_ids) >= 2:
+            a = comp.node_ids[0]
+            b = comp.node_ids[1]
+            if a != GROUND_ID and b != GROUND_ID:
+                adj[a].add(b)
+                adj[b].add(a)
+        elif ((comp.comp_type in ('Q', 'M', 'J') and len(comp.node_ids) >= 3)
+              or comp.comp_type == 'X'):
+            pins = [n for n in comp.node_ids if n != GROUND_ID]
+            if len(pins) >= 2:
+                hub = pins[0]
+                for other in pins[1:]:
+                    adj[hub].add(other)
+                    adj[other].add(hub)
+    return adj
 
 
-def _edge_count(adj, nodes):
-    count = 0
-    for n in nodes:
-        for m in adj.get(n, []):
-            if m in nodes:
-                count += 1
-    return count // 2
+class IncidenceIndex:
+    """Indice de incidencia de um esquematico, construido uma vez por layout.
+
+    Uma unica passada pelos componentes preenche:
+      - by_node: no -> posicoes dos componentes que o tocam (ordem do netlist);
+      - by_type: tipo -> componentes (ordem do netlist);
+      - bipoles / transistors: bipolos (2+ nos) e Q/M/J (3+ nos);
+      - floating: bipolos sem terminal no terra; shunts: (bipolo, no) com a
+        outra ponta no terra;
+      - supply_nodes: nos ligados ao terra por fonte V;
+      - ground_tied: nos que recebem um barramento de terra (shunt ou
+        emissor/source no terra);
+      - source_ref: no -> indice da primeira fonte V/I que o liga ao terra.
+    Os helpers do layout leem daqui em vez de varrer todos os componentes.
+    """
+
+    def __init__(self, components, bipoles):
+        self.components = list(components)
+        self.by_node = defaultdict(list)
+        self.by_type = defaultdict(list)
+        self.bipoles = []
+        self.transistors = []
+        self.floating = []
+        self.shunts = []
+        self.supply_nodes = set()
+        self.ground_tied = set()
+        self.source_ref = {}
+        for index, comp in enumerate(self.components):
+            node_ids = comp.node_ids
+            comp_type = comp.comp_type
+            for node in node_ids:
+                refs = self.by_node[node]
+                if not refs or refs[-1] != index:
+                    refs.append(index)
+            self.by_type[comp_type].append(comp)
+            if len(node_ids) >= 2 and comp_type in ('V', 'I'):
+                n1, n2 = node_ids[0], node_ids[1]
+                if (n1 == GROUND_ID) ^ (n2 == GROUND_ID):
+                    other = n2 if n1 == GROUND_ID else n1
+                    self.source_ref.setdefault(other, index)
+                    if comp_type == 'V':
+                        self.supply_nodes.add(other)
+            if comp_type in bipoles and len(node_ids) >= 2:
+                self.bipoles.append(comp)
+                n1, n2 = node_ids[0], node_ids[1]
+                if n1 != GROUND_ID and n2 != GROUND_ID:
+                    self.floating.append(comp)
+                elif (n1 == GROUND_ID) ^ (n2 == GROUND_ID):
+                    other = n2 if n1 == GROUND_ID else n1
+                    self.shunts.append((comp, other))
+                    self.ground_tied.add(other)
+            elif comp_type in ('Q', 'M', 'J') and len(node_ids) >= 3:
+                self.transistors.append(comp)
+                if node_ids[2] == GROUND_ID:
+                    for node in node_ids[:3]:
+                        if node != GROUND_ID:
+                            self.ground_tied.add(node)
+                            break
+
+    def group_components(self, group):
+        """Componentes que tocam algum no do grupo, na ordem do netlist."""
+        indices = set()
+        for node in group:
+            indices.update(self.by_node.get(node, ()))
+        return [self.components[i] for i in sorted(indices)]
+
+    def ground_source(self, group):
+        """No do grupo ligado ao terra pela primeira fonte V/I do netlist (ou None)."""
+        best = None
+        for node in group:
+            index = self.source_ref.get(node)
+            if index is not None and (best is None or index < best[0]):
+                best = (index, node)
+        return best[1] if best else None
 
 
 def _transistor_pins(comp):
-    if comp.comp_type == 'Q' and len(comp.nodes) >= 3:
+    if comp.comp_type == 'Q' and len(comp.node_ids) >= 3:
         return {
-            'collector': normalize_node(comp.nodes[0]),
-            'base': normalize_node(comp.nodes[1]),
-            'emitter': normalize_node(comp.nodes[2]),
+            'collector': comp.node_ids[0],
+            'base': comp.node_ids[1],
+            'emitter': comp.node_ids[2],
         }
-    if comp.comp_type in ('M', 'J') and len(comp.nodes) >= 3:
+    if comp.comp_type in ('M', 'J') and len(comp.node_ids) >= 3:
         return {
-            'drain': normalize_node(comp.nodes[0]),
-            'gate': normalize_node(comp.nodes[1]),
-            'source': normalize_node(comp.nodes[2]),
+            'drain': comp.node_ids[0],
+            'gate': comp.node_ids[1],
+            'source': comp.node_ids[2],
         }
     return {}
 
 
-def _find_tank_nodes(group, components, main_pins, control_pin):
-    reactive_adj = _build_adj_for_types(components, group, ('L', 'C'))
+def _find_tank_nodes(reactive_adj, main_pins, control_pin):
+    """Maior cluster L/C ligado aos pinos do transistor (reactive_adj: so L e C do grupo)."""
     if not reactive_adj:
         return set()
-    comps = _connected_components(reactive_adj)
+    comps = connected_components(reactive_adj)
     best = set()
     best_score = (-1, -1, -1)
     for comp_nodes in comps:
         if not (comp_nodes & (main_pins | {control_pin})):
             continue
-        edge_count = _edge_count(reactive_adj, comp_nodes)
+        edges = edge_count(reactive_adj, comp_nodes)
         pin_priority = 2 if comp_nodes & main_pins else 1
-        score = (edge_count, pin_priority, len(comp_nodes))
+        score = (edges, pin_priority, len(comp_nodes))
         if score > best_score:
             best_score = score
             best = comp_nodes
     return best
 
 
-def _find_bias_nodes(group, components, control_pin, block_nodes):
-    bias_adj = _build_adj_for_types(components, group, ('R', 'C'))
+def _find_bias_nodes(bias_adj, control_pin, block_nodes):
+    """Nos de polarizacao alcancaveis do pino de controle (bias_adj: so R e C do grupo)."""
     if control_pin not in bias_adj:
         return set()
-    visited = {control_pin}
-    stack = [control_pin]
-    while stack:
-        cur = stack.pop()
-        for nxt in bias_adj.get(cur, []):
-            if nxt in visited or nxt in block_nodes:
-                continue
-            visited.add(nxt)
-            stack.append(nxt)
+    visited = reachable(bias_adj, control_pin, block_nodes)
     visited.discard(control_pin)
     return visited
 
@@ -474,14 +1436,7 @@ def _layout_cluster_nodes(nodes, adj, ref_node, origin, x_step, y_step, x_dir=1)
     if not nodes:
         return {}
     ref = ref_node if ref_node in nodes else next(iter(nodes))
-    level = {ref: 0}
-    queue = [ref]
-    while queue:
-        cur = queue.pop(0)
-        for nxt in adj.get(cur, []):
-            if nxt in nodes and nxt not in level:
-                level[nxt] = level[cur] + 1
-                queue.append(nxt)
+    level = bfs_levels(adj, [ref], nodes)
     max_level = max(level.values()) if level else 0
     for n in nodes:
         if n not in level:
@@ -512,11 +1467,11 @@ def _group_layout_params(group, group_components):
     has_inductor = any(comp.comp_type == 'L' for comp in group_components)
     cap_shunt_only = True
     for comp in group_components:
-        if comp.comp_type != 'C' or len(comp.nodes) < 2:
+        if comp.comp_type != 'C' or len(comp.node_ids) < 2:
             continue
-        n1 = normalize_node(comp.nodes[0])
-        n2 = normalize_node(comp.nodes[1])
-        if n1 != '0' and n2 != '0':
+        n1 = comp.node_ids[0]
+        n2 = comp.node_ids[1]
+        if n1 != GROUND_ID and n2 != GROUND_ID:
             cap_shunt_only = False
             break
 
@@ -548,6 +1503,7 @@ def create_netlist(components, title):
     """
     if not components:
         return ""
+    components = ComponentTable.from_components(components)
 
     # Caso especial: 1 fonte de tensao + resistores -> layout manual
     if _is_simple_voltage_fan(components):
@@ -564,9 +1520,7 @@ def create_netlist(components, title):
     # Primeiro passar: identificar todos os nos unicos
     all_nodes = set()
     for comp in components:
-        for node in comp.nodes[:4]:  # Max 4 nodes (MOSFET)
-            n = normalize_node(node)
-            all_nodes.add(n)
+        all_nodes.update(comp.nodes)
 
     # Remover ground
     all_nodes.discard('0')
@@ -580,8 +1534,8 @@ def create_netlist(components, title):
     connection_map = defaultdict(list)
     for comp in components:
         if len(comp.nodes) >= 2:
-            n1 = node_map.get(normalize_node(comp.nodes[0]), '0')
-            n2 = node_map.get(normalize_node(comp.nodes[1]), '0')
+            n1 = node_map.get(comp.nodes[0], '0')
+            n2 = node_map.get(comp.nodes[1], '0')
             key = tuple(sorted([n1, n2]))
             connection_map[key].append(comp)
 
@@ -618,8 +1572,8 @@ def create_netlist(components, title):
             wires_needed.append((orig_node, aux_node))
             n1, n2 = aux_node, gnd_node
         else:
-            n1 = node_map.get(normalize_node(comp.nodes[0]), '0')
-            n2 = node_map.get(normalize_node(comp.nodes[1]), '0')
+            n1 = node_map.get(comp.nodes[0], '0')
+            n2 = node_map.get(comp.nodes[1], '0')
 
         # Determinar orientacao
         is_to_ground = (n2 == '0' or n1 == '0')
@@ -677,9 +1631,9 @@ def create_netlist(components, title):
         elif comp.comp_type == 'Q':
             # BJT: precisa de 3 terminais (C, B, E)
             if len(comp.nodes) >= 3:
-                c = node_map.get(normalize_node(comp.nodes[0]), '1')
-                b = node_map.get(normalize_node(comp.nodes[1]), '2')
-                e = node_map.get(normalize_node(comp.nodes[2]), '0')
+                c = node_map.get(comp.nodes[0], '1')
+                b = node_map.get(comp.nodes[1], '2')
+                e = node_map.get(comp.nodes[2], '0')
 
                 is_npn = 'PNP' not in (comp.model or '').upper()
                 kind = 'npn' if is_npn else 'pnp'
@@ -689,9 +1643,9 @@ def create_netlist(components, title):
         elif comp.comp_type == 'M':
             # MOSFET: D, G, S, B
             if len(comp.nodes) >= 3:
-                d = node_map.get(normalize_node(comp.nodes[0]), '1')
-                g = node_map.get(normalize_node(comp.nodes[1]), '2')
-                s = node_map.get(normalize_node(comp.nodes[2]), '0')
+                d = node_map.get(comp.nodes[0], '1')
+                g = node_map.get(comp.nodes[1], '2')
+                s = node_map.get(comp.nodes[2], '0')
 
                 is_nmos = 'PMOS' not in (comp.model or '').upper()
                 kind = 'nfet' if is_nmos else 'pfet'
@@ -701,9 +1655,9 @@ def create_netlist(components, title):
         elif comp.comp_type == 'J':
             # JFET: D, G, S
             if len(comp.nodes) >= 3:
-                d = node_map.get(normalize_node(comp.nodes[0]), '1')
-                g = node_map.get(normalize_node(comp.nodes[1]), '2')
-                s = node_map.get(normalize_node(comp.nodes[2]), '0')
+                d = node_map.get(comp.nodes[0], '1')
+                g = node_map.get(comp.nodes[1], '2')
+                s = node_map.get(comp.nodes[2], '0')
 
                 is_njf = 'PJF' not in (comp.model or '').upper()
                 kind = 'njfet' if is_njf else 'pjfet'
@@ -736,7 +1690,7 @@ def _is_simple_current_divider(components):
     # Verificar que há pelo menos uma fonte de corrente conectada entre 0 e outro nó
     has_valid_i = False
     for i_src in current_sources:
-        n1, n2 = normalize_node(i_src.nodes[0]), normalize_node(i_src.nodes[1])
+        n1, n2 = i_src.nodes[0], i_src.nodes[1]
         if '0' in (n1, n2):
             has_valid_i = True
             break
@@ -754,7 +1708,7 @@ def _extract_current_divider_groups(components):
     groups = []
 
     for i_src in current_sources:
-        n1, n2 = normalize_node(i_src.nodes[0]), normalize_node(i_src.nodes[1])
+        n1, n2 = i_src.nodes[0], i_src.nodes[1]
         if n1 == '0':
             hub = n2
         elif n2 == '0':
@@ -768,7 +1722,7 @@ def _extract_current_divider_groups(components):
             if comp.name == i_src.name:
                 continue
             if comp.comp_type in ('R', 'D'):
-                cn1, cn2 = normalize_node(comp.nodes[0]), normalize_node(comp.nodes[1])
+                cn1, cn2 = comp.nodes[0], comp.nodes[1]
                 # Resistor direto hub-ground
                 if comp.comp_type == 'R' and set([cn1, cn2]) == set([hub, '0']):
                     parallel.append([comp])
@@ -778,7 +1732,7 @@ def _extract_current_divider_groups(components):
                     # Procurar resistor desse nó intermediário para ground
                     for r in components:
                         if r.comp_type == 'R':
-                            rn1, rn2 = normalize_node(r.nodes[0]), normalize_node(r.nodes[1])
+                            rn1, rn2 = r.nodes[0], r.nodes[1]
                             if set([rn1, rn2]) == set([other, '0']):
                                 parallel.append([comp, r])
                                 break
@@ -795,14 +1749,13 @@ def _is_simple_voltage_fan(components):
         return False
     if any(c.comp_type not in ('V', 'R') for c in components):
         return False
-    nodes = [normalize_node(n) for n in vs[0].nodes]
-    return '0' in nodes
+    return '0' in vs[0].nodes
 
 
 def _create_netlist_simple_fan(components):
     """Layout manual estilo tutorial para um fan de resistores."""
     v = next(c for c in components if c.comp_type == 'V')
-    n1, n0 = normalize_node(v.nodes[0]), normalize_node(v.nodes[1])
+    n1, n0 = v.nodes[0], v.nodes[1]
     hub, gnd = (n1, n0) if n0 == '0' else (n0, n1)
     if gnd != '0':
         return None
@@ -810,7 +1763,7 @@ def _create_netlist_simple_fan(components):
     resistors = [c for c in components if c.comp_type == 'R']
     adj = defaultdict(list)
     for r in resistors:
-        a, b = normalize_node(r.nodes[0]), normalize_node(r.nodes[1])
+        a, b = r.nodes[0], r.nodes[1]
         adj[a].append((r, b))
         adj[b].append((r, a))
 
@@ -840,7 +1793,7 @@ def _create_netlist_simple_fan(components):
     for r in resistors:
         if r.name in used:
             continue
-        a, b = normalize_node(r.nodes[0]), normalize_node(r.nodes[1])
+        a, b = r.nodes[0], r.nodes[1]
         if hub not in (a, b):
             continue
         other = b if a == hub else a
@@ -858,13 +1811,13 @@ def _create_netlist_simple_fan(components):
         current = branch_node
         for j, r in enumerate(chain):
             is_last = (j == len(chain) - 1)
-            end_norm = normalize_node(end_node)
+            end_norm = end_node
             dest = '0' if is_last and end_norm == '0' else f"{branch_node}_n{j}"
             orient = 'down' if is_last and end_norm == '0' else 'right'
             val = r.value or ""
             lines.append(f"R{r.name[1:]} {current} {dest} {val}; {orient}")
             current = dest
-        if normalize_node(end_node) == '0':
+        if end_node == '0':
             lines.append(f"W {current} 0; down")
 
     lines.append("; draw_nodes=connections, label_nodes=none")
@@ -875,13 +1828,13 @@ def _extract_fan_branches(components):
     """Extrai hub, resistores em ramos, e valor da fonte (sem linearizar ramos)."""
     v = next(c for c in components if c.comp_type == 'V')
     v_value = v.value or v.name
-    n1, n0 = normalize_node(v.nodes[0]), normalize_node(v.nodes[1])
+    n1, n0 = v.nodes[0], v.nodes[1]
     hub, gnd = (n1, n0) if n0 == '0' else (n0, n1)
     resistors = [c for c in components if c.comp_type == 'R']
 
     adj = defaultdict(list)
     for r in resistors:
-        a, b = normalize_node(r.nodes[0]), normalize_node(r.nodes[1])
+        a, b = r.nodes[0], r.nodes[1]
         adj[a].append((r, b))
         adj[b].append((r, a))
 
@@ -891,7 +1844,7 @@ def _extract_fan_branches(components):
     for r in resistors:
         if r.name in used:
             continue
-        a, b = normalize_node(r.nodes[0]), normalize_node(r.nodes[1])
+        a, b = r.nodes[0], r.nodes[1]
         if hub not in (a, b):
             continue
         other = b if a == hub else a
@@ -948,7 +1901,7 @@ def _circuitikz_simple_fan(components, title):
             current = start
             for j, r in enumerate(chain):
                 is_last = (j == len(chain) - 1)
-                end_norm = normalize_node(end_node)
+                end_norm = end_node
                 label_attr = _label_attr_for(r)
                 step_x, step_y = (2 if dx > 0 else -2), 0
 
@@ -983,7 +1936,7 @@ def _circuitikz_simple_fan(components, title):
             y_offset = 0
             for j, r in enumerate(chain):
                 is_last = (j == len(chain) - 1)
-                end_norm = normalize_node(end_node)
+                end_norm = end_node
                 label_attr = _label_attr_for(r)
 
                 if is_last and end_norm == '0':
@@ -1086,17 +2039,50 @@ def _circuitikz_current_divider(components, title):
     return "\n".join(lines)
 
 
-def _circuitikz_generic(components, title):
-    """Gera circuito circuitikz com layout hierarquico."""
+ROUTERS = ('heuristic', 'astar')
+DEFAULT_ROUTE_BUDGET = 0.05
+
+
+def _circuitikz_generic(components, title, router='heuristic', route_budget=DEFAULT_ROUTE_BUDGET,
+                        route_stats=None, layout_cache=None, layout_effort=DEFAULT_EFFORT,
+                        layout_stats=None, ports=()):
+    """Gera circuito circuitikz com layout hierarquico.
+
+    Todo o grafo (adj, grupos, coords, node_ids) usa ids inteiros de nos.
+    A tabela e renumerada em ordem alfabetica, entao ordenar ids reproduz
+    exatamente a ordenacao por nome.
+
+    router: 'heuristic' (ortho_path, duas dobras) ou 'astar' (maze_router,
+    com route_budget segundos por fio antes de cair na heuristica).
+    route_stats: dict opcional preenchido com comprimento total dos fios,
+    cruzamentos, tempo de roteamento e fallbacks.
+    layout_cache: LayoutCache opcional; grupos com a mesma estrutura reusam
+    as coordenadas locais gravadas e so os grupos alterados sao refeitos.
+    Com o roteador heuristico, um circuito de mesma estrutura reusa o corpo
+    inteiro e so os rotulos (valores) sao preenchidos de novo.
+    layout_effort: esforco da reducao de cruzamentos (crossing_reduction.EFFORTS).
+    layout_stats: dict opcional com grupos refeitos, cruzamentos antes/depois
+    e tempo da reducao de cruzamentos.
+    ports: nomes dos nos que sao pinos do subcircuito desenhado (paginas de
+    hierarchy_pages); ganham um terminal com o nome. Componentes 'X' sao
+    desenhados como caixas com um fio por pino.
+    """
+    components = ComponentTable.from_components(components).with_sorted_nodes()
+    label_for = _label_attr_for
+    circuit_key = None
+    if layout_cache is not None and router == 'heuristic':
+        circuit_key = layout_cache.circuit_key(components, layout_effort, ports)
+        template = layout_cache.load_circuit(circuit_key)
+        if template is not None:
+            return _fill_label_marks(template, components)
+        label_for = _label_mark
     bipoles = {'R', 'C', 'L', 'V', 'I', 'D'}
     # Espaçamento reduzido para circuitos mais compactos
     dx, dy = 7, 4.5  # Reduzido de 10,6 para tornar schematics menores
-    nodes = set()
-    for comp in components:
-        for node in comp.nodes[:4]:
-            n = normalize_node(node)
-            if n != '0':
-                nodes.add(n)
+    phase = span_timer.begin('graph')
+    incidence = IncidenceIndex(components, bipoles)
+    nodes = set(incidence.by_node)
+    nodes.discard(GROUND_ID)
     if not nodes:
         return None
 
@@ -1104,53 +2090,20 @@ def _circuitikz_generic(components, title):
     node_ids = {n: f"n{idx}" for idx, n in enumerate(nodes)}
 
     # Grafo para BFS (sem ground)
-    adj = defaultdict(set)
-    for comp in components:
-        if comp.comp_type in bipoles and len(comp.nodes) >= 2:
-            a = normalize_node(comp.nodes[0])
-            b = normalize_node(comp.nodes[1])
-            if a != '0' and b != '0':
-                adj[a].add(b)
-                adj[b].add(a)
-        elif comp.comp_type in ('Q', 'M', 'J') and len(comp.nodes) >= 3:
-            pins = [normalize_node(n) for n in comp.nodes[:4] if normalize_node(n) != '0']
-            if len(pins) >= 2:
-                hub = pins[0]
-                for other in pins[1:]:
-                    adj[hub].add(other)
-                    adj[other].add(hub)
+    adj = _layout_adjacency(incidence.components, bipoles)
 
     # Componentes desconectados (ignora ground como ligacao)
-    components_nodes = []
-    visited = set()
-    for n in nodes:
-        if n in visited:
-            continue
-        stack = [n]
-        group = set()
-        while stack:
-            cur = stack.pop()
-            if cur in group:
-                continue
-            group.add(cur)
-            for nxt in adj[cur]:
-                if nxt not in group:
-                    stack.append(nxt)
-        visited |= group
-        components_nodes.append(group)
+    components_nodes = connected_components(adj, nodes)
+    span_timer.end(phase)
+    span_timer.count('components', len(components))
+    span_timer.count('groups', len(components_nodes))
 
     def choose_ref(group):
-        for comp in components:
-            if comp.comp_type not in ('V', 'I') or len(comp.nodes) < 2:
-                continue
-            n1 = normalize_node(comp.nodes[0])
-            n2 = normalize_node(comp.nodes[1])
-            if n1 in group and n2 == '0':
-                return n1
-            if n2 in group and n1 == '0':
-                return n2
-        degrees = {n: len(adj[n]) for n in group}
-        return max(group, key=lambda n: (degrees.get(n, 0), n))
+        source_node = incidence.ground_source(group)
+        if source_node is not None:
+            return source_node
+        group_degrees = degree_table(adj, group)
+        return max(group, key=lambda n: (group_degrees.get(n, 0), n))
 
     def layout_group(group, fixed=None, scale=1.0, level_max_nodes=None):
         fixed = fixed or {}
@@ -1158,34 +2111,23 @@ def _circuitikz_generic(components, title):
         local_dy = dy * scale
 
         # MELHORADO: Atribuição hierárquica de camadas (VCC -> componentes -> GND)
-        level = {}
 
         # Identificar nós de supply (conectados a VCC via fonte)
-        supply_in_group = set(supply_nodes) & group
+        supply_in_group = supply_nodes & group
 
         # Estratégia hierárquica: começar de nós fixed ou supply nodes
         if fixed:
             # Se há nós fixos, usá-los como raiz
-            for n in fixed:
-                if n in group:
-                    level[n] = 0
+            roots = [n for n in fixed if n in group]
         elif supply_in_group:
             # Começar dos nós de alimentação (topo da hierarquia)
-            for n in supply_in_group:
-                level[n] = 0
+            roots = list(supply_in_group)
         else:
             # Fallback: escolher nó de referência
-            ref = choose_ref(group)
-            level[ref] = 0
+            roots = [choose_ref(group)]
 
         # BFS para atribuir camadas
-        queue = list(level.keys())
-        while queue:
-            cur = queue.pop(0)
-            for nxt in adj[cur]:
-                if nxt in group and nxt not in level:
-                    level[nxt] = level[cur] + 1
-                    queue.append(nxt)
+        level = bfs_levels(adj, roots, group)
 
         # Nós não alcançados
         max_level = max(level.values()) if level else 0
@@ -1203,35 +2145,20 @@ def _circuitikz_generic(components, title):
         for lvl, group_nodes in by_level.items():
             order[lvl] = sorted(group_nodes)
 
-        # MELHORADO: Crossing reduction com mais iterações (barycenter heuristic)
-        max_lvl = max(order.keys()) if order else 0
-        for iteration in range(5):  # Aumentado de 2 para 5 iterações
-            # Forward pass: ordenar baseado em camada anterior
-            for lvl in range(1, max_lvl + 1):
-                prev = order.get(lvl - 1, [])
-                prev_idx = {n: i for i, n in enumerate(prev)}
-
-                def key_prev(n):
-                    indices = [prev_idx[p] for p in adj[n] if p in prev_idx]
-                    if not indices:
-                        return len(prev) / 2
-                    # Barycenter: média das posições dos vizinhos
-                    return sum(indices) / len(indices)
-
-                order[lvl].sort(key=key_prev)
-
-            # Backward pass: ordenar baseado em camada seguinte
-            for lvl in range(max_lvl - 1, -1, -1):
-                nxt = order.get(lvl + 1, [])
-                nxt_idx = {n: i for i, n in enumerate(nxt)}
-
-                def key_next(n):
-                    indices = [nxt_idx[p] for p in adj[n] if p in nxt_idx]
-                    if not indices:
-                        return len(nxt) / 2
-                    return sum(indices) / len(indices)
-
-                order[lvl].sort(key=key_next)
+        # Reducao de cruzamentos entre camadas (crossing_reduction): para
+        # quando uma rodada nao melhora e devolve a melhor ordem vista.
+        began = time.perf_counter()
+        layers, before, after = reduce_crossings(
+            [order.get(lvl, []) for lvl in range(max(order.keys()) + 1 if order else 0)],
+            adj, layout_effort)
+        order = dict(enumerate(layers))
+        if layout_stats is not None:
+            layout_stats['groups'] = layout_stats.get('groups', 0) + 1
+            layout_stats['crossings_before'] = layout_stats.get('crossings_before', 0) + before
+            layout_stats['crossings_after'] = layout_stats.get('crossings_after', 0) + after
+            layout_stats['seconds'] = layout_stats.get('seconds', 0.0) + time.perf_counter() - began
+        span_timer.count('crossings_before', before)
+        span_timer.count('crossings_after', after)
 
         if level_max_nodes:
             new_order = {}
@@ -1277,14 +2204,14 @@ def _circuitikz_generic(components, title):
     group_frame_x = 6
     group_frame_y = 4
 
-    supply_nodes = _collect_supply_nodes(components)
+    supply_nodes = incidence.supply_nodes
 
     def fixed_for_group(group, group_components, scale):
         transistors = []
         for comp in group_components:
             if comp.comp_type not in ('Q', 'M', 'J'):
                 continue
-            nodes_list = [normalize_node(n) for n in comp.nodes[:3]]
+            nodes_list = comp.node_ids[:3]
             if any(n in group for n in nodes_list):
                 transistors.append(comp)
         if len(transistors) != 1:
@@ -1311,9 +2238,9 @@ def _circuitikz_generic(components, title):
             fixed[pins['drain']] = (0, pin_dy)
             fixed[pins['source']] = (0, -pin_dy)
 
-        tank_nodes = _find_tank_nodes(group, group_components, main_pins, control)
+        tank_adj = _build_adj_for_types(group_components, group, ('L', 'C'))
+        tank_nodes = _find_tank_nodes(tank_adj, main_pins, control)
         if tank_nodes:
-            tank_adj = _build_adj_for_types(group_components, group, ('L', 'C'))
             tank_nodes = {n for n in tank_nodes if n not in fixed}
             origin = (pin_dx + 6 * scale, 0)
             tank_positions = _layout_cluster_nodes(
@@ -1327,10 +2254,10 @@ def _circuitikz_generic(components, title):
             )
             fixed.update(tank_positions)
 
-        block_nodes = set(main_pins) | set(supply_nodes) | tank_nodes
-        bias_nodes = _find_bias_nodes(group, group_components, control, block_nodes)
+        block_nodes = main_pins | (supply_nodes & group) | tank_nodes
+        bias_adj = _build_adj_for_types(group_components, group, ('R', 'C'))
+        bias_nodes = _find_bias_nodes(bias_adj, control, block_nodes)
         if bias_nodes:
-            bias_adj = _build_adj_for_types(group_components, group, ('R', 'C'))
             origin = (-pin_dx - 6 * scale, 0)
             bias_positions = _layout_cluster_nodes(
                 bias_nodes,
@@ -1343,21 +2270,30 @@ def _circuitikz_generic(components, title):
             )
             fixed.update(bias_positions)
 
-        supply_in_group = sorted(n for n in supply_nodes if n in group and n not in fixed)
+        supply_in_group = sorted(n for n in supply_nodes & group if n not in fixed)
         for idx, node in enumerate(supply_in_group):
             fixed[node] = (idx * 4 * scale, pin_dy + 8 * scale)
 
         return fixed
 
+    phase = span_timer.begin('groups')
     group_infos = []
     for group in components_nodes:
-        group_components = [
-            comp for comp in components
-            if any(normalize_node(n) in group for n in comp.nodes[:4])
-        ]
-        scale, level_max_nodes = _group_layout_params(group, group_components)
-        fixed = fixed_for_group(group, group_components, scale)
-        local = layout_group(group, fixed, scale=scale, level_max_nodes=level_max_nodes)
+        group_components = incidence.group_components(group)
+        local = None
+        if layout_cache is not None:
+            group_key = layout_cache.group_key(group, group_components, supply_nodes, layout_effort)
+            with span_timer.span('layout_cache'):
+                local = layout_cache.load_group(group_key)
+        if local is None:
+            scale, level_max_nodes = _group_layout_params(group, group_components)
+            with span_timer.span('fixed_for_group'):
+                fixed = fixed_for_group(group, group_components, scale)
+            with span_timer.span('layout_group'):
+                local = layout_group(group, fixed, scale=scale, level_max_nodes=level_max_nodes)
+            if layout_cache is not None:
+                with span_timer.span('layout_cache'):
+                    layout_cache.store_group(group_key, local)
         xs = [v[0] for v in local.values()]
         ys = [v[1] for v in local.values()]
         if not xs or not ys:
@@ -1367,7 +2303,11 @@ def _circuitikz_generic(components, title):
         width = (maxx - minx) + 2 * (group_padding_x + group_frame_x)
         height = (maxy - miny) + 2 * (group_padding_y + group_frame_y)
         group_infos.append((group, local, minx, miny, width, height))
+    if layout_cache is not None:
+        layout_cache.evict()
+    span_timer.end(phase)
 
+    phase = span_timer.begin('columns')
     n_groups = len(group_infos)
     use_columns = n_groups >= 3
     if use_columns:
@@ -1429,6 +2369,9 @@ def _circuitikz_generic(components, title):
         x, y = coords[n]
         coords[n] = (snap(x), snap(y))
 
+    span_timer.end(phase)
+
+    phase = span_timer.begin('buses')
     # Mapear grupos para rails locais
     group_of = {}
     for idx, group in enumerate(components_nodes):
@@ -1443,35 +2386,16 @@ def _circuitikz_generic(components, title):
             group_bounds[idx] = (min(xs), max(xs), min(ys), max(ys))
 
     supply_nodes_by_group = defaultdict(list)
-    for comp in components:
-        if comp.comp_type != 'V' or len(comp.nodes) < 2:
-            continue
-        n1 = normalize_node(comp.nodes[0])
-        n2 = normalize_node(comp.nodes[1])
-        if n1 == '0' and n2 in coords:
-            supply_nodes_by_group[group_of[n2]].append(n2)
-        elif n2 == '0' and n1 in coords:
-            supply_nodes_by_group[group_of[n1]].append(n1)
+    for node in supply_nodes:
+        if node in coords:
+            supply_nodes_by_group[group_of[node]].append(node)
 
     # MELHORADO: Detectar TODOS os componentes conectados a ground
+    # (bipolos com 1 no em ground, transistores com emitter/source em ground)
     has_ground_by_group = defaultdict(bool)
-    for comp in components:
-        # Bipolos (R, C, L, V, I, D) com pelo menos 1 nó em ground
-        if comp.comp_type in bipoles and len(comp.nodes) >= 2:
-            n1 = normalize_node(comp.nodes[0])
-            n2 = normalize_node(comp.nodes[1])
-            if (n1 == '0') ^ (n2 == '0'):
-                other = n2 if n1 == '0' else n1
-                if other in coords:
-                    has_ground_by_group[group_of[other]] = True
-        # Transistores com emitter/source em ground
-        elif comp.comp_type in ('Q', 'M', 'J') and len(comp.nodes) >= 3:
-            if normalize_node(comp.nodes[2]) == '0':
-                for n in comp.nodes[:3]:
-                    nn = normalize_node(n)
-                    if nn in coords:
-                        has_ground_by_group[group_of[nn]] = True
-                        break
+    for node in incidence.ground_tied:
+        if node in coords:
+            has_ground_by_group[group_of[node]] = True
 
     lines = []
     lines.append("\\begin{circuitikz}[american voltages]")
@@ -1506,17 +2430,13 @@ def _circuitikz_generic(components, title):
             gnd_bus_name[idx] = f"gndbusL_g{idx}"
             gnd_y_by_group[idx] = ground_y
 
-    degrees = {n: len(adj[n]) for n in nodes}
+    degrees = degree_table(adj, nodes)
 
     # Offsets para componentes paralelos entre dois nos
     edge_groups = defaultdict(list)
-    for comp in components:
-        if comp.comp_type not in bipoles or len(comp.nodes) < 2:
-            continue
-        n1 = normalize_node(comp.nodes[0])
-        n2 = normalize_node(comp.nodes[1])
-        if n1 == '0' or n2 == '0':
-            continue
+    for comp in incidence.floating:
+        n1 = comp.node_ids[0]
+        n2 = comp.node_ids[1]
         key = tuple(sorted([n1, n2]))
         edge_groups[key].append(comp)
 
@@ -1532,14 +2452,9 @@ def _circuitikz_generic(components, title):
 
     # Offsets para componentes em ground
     ground_groups = defaultdict(list)
-    for comp in components:
-        if comp.comp_type in bipoles and len(comp.nodes) >= 2:
-            n1 = normalize_node(comp.nodes[0])
-            n2 = normalize_node(comp.nodes[1])
-            if (n1 == '0') ^ (n2 == '0'):
-                other = n2 if n1 == '0' else n1
-                if other in node_ids:
-                    ground_groups[other].append(comp)
+    for comp, other in incidence.shunts:
+        if other in node_ids:
+            ground_groups[other].append(comp)
 
     # Barramento para muitos shunts no mesmo no
     bus_nodes = {node: comps for node, comps in ground_groups.items() if len(comps) >= 2}
@@ -1590,14 +2505,10 @@ def _circuitikz_generic(components, title):
 
     # Mapear componentes bipolares para detectar cruzamentos
     component_segments = []
-    for comp in components:
-        if comp.comp_type not in bipoles or len(comp.nodes) < 2:
-            continue
-        n1 = normalize_node(comp.nodes[0])
-        n2 = normalize_node(comp.nodes[1])
-        # Ignorar componentes conectados a ground (sao verticais)
-        if n1 == '0' or n2 == '0':
-            continue
+    # Componentes conectados a ground ficam de fora (sao verticais)
+    for comp in incidence.floating:
+        n1 = comp.node_ids[0]
+        n2 = comp.node_ids[1]
         if n1 in coords and n2 in coords:
             x1, y1 = coords[n1]
             x2, y2 = coords[n2]
@@ -1609,107 +2520,88 @@ def _circuitikz_generic(components, title):
         for x1, y1, x2, y2, name in component_segments[:5]:
             print(f"  {name}: ({x1},{y1}) -> ({x2},{y2})")
 
-    def segment_hits_nodes(x1, y1, x2, y2, ignore):
-        hits = 0
-        if x1 == x2:
-            ymin, ymax = sorted([y1, y2])
-            for node, (nx, ny) in node_positions.items():
-                if node in ignore:
+    # Testes de colisao via indice espacial (baldes da grade + arvores de
+    # intervalos); mesmos resultados da varredura linear, sem percorrer
+    # todos os nos/componentes/barramentos a cada dobra.
+    span_timer.end(phase)
+
+    phase = span_timer.begin('route_index')
+    route_index = RouteIndex(route_grid, node_positions, component_segments, bus_segments)
+    bend_hits_node = route_index.bend_hits_node
+
+    def known_bends():
+        """Dobras em L que a heuristica vai pontuar (bipolos e pinos de transistores)."""
+        for comp in incidence.bipoles + incidence.transistors:
+            if comp.comp_type in bipoles:
+                n1, n2 = comp.node_ids[0], comp.node_ids[1]
+                if (n1 == GROUND_ID) ^ (n2 == GROUND_ID):
                     continue
-                if abs(nx - x1) < 0.01 and ymin < ny < ymax:
-                    hits += 1
-        elif y1 == y2:
-            xmin, xmax = sorted([x1, x2])
-            for node, (nx, ny) in node_positions.items():
-                if node in ignore:
+                if n1 not in node_ids or n2 not in node_ids:
                     continue
-                if abs(ny - y1) < 0.01 and xmin < nx < xmax:
-                    hits += 1
-        return hits
-
-    def segment_hits_components(x1, y1, x2, y2, ignore_comps=set()):
-        """Detecta se um segmento cruza sobre componentes bipolares."""
-        hits = 0
-
-        if abs(x1 - x2) < 0.01 and abs(y1 - y2) < 0.01:
-            return hits
-
-        for cx1, cy1, cx2, cy2, cname in component_segments:
-            if cname in ignore_comps:
-                continue
-
-            # Normalizar coordenadas dos segmentos
-            sx1, sy1, sx2, sy2 = x1, y1, x2, y2
-
-            # Segmento de teste é vertical (x constante)
-            if abs(sx1 - sx2) < 0.1:
-                x_seg = sx1
-                y_seg_min, y_seg_max = sorted([sy1, sy2])
-
-                # Componente é horizontal (y constante)
-                if abs(cy1 - cy2) < 0.1:
-                    x_comp_min, x_comp_max = sorted([cx1, cx2])
-                    y_comp = cy1
-
-                    # Verificar cruzamento: segmento vertical passa por y_comp
-                    # e componente horizontal passa por x_seg
-                    if (x_comp_min - route_grid) < x_seg < (x_comp_max + route_grid):
-                        if (y_seg_min - route_grid) < y_comp < (y_seg_max + route_grid):
-                            hits += 10  # Penalidade MUITO alta para cruzamento direto
-
-            # Segmento de teste é horizontal (y constante)
-            elif abs(sy1 - sy2) < 0.1:
-                y_seg = sy1
-                x_seg_min, x_seg_max = sorted([sx1, sx2])
-
-                # Componente é vertical (x constante)
-                if abs(cx1 - cx2) < 0.1:
-                    y_comp_min, y_comp_max = sorted([cy1, cy2])
-                    x_comp = cx1
-
-                    # Verificar cruzamento: segmento horizontal passa por x_comp
-                    # e componente vertical passa por y_seg
-                    if (y_comp_min - route_grid) < y_seg < (y_comp_max + route_grid):
-                        if (x_seg_min - route_grid) < x_comp < (x_seg_max + route_grid):
-                            hits += 10  # Penalidade MUITO alta para cruzamento direto
-
-        return hits
-
-    def segment_hits_bus(x1, y1, x2, y2):
-        hits = 0
-        if x1 == x2 and y1 == y2:
-            return hits
-        for bx1, by1, bx2, by2 in bus_segments:
-            if bx1 == bx2 and by1 == by2:
-                continue
-            # vertical segment vs horizontal bus
-            if x1 == x2 and by1 == by2:
-                if min(bx1, bx2) < x1 < max(bx1, bx2) and min(y1, y2) < by1 < max(y1, y2):
-                    hits += 1
-            # horizontal segment vs vertical bus
-            if y1 == y2 and bx1 == bx2:
-                if min(x1, x2) < bx1 < max(x1, x2) and min(by1, by2) < y1 < max(by1, by2):
-                    hits += 1
-        return hits
+                x1, y1 = coords.get(n1, (0, 0))
+                x2, y2 = coords.get(n2, (0, 0))
+                if x1 == x2 or y1 == y2:
+                    continue
+                ignore = frozenset((n1, n2))
+                yield (x1, y2, x1, y1, x2, y2, ignore)
+                yield (x2, y1, x1, y1, x2, y2, ignore)
+            else:
+                pins = [n for n in comp.node_ids[:3] if n in coords]
+                if not pins:
+                    continue
+                cx = sum(coords[n][0] for n in pins) / len(pins)
+                cy = sum(coords[n][1] for n in pins) / len(pins)
+                starts = ((cx, cy + route_grid), (cx - route_grid, cy), (cx, cy - route_grid))
+                for node, (x1, y1) in zip(comp.node_ids[:3], starts):
+                    if node not in node_ids:
+                        continue
+                    x2, y2 = coords[node]
+                    if abs(x1 - x2) < 0.01 or abs(y1 - y2) < 0.01:
+                        continue
+                    ignore = frozenset((node,))
+                    yield (x1, y2, x1, y1, x2, y2, ignore)
+                    yield (x2, y1, x1, y1, x2, y2, ignore)
+
+    # Com NumPy, as dobras conhecidas de antemao sao pontuadas em um unico
+    # lote (ArrayRouteIndex.bend_scores); as demais (deslocamentos) caem no
+    # indice espacial. Os dois dao exatamente a mesma pontuacao.
+    prescored = {}
+    if HAVE_NUMPY and router == 'heuristic':
+        candidates = list(dict.fromkeys(known_bends()))
+        array_index = ArrayRouteIndex(route_grid, node_positions, component_segments, bus_segments)
+        prescored = dict(zip(candidates, array_index.bend_scores(candidates)))
+    span_timer.count('batched_bends', len(prescored))
+    bend_queries = 0
+    index_queries = 0
 
     def bend_score(bx, by, x1, y1, x2, y2, ignore):
-        hits = segment_hits_nodes(x1, y1, bx, by, ignore)
-        hits += segment_hits_nodes(bx, by, x2, y2, ignore)
-        hits += segment_hits_bus(x1, y1, bx, by)
-        hits += segment_hits_bus(bx, by, x2, y2)
-        # NOVO: Penalizar cruzamentos com componentes
-        hits += segment_hits_components(x1, y1, bx, by)
-        hits += segment_hits_components(bx, by, x2, y2)
-        length = abs(x1 - bx) + abs(y1 - by) + abs(x2 - bx) + abs(y2 - by)
-        return hits, length
-
-    def bend_hits_node(bx, by, ignore):
-        for node, (nx, ny) in node_positions.items():
-            if node in ignore:
-                continue
-            if abs(nx - bx) < 0.01 and abs(ny - by) < 0.01:
-                return True
-        return False
+        # Toda consulta conta (vinda do lote ou do indice), para os totais
+        # serem comparaveis entre --router e com/sem ArrayRouteIndex
+        nonlocal bend_queries, index_queries
+        bend_queries += 1
+        score = prescored.get((bx, by, x1, y1, x2, y2, frozenset(ignore)))
+        if score is None:
+            index_queries += 1
+            score = route_index.bend_score(bx, by, x1, y1, x2, y2, ignore)
+        return score
+
+    # Grade de roteamento: usada pelo A* e, se route_stats for pedido,
+    # tambem para medir os fios da heuristica.
+    grid = None
+    route_seconds = 0.0
+    if router == 'astar' or route_stats is not None:
+        grid = RoutingGrid(route_grid)
+        for node, (x, y) in coords.items():
+            if node in node_ids:
+                grid.add_pin(node, x, y)
+        for x1, y1, x2, y2, _ in component_segments:
+            if x1 == x2 or y1 == y2:
+                grid.add_component(x1, y1, x2, y2)
+        for idx, (x1, y1, x2, y2) in enumerate(bus_segments):
+            grid.add_wire(('bus', idx), [(x1, y1), (x2, y2)], measure=False)
+    span_timer.end(phase)
+    phase = span_timer.begin('emit')
+    wires_routed = 0
 
     def ortho_path(start_pos, end_pos, ignore_nodes):
         x1, y1 = start_pos
@@ -1722,11 +2614,44 @@ def _circuitikz_generic(components, title):
         score2 = bend_score(cand2[0], cand2[1], x1, y1, x2, y2, ignore_nodes)
         return "|-" if score1 <= score2 else "-|"
 
+    def path_points(start_pos, end_pos, path):
+        if path == "|-":
+            return [start_pos, (start_pos[0], end_pos[1]), end_pos]
+        if path == "-|":
+            return [start_pos, (end_pos[0], start_pos[1]), end_pos]
+        return [start_pos, end_pos]
+
+    def pin_wire(anchor, start, node, first_op):
+        """Fio do pino de um transistor ate o no (A* ou heuristica)."""
+        nonlocal route_seconds, wires_routed
+        wires_routed += 1
+        began = time.perf_counter()
+        end = coords[node]
+        target = node_ids[node]
+        try:
+            if router == 'astar':
+                points = grid.route(node, start, route_budget)
+                if points is not None:
+                    grid.routed += 1
+                    grid.add_wire(node, points)
+                    refs = []
+                    for point in points[1:] or points:
+                        refs.append(f"({target})" if point == end else f"({point[0]},{point[1]})")
+                    junction = "" if points[-1] == end else " node[circ]{}"
+                    return f"\\draw ({anchor}) {first_op} {' -- '.join(refs)}{junction};"
+                grid.fallbacks += 1
+            path = ortho_path(start, end, {node})
+            if grid is not None:
+                grid.add_wire(node, path_points(start, end, path))
+            return f"\\draw ({anchor}) {path} ({target});"
+        finally:
+            route_seconds += time.perf_counter() - began
+
     def draw_ground_bipole(comp, node, group_id):
         comp_id = _safe_id(comp.name)
         offset = ground_offsets.get(comp.name, 0)
         base = node_ids[node]
-        label_attr = _label_attr_for(comp)
+        label_attr = label_for(comp)
         kind = comp.comp_type
         if comp.name in bus_positions:
             bx, by = bus_positions[comp.name]
@@ -1752,14 +2677,11 @@ def _circuitikz_generic(components, title):
             lines.append(f"\\draw ({start}) to[{kind}{label_attr}] ++(0,-2.5) node[ground]{{}};")
 
     # Desenhar bipolos
-    for comp in components:
-        if comp.comp_type not in bipoles or len(comp.nodes) < 2:
-            continue
-
-        n1 = normalize_node(comp.nodes[0])
-        n2 = normalize_node(comp.nodes[1])
-        if (n1 == '0') ^ (n2 == '0'):
-            other = n2 if n1 == '0' else n1
+    for comp in incidence.bipoles:
+        n1 = comp.node_ids[0]
+        n2 = comp.node_ids[1]
+        if (n1 == GROUND_ID) ^ (n2 == GROUND_ID):
+            other = n2 if n1 == GROUND_ID else n1
             if other in node_ids:
                 group_id = group_of.get(other)
                 draw_ground_bipole(comp, other, group_id)
@@ -1770,7 +2692,7 @@ def _circuitikz_generic(components, title):
 
         id1 = node_ids[n1]
         id2 = node_ids[n2]
-        label_attr = _label_attr_for(comp)
+        label_attr = label_for(comp)
         kind = comp.comp_type
 
         x1, y1 = coords.get(n1, (0, 0))
@@ -1817,6 +2739,7 @@ def _circuitikz_generic(components, title):
                         best = (score, off)
                 by = best[1]
                 lines.append(f"\\draw ({id1}) to[{kind}{label_attr}] ({bx},{by}) to[short] ({x2},{by}) to[short] ({id2});")
+                tail = [(bx, by), (x2, by), (x2, y2)]
             else:
                 cand_offsets = [bx + bend_offset, bx - bend_offset]
                 best = None
@@ -1826,16 +2749,21 @@ def _circuitikz_generic(components, title):
                         best = (score, off)
                 bx = best[1]
                 lines.append(f"\\draw ({id1}) to[{kind}{label_attr}] ({bx},{by}) to[short] ({bx},{y2}) to[short] ({id2});")
+                tail = [(bx, by), (bx, y2), (x2, y2)]
         else:
             lines.append(f"\\draw ({id1}) to[{kind}{label_attr}] ({bx},{by}) to[short] ({id2});")
+            tail = [(bx, by), (x2, y2)]
+        if grid is not None:
+            grid.add_component(x1, y1, bx, by)
+            grid.add_wire(n2, tail)
 
     # BJTs
-    for comp in components:
-        if comp.comp_type != 'Q' or len(comp.nodes) < 3:
+    for comp in incidence.by_type['Q']:
+        if len(comp.node_ids) < 3:
             continue
-        c = normalize_node(comp.nodes[0])
-        b = normalize_node(comp.nodes[1])
-        e = normalize_node(comp.nodes[2])
+        c = comp.node_ids[0]
+        b = comp.node_ids[1]
+        e = comp.node_ids[2]
         kind = 'pnp' if 'PNP' in (comp.model or '').upper() else 'npn'
         comp_id = _safe_id(comp.name)
 
@@ -1850,20 +2778,14 @@ def _circuitikz_generic(components, title):
         lines.append(f"\\node[{kind}] ({comp_id}) at ({cx},{cy}) {{}};")
         if c in node_ids:
             start = (cx, cy + pin_offset)
-            end = coords[c]
-            path = ortho_path(start, end, {c})
-            lines.append(f"\\draw ({comp_id}.C) {path} ({node_ids[c]});")
+            lines.append(pin_wire(f"{comp_id}.C", start, c, "|-"))
         if b in node_ids:
             start = (cx - pin_offset, cy)
-            end = coords[b]
-            path = ortho_path(start, end, {b})
-            lines.append(f"\\draw ({comp_id}.B) {path} ({node_ids[b]});")
+            lines.append(pin_wire(f"{comp_id}.B", start, b, "-|"))
         if e in node_ids:
             start = (cx, cy - pin_offset)
-            end = coords[e]
-            path = ortho_path(start, end, {e})
-            lines.append(f"\\draw ({comp_id}.E) {path} ({node_ids[e]});")
-        elif e == '0':
+            lines.append(pin_wire(f"{comp_id}.E", start, e, "|-"))
+        elif e == GROUND_ID:
             gnd_anchor = gnd_bus_name.get(group_id)
             if gnd_anchor:
                 lines.append(f"\\draw ({comp_id}.E) -- ({comp_id}.E |- {gnd_anchor});")
@@ -1871,12 +2793,12 @@ def _circuitikz_generic(components, title):
                 lines.append(f"\\draw ({comp_id}.E) -- ++(0,-2) node[ground]{{}};")
 
     # MOSFETs
-    for comp in components:
-        if comp.comp_type != 'M' or len(comp.nodes) < 3:
+    for comp in incidence.by_type['M']:
+        if len(comp.node_ids) < 3:
             continue
-        d = normalize_node(comp.nodes[0])
-        g = normalize_node(comp.nodes[1])
-        s = normalize_node(comp.nodes[2])
+        d = comp.node_ids[0]
+        g = comp.node_ids[1]
+        s = comp.node_ids[2]
         is_p = 'PMOS' in (comp.model or '').upper()
         kind = 'pfet' if is_p else 'nfet'
         comp_id = _safe_id(comp.name)
@@ -1892,20 +2814,14 @@ def _circuitikz_generic(components, title):
         lines.append(f"\\node[{kind}] ({comp_id}) at ({cx},{cy}) {{}};")
         if d in node_ids:
             start = (cx, cy + pin_offset)
-            end = coords[d]
-            path = ortho_path(start, end, {d})
-            lines.append(f"\\draw ({comp_id}.D) {path} ({node_ids[d]});")
+            lines.append(pin_wire(f"{comp_id}.D", start, d, "|-"))
         if g in node_ids:
             start = (cx - pin_offset, cy)
-            end = coords[g]
-            path = ortho_path(start, end, {g})
-            lines.append(f"\\draw ({comp_id}.G) {path} ({node_ids[g]});")
+            lines.append(pin_wire(f"{comp_id}.G", start, g, "-|"))
         if s in node_ids:
             start = (cx, cy - pin_offset)
-            end = coords[s]
-            path = ortho_path(start, end, {s})
-            lines.append(f"\\draw ({comp_id}.S) {path} ({node_ids[s]});")
-        elif s == '0':
+            lines.append(pin_wire(f"{comp_id}.S", start, s, "|-"))
+        elif s == GROUND_ID:
             gnd_anchor = gnd_bus_name.get(group_id)
             if gnd_anchor:
                 lines.append(f"\\draw ({comp_id}.S) -- ({comp_id}.S |- {gnd_anchor});")
@@ -1913,12 +2829,12 @@ def _circuitikz_generic(components, title):
                 lines.append(f"\\draw ({comp_id}.S) -- ++(0,-2) node[ground]{{}};")
 
     # JFETs
-    for comp in components:
-        if comp.comp_type != 'J' or len(comp.nodes) < 3:
+    for comp in incidence.by_type['J']:
+        if len(comp.node_ids) < 3:
             continue
-        d = normalize_node(comp.nodes[0])
-        g = normalize_node(comp.nodes[1])
-        s = normalize_node(comp.nodes[2])
+        d = comp.node_ids[0]
+        g = comp.node_ids[1]
+        s = comp.node_ids[2]
         is_p = 'PJF' in (comp.model or '').upper()
         kind = 'pjfet' if is_p else 'njfet'
         comp_id = _safe_id(comp.name)
@@ -1934,28 +2850,84 @@ def _circuitikz_generic(components, title):
         lines.append(f"\\node[{kind}] ({comp_id}) at ({cx},{cy}) {{}};")
         if d in node_ids:
             start = (cx, cy + pin_offset)
-            end = coords[d]
-            path = ortho_path(start, end, {d})
-            lines.append(f"\\draw ({comp_id}.D) {path} ({node_ids[d]});")
+            lines.append(pin_wire(f"{comp_id}.D", start, d, "|-"))
         if g in node_ids:
             start = (cx - pin_offset, cy)
-            end = coords[g]
-            path = ortho_path(start, end, {g})
-            lines.append(f"\\draw ({comp_id}.G) {path} ({node_ids[g]});")
+            lines.append(pin_wire(f"{comp_id}.G", start, g, "-|"))
         if s in node_ids:
             start = (cx, cy - pin_offset)
-            end = coords[s]
-            path = ortho_path(start, end, {s})
-            lines.append(f"\\draw ({comp_id}.S) {path} ({node_ids[s]});")
-        elif s == '0':
+            lines.append(pin_wire(f"{comp_id}.S", start, s, "|-"))
+        elif s == GROUND_ID:
             gnd_anchor = gnd_bus_name.get(group_id)
             if gnd_anchor:
                 lines.append(f"\\draw ({comp_id}.S) -- ({comp_id}.S |- {gnd_anchor});")
             else:
                 lines.append(f"\\draw ({comp_id}.S) -- ++(0,-2) node[ground]{{}};")
 
+    # Blocos (modo hierarquico): caixa com metade dos pinos de cada lado
+    pin_pitch = 1.0
+    for comp in incidence.by_type['X']:
+        pins = [n for n in comp.node_ids if n in coords]
+        if not pins:
+            continue
+        cx = sum(coords[n][0] for n in pins) / len(pins)
+        cy = sum(coords[n][1] for n in pins) / len(pins)
+        pin_names = (comp.value or '').split()
+        n_left = (len(comp.node_ids) + 1) // 2
+        half_w = 1.5
+        half_h = max(n_left, 1) * pin_pitch / 2
+        top = round(cy + half_h, 3)
+        lines.append(f"\\draw[thick] ({round(cx - half_w, 3)},{round(cy - half_h, 3)}) "
+                     f"rectangle ({round(cx + half_w, 3)},{top});")
+        title_safe = f"{comp.name} ({comp.model})".replace('_', '\\_')
+        lines.append(f"\\node[above] at ({round(cx, 3)},{top}) {{{title_safe}}};")
+        for pos, node in enumerate(comp.node_ids):
+            left = pos < n_left
+            row = pos if left else pos - n_left
+            side = -1 if left else 1
+            px = round(cx + side * half_w, 3)
+            py = round(cy + half_h - pin_pitch * (row + 0.5), 3)
+            if pos < len(pin_names):
+                pin_safe = pin_names[pos].replace('_', '\\_')
+                anchor = 'west' if left else 'east'
+                lines.append(f"\\node[anchor={anchor}, font=\\scriptsize] at ({px},{py}) {{{pin_safe}}};")
+            # Toco horizontal para fora da caixa antes do fio ate o no
+            sx = round(px + side * pin_pitch, 3)
+            if node in node_ids:
+                lines.append(f"\\draw ({px},{py}) -- ({sx},{py});")
+                lines.append(pin_wire(f"{sx},{py}", (sx, py), node, "-|"))
+            elif node == GROUND_ID:
+                lines.append(f"\\draw ({px},{py}) -- ({sx},{py}) node[ground]{{}};")
+
+    # Pinos do subcircuito (paginas do modo hierarquico)
+    port_ids = {components.node_table.ids[p] for p in ports if p in components.node_table.ids}
+    for node in sorted(port_ids):
+        if node in node_ids:
+            port_safe = components.node_table.name(node).replace('_', '\\_')
+            lines.append(f"\\node[ocirc, label={{above left:\\scriptsize {port_safe}}}] at ({node_ids[node]}) {{}};")
+
+    span_timer.add('route', route_seconds, wires_routed)
+    span_timer.count('wires_routed', wires_routed)
+    span_timer.count('collision_checks', bend_queries)
+    span_timer.count('index_collision_checks', index_queries)
+    span_timer.end(phase)
+
+    if route_stats is not None:
+        route_stats.update(
+            router=router,
+            wire_length=grid.total_length,
+            crossings=grid.crossings,
+            seconds=route_seconds,
+            routed=grid.routed,
+            fallbacks=grid.fallbacks,
+        )
+
     lines.append("\\end{circuitikz}")
-    return "\n".join(lines)
+    body = "\n".join(lines)
+    if circuit_key is not None:
+        layout_cache.store_circuit(circuit_key, body)
+        body = _fill_label_marks(body, components)
+    return body
 
 
 def create_schematic_matplotlib(components, title, output_path):
@@ -2008,9 +2980,9 @@ def create_schematic_matplotlib(components, title, output_path):
     return output_path
 
 
-def create_schematic(components, title, output_path):
+def create_schematic(components, title, output_path, latex_format=None):
     """Cria esquematico usando circuitikz (LaTeX) ou fallback matplotlib."""
-    result = create_schematic_circuitikz(components, title, output_path)
+    result = create_schematic_circuitikz(components, title, output_path, latex_format)
     if result:
         return result
     return create_schematic_matplotlib(components, title, output_path)
@@ -2025,56 +2997,665 @@ def run_cmd(cmd, cwd):
     return proc.returncode, proc.stdout, proc.stderr
 
 
-def create_schematic_circuitikz(components, title, output_path):
-    """Gera circuito usando circuitikz + pdflatex."""
+PNG_DPI = 150
+CIRCUITIKZ_PREAMBLE = r"""\documentclass[tikz,border=2pt]{standalone}
+\usepackage[siunitx]{circuitikz}
+\usepackage[active,tightpage]{preview}
+\PreviewEnvironment{circuitikz}
+"""
+
+
+def circuitikz_body(components, title, router='heuristic', route_budget=DEFAULT_ROUTE_BUDGET,
+                    route_stats=None, layout_cache=None, layout_effort=DEFAULT_EFFORT,
+                    layout_stats=None, ports=()):
+    """Escolhe o layout e retorna o corpo circuitikz (ou None).
+
+    Os demais argumentos valem para o layout generico (ver
+    _circuitikz_generic); os layouts fixos nao roteiam fios. Paginas com
+    pinos (ports) sempre usam o layout generico, que desenha os terminais.
+    """
     if not components:
         return None
+    components = ComponentTable.from_components(components)
 
-    if _is_simple_voltage_fan(components):
-        tex_body = _circuitikz_simple_fan(components, title)
-    elif _is_simple_current_divider(components):
-        tex_body = _circuitikz_current_divider(components, title)
-    else:
-        tex_body = _circuitikz_generic(components, title)
+    with span_timer.span('layout'):
+        if not ports and _is_simple_voltage_fan(components):
+            return _circuitikz_simple_fan(components, title)
+        if not ports and _is_simple_current_divider(components):
+            return _circuitikz_current_divider(components, title)
+        return _circuitikz_generic(components, title, router, route_budget, route_stats, layout_cache,
+                                   layout_effort, layout_stats, ports)
 
-    if not tex_body:
-        return None
 
-    output_path = Path(output_path)
-    pdf_dir = Path(tempfile.mkdtemp(prefix="ckt_", dir=Path.cwd()))
-    tex_path = pdf_dir / "circuit.tex"
-    pdf_path = pdf_dir / "circuit.pdf"
+# =============================================================================
+# FORMATO LATEX PRE-COMPILADO
+# =============================================================================
 
-    tex_content = r"""\documentclass[tikz,border=2pt]{standalone}
-\usepackage[siunitx]{circuitikz}
-\usepackage[active,tightpage]{preview}
-\PreviewEnvironment{circuitikz}
-\begin{document}
-%s
-\end{document}
-""" % tex_body
+DEFAULT_LATEX_FORMAT_DIR = DEFAULT_CACHE_ROOT / 'latex_format'
 
-    tex_path.write_text(tex_content)
 
-    code, out, err = run_cmd("pdflatex -interaction=nonstopmode -halt-on-error circuit.tex", cwd=pdf_dir)
-    if code != 0 or not pdf_path.exists():
+@lru_cache(maxsize=None)
+def tex_version():
+    """Primeira linha de `pdflatex --version` (None se pdflatex nao existir)."""
+    try:
+        code, out, err = run_cmd("pdflatex --version", cwd=Path.cwd())
+    except OSError:
         return None
-
-    # Converter para PNG
-    code, out, err = run_cmd(f"pdftocairo -png -singlefile circuit.pdf {pdf_path.with_suffix('').as_posix()}", cwd=pdf_dir)
-    if code != 0:
+    if code != 0 or not out.strip():
         return None
+    return out.strip().splitlines()[0]
+
 
-    png_generated = pdf_path.with_suffix('.png')
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    png_generated.replace(output_path)
+def ensure_latex_format(cache_dir=DEFAULT_LATEX_FORMAT_DIR, preamble=CIRCUITIKZ_PREAMBLE):
+    """Gera (uma vez) um formato pdflatex com o preambulo ja carregado.
+
+    O formato e criado com `pdflatex -ini` + mylatexformat e fica em
+    cache_dir, com nome derivado da versao do TeX e do hash do preambulo;
+    chamadas seguintes apenas reutilizam o arquivo. Retorna o caminho do
+    formato sem a extensao .fmt (para `pdflatex -fmt=...`) ou None se nao
+    for possivel gera-lo.
+    """
+    version = tex_version()
+    if version is None:
+        return None
+    key = hashlib.sha256(f"{version}\n{preamble}".encode()).hexdigest()[:16]
+    cache_dir = Path(cache_dir).resolve()
+    name = f"circuitikz_{key}"
+    fmt_path = cache_dir / f"{name}.fmt"
+    if fmt_path.exists():
+        return str(fmt_path.with_suffix(''))
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    build_dir = Path(tempfile.mkdtemp(prefix=".build_", dir=cache_dir))
+    (build_dir / f"{name}.tex").write_text(preamble + "\\begin{document}\n\\end{document}\n")
+    code, out, err = run_cmd(
+        f'pdflatex -ini -interaction=nonstopmode -jobname={name} "&pdflatex" mylatexformat.ltx {name}.tex',
+        cwd=build_dir)
+    built = build_dir / f"{name}.fmt"
+    try:
+        if code != 0 or not built.exists():
+            return None
+        os.replace(built, fmt_path)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    return str(fmt_path.with_suffix(''))
+
+
+def _pdflatex_cmd(tex_name, latex_format=None, halt_on_error=True):
+    cmd = "pdflatex -interaction=nonstopmode"
+    if halt_on_error:
+        cmd += " -halt-on-error"
+    if latex_format:
+        cmd += f' -fmt="{latex_format}"'
+    return f"{cmd} {tex_name}"
+
+
+def _run_pdflatex(tex_name, cwd, latex_format=None, halt_on_error=True):
+    """Roda pdflatex; se o formato pre-compilado falhar, repete sem ele."""
+    code, out, err = run_cmd(_pdflatex_cmd(tex_name, latex_format, halt_on_error), cwd=cwd)
+    if code != 0 and latex_format:
+        code, out, err = run_cmd(_pdflatex_cmd(tex_name, None, halt_on_error), cwd=cwd)
+    return code, out, err
+
+
+def render_circuitikz(tex_body, output_path, latex_format=None):
+    """Compila um corpo circuitikz com pdflatex e converte para PNG.
+
+    latex_format: formato de ensure_latex_format (opcional).
+    """
+    output_path = Path(output_path)
+    _unlink_if_shared(output_path)
+    with tempfile.TemporaryDirectory(prefix="ckt_", dir=Path.cwd()) as tmp:
+        pdf_dir = Path(tmp)
+        tex_path = pdf_dir / "circuit.tex"
+        pdf_path = pdf_dir / "circuit.pdf"
+
+        tex_content = CIRCUITIKZ_PREAMBLE + "\\begin{document}\n%s\n\\end{document}\n" % tex_body
+
+        tex_path.write_text(tex_content)
+
+        with span_timer.span('pdflatex'):
+            code, out, err = _run_pdflatex("circuit.tex", pdf_dir, latex_format)
+        if code != 0 or not pdf_path.exists():
+            return None
+
+        # Converter para PNG
+        with span_timer.span('pdftocairo'):
+            code, out, err = run_cmd(f"pdftocairo -png -r {PNG_DPI} -singlefile circuit.pdf "
+                                     f"{pdf_path.with_suffix('').as_posix()}", cwd=pdf_dir)
+        if code != 0:
+            return None
+
+        with span_timer.span('move'):
+            png_generated = pdf_path.with_suffix('.png')
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            png_generated.replace(output_path)
     return str(output_path)
 
 
+def create_schematic_circuitikz(components, title, output_path, latex_format=None):
+    """Gera circuito usando circuitikz + pdflatex."""
+    tex_body = circuitikz_body(components, title)
+    if not tex_body:
+        return None
+    return render_circuitikz(tex_body, output_path, latex_format)
+
+
+# =============================================================================
+# RENDER EM LOTE (UM PDFLATEX PARA VARIOS CIRCUITOS)
+# =============================================================================
+
+_BATCH_MARK_RE = re.compile(r'^ckt-(begin|end) (\d+)$')
+_PAGE_PNG_RE = re.compile(r'-(\d+)\.png$')
+
+
+def _batch_document(tex_bodies):
+    """Monta um documento com um circuitikz por pagina, delimitado por marcadores no log."""
+    parts = [CIRCUITIKZ_PREAMBLE, "\\begin{document}\n"]
+    for idx, tex_body in enumerate(tex_bodies):
+        parts.append(f"\\typeout{{ckt-begin {idx}}}\n{tex_body}\n\\typeout{{ckt-end {idx}}}\n")
+    parts.append("\\end{document}\n")
+    return ''.join(parts)
+
+
+def _batch_failures(log_text, count):
+    """Indices dos corpos com erro (linha '! ...' entre os marcadores) ou sem marcador final."""
+    failed = set()
+    finished = set()
+    current = None
+    for line in log_text.splitlines():
+        match = _BATCH_MARK_RE.match(line.strip())
+        if match:
+            kind, idx = match.group(1), int(match.group(2))
+            if kind == 'begin':
+                current = idx
+            else:
+                finished.add(idx)
+                current = None
+        elif line.startswith('! ') and current is not None:
+            failed.add(current)
+    failed.update(idx for idx in range(count) if idx not in finished)
+    return failed
+
+
+def _compile_batch(tex_bodies, work_dir, latex_format=None):
+    """Compila os corpos em um unico PDF e separa as paginas em PNGs.
+
+    Retorna (pngs, falhas): pngs[i] e o PNG do corpo i (ou None) e falhas
+    e o conjunto de indices que quebraram a compilacao.
+    """
+    tex_path = work_dir / "batch.tex"
+    pdf_path = work_dir / "batch.pdf"
+    tex_path.write_text(_batch_document(tex_bodies))
+
+    with span_timer.span('pdflatex'):
+        _run_pdflatex("batch.tex", work_dir, latex_format, halt_on_error=False)
+    try:
+        log_text = (work_dir / "batch.log").read_text(errors='replace')
+    except OSError:
+        log_text = ""
+    failed = _batch_failures(log_text, len(tex_bodies))
+    if failed or not pdf_path.exists():
+        return [None] * len(tex_bodies), failed or set(range(len(tex_bodies)))
+
+    with span_timer.span('pdftocairo'):
+        code, out, err = run_cmd(f"pdftocairo -png -r {PNG_DPI} batch.pdf page", cwd=work_dir)
+    pages = sorted(work_dir.glob("page-*.png"),
+                   key=lambda path: int(_PAGE_PNG_RE.search(path.name).group(1)))
+    if code != 0 or len(pages) != len(tex_bodies):
+        return [None] * len(tex_bodies), set(range(len(tex_bodies)))
+    return pages, set()
+
+
+def render_circuitikz_batch(entries, latex_format=None):
+    """Renderiza varios circuitos com uma unica compilacao LaTeX.
+
+    entries: lista de (tex_body, output_path). Cada corpo vira uma pagina
+    do mesmo documento standalone; a pagina i volta para a entrada i. Se
+    algum corpo quebrar a compilacao, ele e marcado como falha e o lote e
+    recompilado sem ele. Retorna uma lista com o caminho gerado ou None
+    para cada entrada, na mesma ordem.
+    """
+    results = [None] * len(entries)
+    pending = list(range(len(entries)))
+    if not pending:
+        return results
+    with tempfile.TemporaryDirectory(prefix="ckt_batch_", dir=Path.cwd()) as tmp:
+        batch_dir = Path(tmp)
+        attempt = 0
+        while pending and attempt < 2:
+            work_dir = batch_dir / f"pass{attempt}"
+            work_dir.mkdir()
+            pages, failed = _compile_batch([entries[idx][0] for idx in pending], work_dir, latex_format)
+            if not failed:
+                with span_timer.span('move'):
+                    for page, idx in zip(pages, pending):
+                        output_path = Path(entries[idx][1])
+                        output_path.parent.mkdir(parents=True, exist_ok=True)
+                        _unlink_if_shared(output_path)
+                        page.replace(output_path)
+                        results[idx] = str(output_path)
+                return results
+            if len(failed) == len(pending):
+                break
+            pending = [idx for pos, idx in enumerate(pending) if pos not in failed]
+            attempt += 1
+    return results
+
+
+# =============================================================================
+# CACHE DE RENDER (PNG POR CONTEUDO)
+# =============================================================================
+
+# Incrementar quando o pipeline LaTeX -> PNG mudar de forma que o mesmo
+# corpo circuitikz passe a gerar outra imagem.
+RENDERER_VERSION = 1
+DEFAULT_RENDER_CACHE_DIR = DEFAULT_CACHE_ROOT / 'render'
+DEFAULT_RENDER_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _unlink_if_shared(path):
+    """Remove path se ele for um hardlink (ex.: do cache), para nao sobrescrever o original."""
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.unlink(path)
+    except OSError:
+        pass
+
+
+class RenderCache:
+    """Cache de PNGs enderecado pelo conteudo.
+
+    A chave e o hash do corpo circuitikz + preambulo + RENDERER_VERSION +
+    PNG_DPI. Num acerto o PNG e ligado (hardlink, ou copiado se o sistema
+    de arquivos nao permitir) no caminho de saida, sem pdflatex/pdftocairo.
+    So renders LaTeX bem-sucedidos entram no cache (nunca o fallback
+    matplotlib).
+    """
+
+    def __init__(self, cache_dir=DEFAULT_RENDER_CACHE_DIR, max_bytes=DEFAULT_RENDER_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(tex_body):
+        h = hashlib.sha256()
+        h.update(f"v{RENDERER_VERSION}|dpi{PNG_DPI}|".encode())
+        h.update(CIRCUITIKZ_PREAMBLE.encode())
+        h.update(tex_body.encode())
+        return h.hexdigest()
+
+    def _entry_path(self, tex_body):
+        return self.cache_dir / f"{self.key(tex_body)}.png"
+
+    def fetch(self, tex_body, output_path):
+        """Coloca o PNG em cache em output_path; retorna o tamanho em bytes ou None."""
+        entry = self._entry_path(tex_body)
+        try:
+            size = entry.stat().st_size
+        except OSError:
+            return None
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = output_path.with_name(f".{output_path.name}.tmp")
+        try:
+            if tmp.exists():
+                tmp.unlink()
+            try:
+                os.link(entry, tmp)
+            except OSError:
+                shutil.copyfile(entry, tmp)
+            os.replace(tmp, output_path)
+            os.utime(entry)
+        except OSError:
+            return None
+        return size
+
+    def store(self, tex_body, png_path):
+        """Guarda (copia) o PNG gerado para tex_body; retorna True se a entrada foi gravada."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = self._entry_path(tex_body)
+        tmp = entry.with_name(f".tmp_{os.getpid()}_{entry.name}")
+        try:
+            shutil.copyfile(png_path, tmp)
+            os.replace(tmp, entry)
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            return False
+        evict_cache_dir(self.cache_dir, self.max_bytes, '*.png')
+        return True
+
+
 # =============================================================================
 # MAIN
 # =============================================================================
 
+class FileResult:
+    """Resultado do processamento de um arquivo (enviado de volta pelo worker).
+
+    status: 'ok', 'error', 'empty' (sem componentes; nao conta como erro) ou
+    'pending' (corpo circuitikz pronto, aguardando o render em lote).
+    lines: saida de console do arquivo, impressa em ordem pelo processo principal.
+    profile/trace: com --profile, span_timer.SpanTimer.summary() e os eventos
+    Chrome trace do arquivo.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.status = 'error'
+        self.lines = []
+        self.seconds = 0.0
+        self.parse_cache_hit = None
+        self.library_parses = {}
+        self.library_hits = {}
+        self.tex_body = None
+        self.output_path = None
+        self.render_cache_hit = None
+        self.bytes_saved = 0
+        self.layout_reused = False
+        self.layout_stats = {}
+        self.layout_hits = 0
+        self.layout_misses = 0
+        self.profile = None
+        self.trace = []
+
+
+def _library_stats_snapshot():
+    return dict(LIBRARY_STATS['parses']), dict(LIBRARY_STATS['hits'])
+
+
+def _stats_delta(before, after):
+    return {path: count - before.get(path, 0) for path, count in after.items()
+            if count != before.get(path, 0)}
+
+
+def _report_layout(result, args, layout_cache):
+    """Anota em result os contadores do layout (e as linhas de -v)."""
+    out = result.lines
+    layout_stats = result.layout_stats
+    if args.verbose and layout_stats:
+        out.append(f"  Cruzamentos no layout ({args.layout_effort}): "
+                   f"{layout_stats['crossings_before']} -> {layout_stats['crossings_after']} "
+                   f"em {layout_stats['groups']} grupo(s), {layout_stats['seconds'] * 1e3:.1f} ms")
+    if layout_cache is not None:
+        result.layout_reused = layout_cache.circuit_hits > 0
+        result.layout_hits = layout_cache.hits
+        result.layout_misses = layout_cache.misses
+        if args.verbose and (layout_cache.hits or layout_cache.misses):
+            whole = (f", {layout_cache.circuit_hits} pagina(s) inteira(s)"
+                     if layout_cache.circuit_hits else "")
+            out.append(f"  Layout: {layout_cache.hits} grupo(s) do cache, "
+                       f"{layout_cache.misses} recalculado(s){whole}")
+        elif args.verbose and result.layout_reused:
+            out.append("  Layout: circuito inteiro do cache (so rotulos refeitos)")
+
+
+def _hierarchy_output_path(output_path, subckt):
+    """PNG da pagina de um subcircuito: <saida>_<subckt>.png."""
+    base, ext = os.path.splitext(output_path)
+    return f"{base}_{_safe_id(subckt).lower()}{ext or '.png'}"
+
+
+def _process_hierarchy(netlist, spice_path, title, output_path, args, result, start):
+    """Modo hierarquico (--hierarchy): uma pagina por subcircuito unico.
+
+    Cada pagina vira um PNG proprio (o nivel superior em output_path, os
+    subcircuitos em _hierarchy_output_path). As paginas fora do cache de
+    render sao compiladas juntas, um pdflatex por arquivo; as que falharem
+    caem no fallback matplotlib.
+    """
+    out = result.lines
+    pages = hierarchy_pages(netlist)
+    pages[0].title = title
+    if args.verbose:
+        instance_count = hierarchy_instance_count(netlist)
+        out.append(f"  Hierarquia: {len(netlist.instances)} bloco(s) no nivel superior, "
+                   f"{len(pages) - 1} subcircuito(s) unico(s) para {instance_count} instancia(s)")
+
+    layout_cache = None if args.no_layout_cache else LayoutCache(args.layout_cache_dir)
+    entries = []
+    for page in pages:
+        path = output_path if page.subckt is None else _hierarchy_output_path(output_path, page.subckt)
+        tex_body = circuitikz_body(page.components, page.title, args.router, args.route_budget / 1000.0,
+                                   None, layout_cache, args.layout_effort, result.layout_stats,
+                                   page.ports)
+        entries.append((page, tex_body, path))
+    _report_layout(result, args, layout_cache)
+
+    render_cache = None if args.no_render_cache else RenderCache(args.render_cache_dir)
+    rendered = [None] * len(entries)
+    pending = []
+    fetched = 0
+    for idx, (page, tex_body, path) in enumerate(entries):
+        if not tex_body:
+            continue
+        if render_cache is not None and not args.force:
+            size = render_cache.fetch(tex_body, path)
+            if size is not None:
+                rendered[idx] = path
+                result.bytes_saved += size
+                fetched += 1
+                continue
+        pending.append(idx)
+    if fetched and not pending:
+        result.render_cache_hit = True
+    if pending:
+        paths = render_circuitikz_batch([entries[idx][1:] for idx in pending], args.latex_format_path)
+        for idx, path in zip(pending, paths):
+            if path:
+                rendered[idx] = path
+                if render_cache is not None and render_cache.store(entries[idx][1], path):
+                    result.render_cache_hit = False
+    for idx, (page, tex_body, path) in enumerate(entries):
+        if rendered[idx] is None and len(page.components):
+            _unlink_if_shared(path)
+            with span_timer.span('matplotlib'):
+                rendered[idx] = create_schematic_matplotlib(page.components, page.title, path)
+
+    elapsed = time.perf_counter() - start
+    failed = 0
+    for (page, tex_body, path), done in zip(entries, rendered):
+        name = page.subckt or "nivel superior"
+        if done:
+            out.append(f"  {spice_path} [{name}] -> {path}")
+        elif len(page.components):
+            failed += 1
+            out.append(f"  ERRO em {spice_path} [{name}]: falha ao gerar o esquematico")
+    out.append(f"  {spice_path}: {len(entries)} pagina(s) em {elapsed:.2f}s")
+    result.status = 'error' if failed else 'ok'
+    return result
+
+
+def process_spice_file(spice_path, args, output_path=None, batch=False):
+    """Parse, layout e render de um arquivo; nao imprime nada (ver FileResult.lines).
+
+    Com batch=True o render circuitikz e adiado: o resultado volta como
+    'pending' com tex_body/output_path para render_circuitikz_batch.
+    Com --profile as fases sao cronometradas (span_timer) e a tabela do
+    arquivo vai para o fim de FileResult.lines.
+    """
+    timer = span_timer.SpanTimer(spice_path) if args.profile else None
+    with span_timer.activate(timer), span_timer.span('file'):
+        result = _process_spice_file(spice_path, args, output_path, batch)
+    if timer is not None:
+        result.profile = timer.summary()
+        result.trace = timer.trace_events()
+        result.lines.append(f"  Perfil de {spice_path}:")
+        result.lines.extend(span_timer.format_table(result.profile, indent="    "))
+    return result
+
+
+def _process_spice_file(spice_path, args, output_path, batch):
+    result = FileResult(spice_path)
+    out = result.lines
+    start = time.perf_counter()
+    parses_before, hits_before = _library_stats_snapshot()
+    try:
+        if args.verbose:
+            out.append(f"Processando: {spice_path}")
+
+        # --hierarchy desenha as instancias como blocos: nada e achatado
+        flatten = not args.hierarchy
+        if args.no_parse_cache:
+            netlist = parse_spice_netlist(spice_path, max_depth=args.max_depth, flatten=flatten)
+        else:
+            parse_cache = ParseCache(args.parse_cache_dir)
+            netlist = parse_cache.parse(spice_path, max_depth=args.max_depth, flatten=flatten)
+            result.parse_cache_hit = parse_cache.hits > 0
+        components, title = netlist.components, netlist.title
+        flattener = netlist.flattener
+
+        for include_path, section in netlist.missing_includes:
+            where = f" (secao {section})" if section else ""
+            out.append(f"  Aviso: include nao encontrado em {spice_path}: {include_path}{where}")
+
+        if flattener and flattener.truncated_count:
+            out.append(f"  Aviso: {flattener.truncated_count} instancia(s) ignorada(s) em {spice_path} "
+                       f"(profundidade > {args.max_depth}, use --max-depth)")
+
+        if args.verbose:
+            if flattener and flattener.instance_count:
+                out.append(f"  Subcircuitos: {flattener.instance_count} instancia(s) expandida(s), "
+                           f"{flattener.component_count} componente(s) achatado(s)")
+            out.append(f"  Componentes encontrados: {len(components)}")
+            for comp in components:
+                out.append(f"    {comp}")
+
+        if not components and not (args.hierarchy and netlist.instances):
+            out.append(f"  Aviso: Nenhum componente encontrado em {spice_path}")
+            result.status = 'empty'
+            return result
+
+        if args.netlist:
+            internal = create_netlist(components, title)
+            out.append(f"\nNetlist interno:\n{internal}\n")
+
+        if output_path is None:
+            base = os.path.splitext(spice_path)[0]
+            output_path = base + '_schematic.png'
+
+        title = title or os.path.basename(spice_path)
+        if args.hierarchy and netlist.instances:
+            return _process_hierarchy(netlist, spice_path, title, output_path, args, result, start)
+
+        route_stats = {} if args.router == 'astar' or args.verbose else None
+        layout_cache = None if args.no_layout_cache else LayoutCache(args.layout_cache_dir)
+        tex_body = circuitikz_body(components, title, args.router, args.route_budget / 1000.0,
+                                   route_stats, layout_cache, args.layout_effort, result.layout_stats)
+        _report_layout(result, args, layout_cache)
+        if route_stats:
+            fallbacks = route_stats['fallbacks']
+            out.append(f"  Roteamento ({route_stats['router']}): {route_stats['routed'] + fallbacks} fio(s), "
+                       f"comprimento {route_stats['wire_length']:.0f}, "
+                       f"{route_stats['crossings']} cruzamento(s), "
+                       f"{route_stats['seconds'] * 1e3:.1f} ms"
+                       + (f", {fallbacks} fallback(s) para a heuristica" if fallbacks else ""))
+        render_cache = None
+        if tex_body and not args.no_render_cache:
+            render_cache = RenderCache(args.render_cache_dir)
+            if not args.force:
+                size = render_cache.fetch(tex_body, output_path)
+                if size is not None:
+                    result.render_cache_hit = True
+                    result.bytes_saved = size
+                    result.status = 'ok'
+                    out.append(f"  {spice_path} -> {output_path} "
+                               f"({time.perf_counter() - start:.2f}s, cache)")
+                    return result
+
+        if batch and tex_body:
+            result.status = 'pending'
+            result.tex_body = tex_body
+            result.output_path = output_path
+            return result
+
+        rendered = None
+        if tex_body:
+            rendered = render_circuitikz(tex_body, output_path, args.latex_format_path)
+            # Falta so conta quando o PNG entra no cache (nunca o fallback matplotlib)
+            if rendered and render_cache is not None and render_cache.store(tex_body, rendered):
+                result.render_cache_hit = False
+        if not rendered:
+            _unlink_if_shared(output_path)
+            with span_timer.span('matplotlib'):
+                rendered = create_schematic_matplotlib(components, title, output_path)
+        elapsed = time.perf_counter() - start
+
+        if rendered:
+            out.append(f"  {spice_path} -> {output_path} ({elapsed:.2f}s)")
+            result.status = 'ok'
+        else:
+            out.append(f"  ERRO em {spice_path}: falha ao gerar o esquematico ({elapsed:.2f}s)")
+
+    except Exception as e:
+        out.append(f"  ERRO em {spice_path}: {e}")
+        if args.verbose:
+            import traceback
+            out.append(traceback.format_exc().rstrip())
+    finally:
+        result.seconds = time.perf_counter() - start
+        parses_after, hits_after = _library_stats_snapshot()
+        result.library_parses = _stats_delta(parses_before, parses_after)
+        result.library_hits = _stats_delta(hits_before, hits_after)
+    return result
+
+
+def _map_spice_files(spice_files, args, single_output, jobs):
+    """Processa os arquivos (em paralelo se jobs > 1) e produz os resultados na ordem de entrada."""
+    if jobs <= 1:
+        for spice_path in spice_files:
+            yield process_spice_file(spice_path, args, single_output, args.batch)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(process_spice_file, spice_path, args, single_output, args.batch)
+                   for spice_path in spice_files]
+        for spice_path, future in zip(spice_files, futures):
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                # Um worker morreu (sinal, falta de memoria): os arquivos que nao
+                # terminaram viram erros, os ja concluidos seguem normalmente
+                result = FileResult(spice_path)
+                result.lines.append(f"  ERRO em {spice_path}: processo worker terminou inesperadamente")
+                yield result
+            except Exception as e:
+                result = FileResult(spice_path)
+                result.lines.append(f"  ERRO em {spice_path}: {e}")
+                yield result
+
+
+def _render_pending(results, args, single_output, timer=None):
+    """Renderiza em lote os resultados 'pending'; falhas voltam ao caminho por arquivo.
+
+    timer: SpanTimer opcional (--profile) para as fases do lote.
+    """
+    pending = [result for result in results if result.status == 'pending']
+    if pending:
+        start = time.perf_counter()
+        with span_timer.activate(timer), span_timer.span('batch'):
+            rendered = render_circuitikz_batch([(r.tex_body, r.output_path) for r in pending],
+                                               args.latex_format_path)
+        elapsed = time.perf_counter() - start
+        done = sum(1 for path in rendered if path)
+        print(f"LaTeX em lote: {done}/{len(pending)} pagina(s) em {elapsed:.2f}s")
+        if not done:
+            print("  Aviso: compilacao em lote falhou; renderizando arquivo a arquivo")
+        for page, (result, path) in enumerate(zip(pending, rendered), 1):
+            if path:
+                result.status = 'ok'
+                result.lines.append(f"  {result.path} -> {path} ({result.seconds:.2f}s + lote)")
+                if not args.no_render_cache and RenderCache(args.render_cache_dir).store(result.tex_body, path):
+                    result.render_cache_hit = False
+                continue
+            retry = process_spice_file(result.path, args, single_output)
+            if done:
+                retry.lines.insert(0, f"  Aviso: pagina {page} do lote falhou ({result.path}); "
+                                      f"renderizando individualmente")
+            results[results.index(result)] = retry
+    return results
+
+
 def find_spice_files(search_path):
     """Encontra arquivos SPICE."""
     if os.path.isfile(search_path):
@@ -2110,8 +3691,51 @@ Requer LaTeX com circuitikz:
     parser.add_argument('-o', '--output', help='Arquivo de saida PNG')
     parser.add_argument('-v', '--verbose', action='store_true', help='Modo verbose')
     parser.add_argument('--netlist', action='store_true', help='Mostrar netlist interno gerado')
+    parser.add_argument('--max-depth', type=int, default=DEFAULT_MAX_SUBCKT_DEPTH,
+                        help=f'Profundidade maxima de subcircuitos aninhados (padrao: {DEFAULT_MAX_SUBCKT_DEPTH})')
+    parser.add_argument('--no-parse-cache', action='store_true',
+                        help='Nao usar o cache persistente de parse')
+    parser.add_argument('--parse-cache-dir', default=str(DEFAULT_PARSE_CACHE_DIR),
+                        help='Diretorio do cache de parse (padrao: .cache/spice_parse/)')
+    parser.add_argument('--batch', action='store_true',
+                        help='Compilar todos os esquematicos em um unico pdflatex (uma pagina por circuito)')
+    parser.add_argument('--latex-format', action='store_true',
+                        help='Usar formato pdflatex pre-compilado com o preambulo (mylatexformat)')
+    parser.add_argument('--latex-format-dir', default=str(DEFAULT_LATEX_FORMAT_DIR),
+                        help='Diretorio do formato pre-compilado (padrao: .cache/latex_format/)')
+    parser.add_argument('--no-layout-cache', action='store_true',
+                        help='Nao reaproveitar o layout de grupos inalterados')
+    parser.add_argument('--layout-cache-dir', default=str(DEFAULT_LAYOUT_CACHE_DIR),
+                        help='Diretorio do cache de layout (padrao: .cache/layout/)')
+    parser.add_argument('--hierarchy', action='store_true',
+                        help='Modo hierarquico: instancias X viram blocos e cada subcircuito '
+                             'usado e desenhado uma vez, em um PNG proprio')
+    parser.add_argument('--layout-effort', choices=EFFORTS, default=DEFAULT_EFFORT,
+                        help='Esforco da reducao de cruzamentos: fast (baricentro), normal '
+                             '(+ mediana) ou high (+ sifting) (padrao: normal)')
+    parser.add_argument('--router', choices=ROUTERS, default='heuristic',
+                        help='Roteador dos fios dos transistores (padrao: heuristic)')
+    parser.add_argument('--route-budget', type=float, default=DEFAULT_ROUTE_BUDGET * 1000,
+                        help='Orcamento do A* por fio em ms antes de usar a heuristica (padrao: 50)')
+    parser.add_argument('--force', action='store_true',
+                        help='Ignorar o cache de render e gerar todos os PNGs de novo')
+    parser.add_argument('--no-render-cache', action='store_true',
+                        help='Nao ler nem gravar o cache de render')
+    parser.add_argument('--render-cache-dir', default=str(DEFAULT_RENDER_CACHE_DIR),
+                        help='Diretorio do cache de render (padrao: .cache/render/)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Processos em paralelo (padrao ou 0: numero de CPUs; 1 = serial)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Cronometrar as fases e imprimir a tabela por arquivo e agregada')
+    parser.add_argument('--profile-json', metavar='ARQUIVO',
+                        help='Gravar o perfil (por arquivo e agregado) em JSON (implica --profile)')
+    parser.add_argument('--profile-trace', metavar='ARQUIVO',
+                        help='Gravar os spans no formato Chrome trace (implica --profile)')
 
     args = parser.parse_args()
+    if args.jobs is not None and args.jobs < 0:
+        parser.error('--jobs deve ser >= 0')
+    args.profile = bool(args.profile or args.profile_json or args.profile_trace)
 
     spice_files = find_spice_files(args.input)
 
@@ -2120,54 +3744,107 @@ Requer LaTeX com circuitikz:
         return 1
 
     print(f"Encontrados {len(spice_files)} arquivo(s) SPICE")
+    args.latex_format_path = None
+    if args.latex_format:
+        args.latex_format_path = ensure_latex_format(args.latex_format_dir)
+        if args.latex_format_path:
+            print(f"Formato LaTeX pre-compilado: {args.latex_format_path}.fmt")
+        else:
+            print("Aviso: formato LaTeX pre-compilado indisponivel; usando pdflatex normal")
     print("-" * 50)
 
     success = 0
     errors = 0
-
-    for spice_path in spice_files:
-        try:
-            if args.verbose:
-                print(f"Processando: {spice_path}")
-
-            components, title = parse_spice_file(spice_path)
-
-            if args.verbose:
-                print(f"  Componentes encontrados: {len(components)}")
-                for comp in components:
-                    print(f"    {comp}")
-
-            if not components:
-                print(f"  Aviso: Nenhum componente encontrado em {spice_path}")
-                continue
-
-            if args.netlist:
-                netlist = create_netlist(components, title)
-                print(f"\nNetlist interno:\n{netlist}\n")
-
-            if args.output and len(spice_files) == 1:
-                output_path = args.output
-            else:
-                base = os.path.splitext(spice_path)[0]
-                output_path = base + '_schematic.png'
-
-            result = create_schematic(components, title or os.path.basename(spice_path), output_path)
-
-            if result:
-                print(f"  {spice_path} -> {output_path}")
-                success += 1
-            else:
-                errors += 1
-
-        except Exception as e:
-            print(f"  ERRO em {spice_path}: {e}")
-            if args.verbose:
-                import traceback
-                traceback.print_exc()
+    failed = []
+    cache_hits = 0
+    cache_misses = 0
+    render_hits = 0
+    render_misses = 0
+    bytes_saved = 0
+    layout_reused = 0
+    crossing_totals = defaultdict(float)
+    layout_hits = 0
+    layout_misses = 0
+    library_parses = defaultdict(int)
+    library_hits = defaultdict(int)
+    single_output = args.output if len(spice_files) == 1 else None
+    jobs = max(1, min(args.jobs or os.cpu_count() or 1, len(spice_files)))
+    start = time.perf_counter()
+
+    batch_timer = span_timer.SpanTimer('lote', tid=1) if args.profile else None
+    results = _map_spice_files(spice_files, args, single_output, jobs)
+    if args.batch:
+        results = _render_pending(list(results), args, single_output, batch_timer)
+    profiles = []
+    trace = []
+
+    for result in results:
+        for line in result.lines:
+            print(line)
+        if result.status == 'ok':
+            success += 1
+        elif result.status == 'error':
             errors += 1
+            failed.append(result.path)
+        if result.render_cache_hit is True:
+            render_hits += 1
+            bytes_saved += result.bytes_saved
+        elif result.render_cache_hit is False:
+            render_misses += 1
+        if result.parse_cache_hit is True:
+            cache_hits += 1
+        elif result.parse_cache_hit is False:
+            cache_misses += 1
+        layout_reused += result.layout_reused
+        for key, value in result.layout_stats.items():
+            crossing_totals[key] += value
+        layout_hits += result.layout_hits
+        layout_misses += result.layout_misses
+        if result.profile is not None:
+            profiles.append({'path': result.path, **result.profile})
+            trace.extend(result.trace)
+        for lib_path, count in result.library_parses.items():
+            library_parses[lib_path] += count
+        for lib_path, count in result.library_hits.items():
+            library_hits[lib_path] += count
 
     print("-" * 50)
-    print(f"Concluido: {success} sucesso, {errors} erro(s)")
+    if not args.no_parse_cache and args.verbose:
+        print(f"Cache de parse: {cache_hits} acerto(s), {cache_misses} falta(s)")
+    if not args.no_layout_cache and args.verbose:
+        print(f"Cache de layout: {layout_reused} circuito(s) reaproveitado(s) por inteiro, "
+              f"{layout_hits} grupo(s) reaproveitado(s), {layout_misses} recalculado(s)")
+    if args.verbose:
+        for lib_path in sorted(set(library_parses) | set(library_hits)):
+            print(f"Biblioteca {lib_path}: parseada {library_parses[lib_path]} vez(es), "
+                  f"reutilizada {library_hits[lib_path]} vez(es)")
+    if crossing_totals:
+        print(f"Cruzamentos no layout ({args.layout_effort}): "
+              f"{int(crossing_totals['crossings_before'])} -> {int(crossing_totals['crossings_after'])} "
+              f"em {int(crossing_totals['groups'])} grupo(s), {crossing_totals['seconds'] * 1e3:.1f} ms")
+    if not args.no_render_cache:
+        print(f"Cache de render: {render_hits} acerto(s), {render_misses} falta(s), "
+              f"{bytes_saved / 1024:.0f} KiB poupados")
+    if args.profile:
+        if batch_timer.totals:
+            profiles.append({'path': None, **batch_timer.summary()})
+            trace.extend(batch_timer.trace_events())
+        aggregate = span_timer.merge_summaries(profiles)
+        print(f"Perfil agregado ({len(profiles)} entrada(s)):")
+        for line in span_timer.format_table(aggregate):
+            print(line)
+        if args.profile_json:
+            span_timer.write_json(args.profile_json, profiles, aggregate)
+            print(f"Perfil em JSON: {args.profile_json}")
+        if args.profile_trace:
+            span_timer.write_chrome_trace(args.profile_trace, trace)
+            print(f"Trace (Chrome/Perfetto): {args.profile_trace}")
+    if failed:
+        print("Falhas:")
+        for path in failed:
+            print(f"  {path}")
+    print(f"Concluido: {success} sucesso, {errors} erro(s) "
+          f"em {time.perf_counter() - start:.2f}s ({jobs} processo(s))")
 
     return 0 if errors == 0 else 1
 
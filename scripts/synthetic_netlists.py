@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+synthetic_netlists.py - Gera netlists SPICE sinteticos para benchmarks
+
+Uso:
+    python scripts/synthetic_netlists.py deck 100000 -o /tmp/deck.cir
+    python scripts/synthetic_netlists.py adder 64 -o /tmp/somador64.cir
+    python scripts/synthetic_netlists.py amps 200 -o /tmp/amps200.cir
+    python scripts/synthetic_netlists.py ladder 500 -o /tmp/escada500.cir
+    python scripts/synthetic_netlists.py ring 101 -o /tmp/ring101.cir
+    python scripts/synthetic_netlists.py opamps 50 -o /tmp/ampops50.cir
+
+Os decks imitam netlists "achatados" gerados por ferramentas de PDK:
+muitos elementos simples, comentarios, linhas de continuacao (+),
+subcircuitos e um bloco .control no final.
+
+Os somadores sao hierarquicos: portas CMOS (como em
+07_logica_digital_cmos/portas_logicas_cmos.cir) -> somador completo ->
+blocos de 4 bits -> somador de N bits.
+
+Os arranjos de amplificadores sao N estagios emissor comum independentes
+(cada um com sua fonte; um a cada tres com tanque LC no coletor), ou
+seja, N grupos desconectados no layout.
+
+As escadas sao redes R-2R de N secoes (so bipolos, um unico grupo longo).
+Os osciladores em anel repetem 03_osciladores/oscilador_ring.cir com N
+inversores CMOS (N impar) instanciados no nivel superior. Os arranjos de
+amp-ops sao N inversores de ganho 10 com um amp-op bipolar de dois
+estagios em nivel de transistor (subcircuito achatado em cada instancia).
+"""
+
+import sys
+import argparse
+
+
+def iter_flat_deck_lines(n_lines):
+    """Gera as linhas de um deck sintetico com aproximadamente n_lines linhas."""
+    yield "* deck sintetico para benchmark do parser"
+    yield ".subckt inv in out vdd vss"
+    yield "Mp out in vdd vdd PMOS_3P3 W=2u L=0.35u"
+    yield "Mn out in vss vss NMOS_3P3 W=1u L=0.35u"
+    yield ".ends"
+    yield "VDD vdd 0 DC 3.3"
+    emitted = 6
+    idx = 0
+    while emitted < n_lines - 4:
+        kind = idx % 8
+        a = f"n{idx}"
+        b = f"n{idx + 1}"
+        if kind == 0:
+            yield f"R{idx} {a} {b} 1k ; resistor de carga"
+            emitted += 1
+        elif kind == 1:
+            yield f"C{idx} {a} 0 10p"
+            emitted += 1
+        elif kind == 2:
+            yield f"* bloco {idx}"
+            yield f"L{idx} {a} {b} 1u"
+            emitted += 2
+        elif kind == 3:
+            yield f"Q{idx} {a} {b} 0 QBC548"
+            emitted += 1
+        elif kind == 4:
+            yield f"M{idx} {a} {b} 0 0 NMOS_3P3"
+            yield "+ W=1u L=0.35u"
+            yield "+ AD=1p AS=1p $ geometria"
+            emitted += 3
+        elif kind == 5:
+            yield f"V{idx} {a} 0 PULSE(0 3.3 0 1n 1n 5n 10n)"
+            emitted += 1
+        elif kind == 6:
+            yield f"X{idx} {a} {b} vdd 0 inv"
+            emitted += 1
+        else:
+            yield ""
+            yield f"D{idx} {a} {b} D1N4148"
+            emitted += 2
+        idx += 1
+    yield ".control"
+    yield "tran 1n 100n"
+    yield ".endc"
+    yield ".end"
+
+
+def write_flat_deck(path, n_lines):
+    """Escreve um deck sintetico em path e retorna o numero de linhas."""
+    return write_lines(path, iter_flat_deck_lines(n_lines))
+
+
+CMOS_GATE_LIBRARY = """\
+.subckt inversor in out vdd gnd
+  MP1 out in vdd vdd PMOS_5V W=2u L=1u
+  MN1 out in gnd gnd NMOS_5V W=1u L=1u
+  Cload out gnd 10f
+.ends
+.subckt nand a b out vdd gnd
+  MP1 out a vdd vdd PMOS_5V W=2u L=1u
+  MP2 out b vdd vdd PMOS_5V W=2u L=1u
+  MN1 out a n1 gnd NMOS_5V W=2u L=1u
+  MN2 n1 b gnd gnd NMOS_5V W=2u L=1u
+  Cload out gnd 10f
+.ends
+.subckt xor_gate a b out vdd gnd
+  Xinv_a a na vdd gnd inversor
+  Xinv_b b nb vdd gnd inversor
+  Xnand1 a nb n1 vdd gnd nand
+  Xnand2 na b n2 vdd gnd nand
+  Xnand3 n1 n2 out vdd gnd nand
+.ends
+.subckt somador_completo a b cin s cout vdd gnd
+  Xxor1 a b p vdd gnd xor_gate
+  Xxor2 p cin s vdd gnd xor_gate
+  Xnand1 a b g_n vdd gnd nand
+  Xnand2 p cin t_n vdd gnd nand
+  Xnand3 g_n t_n cout vdd gnd nand
+.ends
+.subckt somador4 a0 a1 a2 a3 b0 b1 b2 b3 cin s0 s1 s2 s3 cout vdd gnd
+  Xfa0 a0 b0 cin s0 c0 vdd gnd somador_completo
+  Xfa1 a1 b1 c0 s1 c1 vdd gnd somador_completo
+  Xfa2 a2 b2 c1 s2 c2 vdd gnd somador_completo
+  Xfa3 a3 b3 c2 s3 cout vdd gnd somador_completo
+.ends
+"""
+
+
+def iter_ripple_adder_lines(n_bits):
+    """Gera um somador ripple-carry de n_bits (multiplo de 4) com portas CMOS."""
+    n_blocks = max(1, n_bits // 4)
+    yield f"* somador ripple-carry de {n_blocks * 4} bits (sintetico)"
+    yield "VDD vdd 0 DC 5"
+    yield "VCIN c_in 0 DC 0"
+    yield from CMOS_GATE_LIBRARY.splitlines()
+    for blk in range(n_blocks):
+        bits = range(blk * 4, blk * 4 + 4)
+        a = ' '.join(f"a{i}" for i in bits)
+        b = ' '.join(f"b{i}" for i in bits)
+        s = ' '.join(f"s{i}" for i in bits)
+        cin = "c_in" if blk == 0 else f"c{blk * 4 - 1}"
+        yield f"Xblk{blk} {a} {b} {cin} {s} c{blk * 4 + 3} vdd 0 somador4"
+    for i in range(n_blocks * 4):
+        yield f"VA{i} a{i} 0 DC {5 * (i % 2)}"
+        yield f"VB{i} b{i} 0 DC {5 * ((i // 2) % 2)}"
+        yield f"Rload{i} s{i} 0 100k"
+    yield ".model NMOS_5V NMOS (LEVEL=1 VTO=0.7 KP=200u)"
+    yield ".model PMOS_5V PMOS (LEVEL=1 VTO=-0.7 KP=80u)"
+    yield ".end"
+
+
+def iter_amplifier_array_lines(n_blocks):
+    """Gera n_blocks amplificadores emissor comum desconectados entre si."""
+    yield f"* {n_blocks} amplificadores emissor comum independentes (sintetico)"
+    for i in range(n_blocks):
+        yield f"VCC{i} vcc{i} 0 DC 12"
+        yield f"VIN{i} in{i} 0 SIN(0 10m 1k)"
+        yield f"RB1_{i} vcc{i} b{i} 47k"
+        yield f"RB2_{i} b{i} 0 10k"
+        yield f"CIN{i} in{i} b{i} 10u"
+        if i % 3 == 0:
+            yield f"L{i} vcc{i} c{i} 10u"
+            yield f"CT{i} vcc{i} c{i} 1n"
+        else:
+            yield f"RC{i} vcc{i} c{i} 4.7k"
+        yield f"Q{i} c{i} b{i} e{i} BC548"
+        yield f"RE{i} e{i} 0 1k"
+        yield f"CE{i} e{i} 0 100u"
+        yield f"COUT{i} c{i} out{i} 10u"
+        yield f"RL{i} out{i} 0 10k"
+    yield ".model BC548 NPN (IS=1e-14 BF=200)"
+    yield ".end"
+
+
+def iter_resistor_ladder_lines(n_sections):
+    """Gera uma escada R-2R com n_sections secoes."""
+    yield f"* escada R-2R de {n_sections} secoes (sintetico)"
+    yield "VREF n0 0 DC 5"
+    for i in range(n_sections):
+        yield f"RS{i} n{i} n{i + 1} 1k"
+        yield f"RP{i} n{i + 1} 0 2k"
+    yield f"RT n{n_sections} 0 2k"
+    yield ".end"
+
+
+def iter_ring_oscillator_lines(n_stages):
+    """Gera um oscilador em anel com n_stages inversores CMOS (arredonda para impar)."""
+    n_stages = max(3, n_stages | 1)
+    yield f"* oscilador em anel de {n_stages} estagios (sintetico)"
+    yield ".subckt inversor in out vdd gnd"
+    yield "MP1 out in vdd vdd PMOS_SIMPLE W=2u L=1u"
+    yield "MN1 out in gnd gnd NMOS_SIMPLE W=1u L=1u"
+    yield "CLOAD out gnd 1p"
+    yield ".ends"
+    yield "VDD vdd 0 DC 3.3"
+    for i in range(n_stages):
+        out = "saida" if i == n_stages - 1 else f"n{i + 1}"
+        inp = "saida" if i == 0 else f"n{i}"
+        yield f"X{i + 1} {inp} {out} vdd 0 inversor"
+    yield "RLOAD saida 0 10k"
+    yield ".model NMOS_SIMPLE NMOS (LEVEL=1 VTO=0.7 KP=100u)"
+    yield ".model PMOS_SIMPLE PMOS (LEVEL=1 VTO=-0.7 KP=50u)"
+    yield ".end"
+
+
+OPAMP_LIBRARY = """\
+.subckt ampop_bjt inp inn vcc vee out
+  Q1 c1 inp e12 QNPN
+  Q2 c2 inn e12 QNPN
+  Q3 c1 c1 vcc QPNP
+  Q4 c2 c1 vcc QPNP
+  RTAIL e12 vee 20k
+  Q5 out2 c2 vcc QPNP
+  RL2 out2 vee 10k
+  CC c2 out2 30p
+  Q6 vcc out2 out QNPN
+  REO out vee 2k
+.ends
+"""
+
+
+def iter_opamp_array_lines(n_blocks):
+    """Gera n_blocks inversores de ganho 10 com o amp-op em nivel de transistor."""
+    yield f"* {n_blocks} inversores com amp-op bipolar (sintetico)"
+    yield "VCC vcc 0 DC 15"
+    yield "VEE vee 0 DC -15"
+    yield from OPAMP_LIBRARY.splitlines()
+    for i in range(n_blocks):
+        yield f"VIN{i} in{i} 0 SIN(0 100m 1k)"
+        yield f"RIN{i} in{i} inv{i} 10k"
+        yield f"RF{i} inv{i} out{i} 100k"
+        yield f"XOP{i} 0 inv{i} vcc vee out{i} ampop_bjt"
+        yield f"RL{i} out{i} 0 10k"
+    yield ".model QNPN NPN (IS=1e-14 BF=200)"
+    yield ".model QPNP PNP (IS=1e-14 BF=100)"
+    yield ".end"
+
+
+def write_lines(path, lines):
+    """Escreve as linhas geradas em path e retorna quantas foram escritas."""
+    count = 0
+    with open(path, 'w') as f:
+        for line in lines:
+            f.write(line)
+            f.write('\n')
+            count += 1
+    return count
+
+
+GENERATORS = {
+    'deck': iter_flat_deck_lines,
+    'adder': iter_ripple_adder_lines,
+    'amps': iter_amplifier_array_lines,
+    'ladder': iter_resistor_ladder_lines,
+    'ring': iter_ring_oscillator_lines,
+    'opamps': iter_opamp_array_lines,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera netlists SPICE sinteticos')
+    parser.add_argument('kind', choices=sorted(GENERATORS), help='Tipo de netlist')
+    parser.add_argument('size', type=int,
+                        help='Tamanho (linhas para deck, bits para adder, estagios para amps e '
+                             'ring, secoes para ladder, amp-ops para opamps)')
+    parser.add_argument('-o', '--output', required=True, help='Arquivo de saida')
+    args = parser.parse_args()
+
+    count = write_lines(args.output, GENERATORS[args.kind](args.size))
+    print(f"{args.output}: {count} linhas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
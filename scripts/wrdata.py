@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+wrdata.py - Leitura rapida dos arquivos de texto do ngspice (wrdata)
+
+load_wrdata segue exatamente as regras do antigo parse_ngspice_csv:
+  - primeira linha vira cabecalho se algum token dela nao for numero;
+  - linhas vazias ou que comecam com '#' ou '*' (depois do strip) sao
+    ignoradas, assim como linhas com qualquer token nao numerico;
+  - sem cabecalho, as colunas se chamam col_0, col_1, ...
+
+O arquivo e lido em blocos de ~chunk_bytes caracteres (sempre terminando
+em fim de linha). Um bloco sem '#', '*' nem caracteres fora do ASCII
+comum vai inteiro para o tokenizador em C do np.loadtxt; se o loadtxt
+recusar o bloco (token invalido, numero de colunas variando), ou se o
+bloco tiver caracteres suspeitos, ele e refeito linha a linha com float(),
+como antes. Os valores sao copiados para um array float64 pre-alocado
+(tamanho estimado pelos bytes por linha do primeiro bloco, crescendo 1.5x
+se preciso), entao o pico de memoria e o array final mais um bloco.
+
+Com dedupe=True as copias da variavel independente que o wrdata grava
+antes de cada vetor (sem wr_singlescale) sao detectadas no primeiro bloco
+e descartadas bloco a bloco: um dump de 8 colunas com 4 copias do tempo
+vira um array de 4 colunas.
+
+WaveformCache guarda o resultado em .cache/waveforms/ (um .npy com os
+dados e um .json com cabecalho e a identidade do arquivo de origem). Nas
+leituras seguintes o .npy e aberto com np.load(mmap_mode='r'): abrir um
+dump de varios GB e instantaneo e so as paginas usadas sao lidas do disco.
+
+Uso:
+    from wrdata import load_wrdata, WaveformCache
+    header, data = load_wrdata('circuits/19_boost_buck/vout.dat')
+    header, data = WaveformCache().read('circuits/19_boost_buck/vout.dat', dedupe=True)
+"""
+
+import io
+import os
+import json
+import hashlib
+import tempfile
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+from file_digest import file_digest
+
+CHUNK_BYTES = 1 << 20
+
+# Incrementar quando load_wrdata passar a produzir outro resultado para o
+# mesmo arquivo (invalida as entradas do WaveformCache).
+WAVEFORM_CACHE_VERSION = 3
+DEFAULT_WAVEFORM_CACHE_DIR = Path(__file__).resolve().parent.parent / '.cache' / 'waveforms'
+DEFAULT_WAVEFORM_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+# Ao estourar o limite durante os stores, o cache desce ate esta fracao dele
+# (folga para os proximos stores nao varrerem o diretorio de novo)
+WAVEFORM_CACHE_LOW_WATER = 0.9
+
+# Blocos com estes caracteres vao direto para o caminho linha a linha:
+# comentarios e separadores que str.split aceita e o loadtxt nao
+_UNSAFE_CHARS = ('#', '*', '\x0b', '\x0c', '\x1c', '\x1d', '\x1e', '\x1f')
+
+
+def _is_header(first_line):
+    """Mesma regra de antes: cabecalho se algum token nao for numero."""
+    try:
+        [float(x) for x in first_line.split()]
+    except ValueError:
+        return True
+    return False
+
+
+def _parse_lines(text):
+    """Caminho exato (linha a linha com float()); retorna lista de linhas."""
+    rows = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line or line.startswith('#') or line.startswith('*'):
+            continue
+        try:
+            values = [float(x) for x in line.split()]
+            if values:
+                rows.append(values)
+        except ValueError:
+            continue
+    return rows
+
+
+def _parse_block(text):
+    """Bloco de texto -> array 2D (linhas x colunas) ou lista de linhas."""
+    if text.isascii() and not any(c in text for c in _UNSAFE_CHARS):
+        try:
+            with warnings.catch_warnings():
+                # Bloco so com linhas em branco: "input contained no data"
+                warnings.simplefilter('ignore', UserWarning)
+                return np.loadtxt(io.StringIO(text), dtype=np.float64, comments=None, ndmin=2)
+        except ValueError:
+            pass
+    return _parse_lines(text)
+
+
+class _ScaleMismatch(Exception):
+    """Colunas tidas como copia da escala divergem dela em algum bloco."""
+
+    def __init__(self, columns):
+        super().__init__(columns)
+        self.columns = columns
+
+
+def _is_scale_name(name, scale):
+    """name e a escala repetida: o mesmo nome ou uma variante <escala>_dupN."""
+    name = name.lower()
+    return name == scale or (name.startswith(scale + '_dup') and name[len(scale) + 4:].isdigit())
+
+
+def scale_duplicates(header, data):
+    """
+    Colunas (indices > 0) que repetem a variavel independente (coluna 0).
+
+    Sem wr_singlescale o wrdata grava pares (escala, vetor), entao a escala
+    so aparece nas colunas pares. Uma coluna e copia quando e igual a
+    coluna 0 em todas as linhas de data (uma comparacao vetorizada) e nao
+    e um vetor: com nome no cabecalho, o nome e o da escala (ou
+    <escala>_dupN); sem nome, ela esta numa posicao de escala dos pares.
+    Um vetor que por acaso segue a escala (v(in) ligado direto a fonte
+    varrida num DC sweep) fica, com ou sem cabecalho.
+    """
+    ncols = data.shape[1]
+    same = (data[:, 1:] == data[:, :1]).all(axis=0)
+    named = len(header) if header else 0
+    scale = header[0].lower() if header else ''
+    copies = []
+    for j in np.flatnonzero(same) + 1:
+        j = int(j)
+        if j < named:
+            if _is_scale_name(header[j], scale):
+                copies.append(j)
+        elif ncols % 2 == 0 and j % 2 == 0:
+            copies.append(j)
+    return copies
+
+
+class _Rows:
+    """Array float64 pre-alocado que cresce por blocos.
+
+    Com dups (colunas repetidas da escala), cada bloco confere se elas
+    ainda sao iguais a coluna 0 e so as colunas keep sao copiadas.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.array = None
+        self.count = 0
+        self.ncols = None
+        self.dups = []
+        self.keep = None
+
+    def to_array(self, block):
+        """Bloco (array do loadtxt ou lista de linhas) -> array, conferindo as colunas."""
+        if self.ncols is None:
+            self.ncols = len(block[0])
+        ncols = self.ncols
+        if isinstance(block, list):
+            for values in block:
+                if len(values) != ncols:
+                    raise ValueError(
+                        f"Numero de colunas inconsistente em {self.filepath}: "
+                        f"{len(values)} valores numa linha, esperado {ncols}")
+            return np.array(block, dtype=np.float64)
+        if block.shape[1] != ncols:
+            raise ValueError(
+                f"Numero de colunas inconsistente em {self.filepath}: "
+                f"{block.shape[1]} valores numa linha, esperado {ncols}")
+        return block
+
+    def extend(self, block, estimate):
+        if self.dups:
+            same = (block[:, self.dups] == block[:, :1]).all(axis=0)
+            if not same.all():
+                raise _ScaleMismatch([j for j, ok in zip(self.dups, same) if not ok])
+            block = block[:, self.keep]
+        if self.array is None:
+            self.array = np.empty((max(estimate, len(block)), block.shape[1]), dtype=np.float64)
+        end = self.count + len(block)
+        if end > len(self.array):
+            grown = np.empty((max(end, int(len(self.array) * 1.5) + 1), self.array.shape[1]),
+                             dtype=np.float64)
+            grown[:self.count] = self.array[:self.count]
+            self.array = grown
+        self.array[self.count:end] = block
+        self.count = end
+
+    def result(self):
+        array = self.array
+        if self.count < len(array):
+            array.resize((self.count, array.shape[1]), refcheck=False)
+        return array
+
+
+def load_wrdata(filepath, chunk_bytes=CHUNK_BYTES, dedupe=False):
+    """
+    Le um arquivo do ngspice wrdata.
+
+    dedupe: descarta as copias da variavel independente (scale_duplicates,
+    decidido no primeiro bloco). Elas nunca entram no array final; os nomes
+    das colunas mantidas sao os originais (col_0, col_3, ...). Se num bloco
+    seguinte uma dessas colunas diferir da escala, o arquivo e relido com
+    ela mantida.
+
+    Retorna: (nomes_colunas, dados_numpy) com dados float64 (linhas x colunas)
+    """
+    distinct = set()
+    while True:
+        try:
+            return _load(filepath, chunk_bytes, dedupe, distinct)
+        except _ScaleMismatch as e:
+            distinct.update(e.columns)
+
+
+def _load(filepath, chunk_bytes, dedupe, distinct):
+    file_size = os.path.getsize(filepath)
+    with open(filepath, 'r') as f:
+        first = f.readline()
+        if not first:
+            raise ValueError(f"Arquivo vazio: {filepath}")
+
+        header = []
+        pending = first
+        if _is_header(first.strip()):
+            header = first.split()
+            pending = ''
+
+        rows = _Rows(filepath)
+        estimate = 0
+        while True:
+            text = f.read(chunk_bytes)
+            if text and not text.endswith('\n'):
+                text += f.readline()
+            if pending:
+                text = pending + text
+                pending = ''
+            if not text:
+                break
+            block = _parse_block(text)
+            if len(block) == 0:
+                continue
+            block = rows.to_array(block)
+            if rows.array is None:
+                # Linhas no arquivo inteiro, pelos bytes por linha deste bloco
+                per_row = len(text) / len(block)
+                estimate = int(file_size / per_row * 1.02) + 16
+                if dedupe:
+                    rows.dups = [j for j in scale_duplicates(header, block) if j not in distinct]
+                    rows.keep = [j for j in range(rows.ncols) if j not in rows.dups]
+            rows.extend(block, estimate)
+
+    if rows.count == 0:
+        raise ValueError(f"Nenhum dado numerico encontrado em: {filepath}")
+
+    data = rows.result()
+    keep = rows.keep if rows.dups else range(rows.ncols)
+
+    # Gerar nomes de colunas se nao houver cabecalho
+    if not header:
+        header = [f'col_{i}' for i in keep]
+    elif rows.dups:
+        header = [header[i] for i in keep if i < len(header)]
+
+    return header, data
+
+
+class WaveformCache:
+    """Cache em disco dos arquivos wrdata ja convertidos (float64 .npy).
+
+    Cada arquivo de origem tem uma entrada (com e sem dedupe), nomeada pelo
+    hash do caminho absoluto: <chave>.npy (dados) e <chave>.json (versao, cabecalho,
+    mtime, tamanho e sha256 da origem). A entrada vale se mtime e tamanho
+    baterem; se so o mtime mudou (ex.: touch, copia), o sha256 e conferido
+    e, se igual, a entrada e reaproveitada. Os dados voltam como memmap
+    somente leitura. As entradas menos usadas (mtime do .npy, atualizado
+    a cada acerto) sao removidas quando o diretorio passa de max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_WAVEFORM_CACHE_DIR, max_bytes=DEFAULT_WAVEFORM_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._usage = None      # bytes no diretorio; medido no primeiro store
+
+    def _entry_paths(self, filepath, dedupe=False):
+        key = hashlib.sha256(
+            f"v{WAVEFORM_CACHE_VERSION}|dedupe={int(dedupe)}|{Path(filepath).resolve()}".encode()).hexdigest()
+        return self.cache_dir / f"{key}.npy", self.cache_dir / f"{key}.json"
+
+    def load(self, filepath, dedupe=False):
+        """Retorna (cabecalho, memmap) em cache ou None se ausente/desatualizado."""
+        npy_path, meta_path = self._entry_paths(filepath, dedupe)
+        try:
+            st = os.stat(filepath)
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != WAVEFORM_CACHE_VERSION or meta.get('size') != st.st_size:
+            return None
+        if meta.get('mtime_ns') != st.st_mtime_ns:
+            if file_digest(filepath) != meta.get('sha256'):
+                return None
+            meta['mtime_ns'] = st.st_mtime_ns
+            self._write_meta(meta_path, meta)
+        try:
+            data = np.load(npy_path, mmap_mode='r')
+            os.utime(npy_path)
+        except (OSError, ValueError):
+            return None
+        return meta['header'], data
+
+    def store(self, filepath, header, data, dedupe=False):
+        """Grava a entrada de filepath (primeiro o .npy, depois o .json)."""
+        npy_path, meta_path = self._entry_paths(filepath, dedupe)
+        try:
+            st = os.stat(filepath)
+            meta = {
+                'version': WAVEFORM_CACHE_VERSION,
+                'source': str(Path(filepath).resolve()),
+                'mtime_ns': st.st_mtime_ns,
+                'size': st.st_size,
+                'sha256': file_digest(filepath),
+                'header': list(header),
+            }
+            if meta['sha256'] is None:
+                return
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix='.tmp_', suffix='.npy', dir=self.cache_dir)
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.ascontiguousarray(data, dtype=np.float64))
+            os.replace(tmp, npy_path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            return
+        self._write_meta(meta_path, meta)
+        self._account(npy_path, meta_path)
+
+    def _account(self, *paths):
+        """Soma a entrada nova ao total em bytes e so varre o diretorio ao passar de max_bytes.
+
+        O diretorio e listado uma vez (no primeiro store) e depois apenas
+        quando o total estimado estoura o limite; a remocao desce ate
+        WAVEFORM_CACHE_LOW_WATER do limite. Gravar N arquivos custa O(N)
+        chamadas ao sistema de arquivos, nao O(N^2).
+        """
+        if self._usage is None:
+            self._usage = self._entries()[1]
+        else:
+            for path in paths:
+                try:
+                    self._usage += path.stat().st_size
+                except OSError:
+                    pass
+        if self._usage > self.max_bytes:
+            self.evict(int(self.max_bytes * WAVEFORM_CACHE_LOW_WATER))
+
+    def _write_meta(self, meta_path, meta):
+        fd, tmp = tempfile.mkstemp(prefix='.tmp_', suffix='.json', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(meta, f)
+            os.replace(tmp, meta_path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def _entries(self):
+        """(entradas [(mtime, bytes, .npy, .json)], total em bytes) do diretorio."""
+        entries = []
+        total = 0
+        for npy_path in self.cache_dir.glob('*.npy'):
+            if npy_path.name.startswith('.tmp_'):
+                continue
+            meta_path = npy_path.with_suffix('.json')
+            try:
+                st = npy_path.stat()
+                size = st.st_size + (meta_path.stat().st_size if meta_path.exists() else 0)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, size, npy_path, meta_path))
+            total += size
+        return entries, total
+
+    def evict(self, target=None):
+        """Remove as entradas menos usadas ate o diretorio caber em target (padrao: max_bytes)."""
+        if target is None:
+            target = self.max_bytes
+        entries, total = self._entries()
+        entries.sort()
+        removed = 0
+        for _, size, npy_path, meta_path in entries:
+            if total <= target:
+                break
+            try:
+                # .json primeiro: sem ele a entrada ja nao e lida
+                if meta_path.exists():
+                    meta_path.unlink()
+                npy_path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._usage = total
+        return removed
+
+    def read(self, filepath, dedupe=False):
+        """load_wrdata com cache (entradas separadas com e sem dedupe)."""
+        cached = self.load(filepath, dedupe)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        header, data = load_wrdata(filepath, dedupe=dedupe)
+        self.store(filepath, header, data, dedupe)
+        return header, data
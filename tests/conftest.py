@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os scripts sao modulos soltos em scripts/ (importados pelo nome)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
@@ -0,0 +1,77 @@
+import os
+import sys
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import csv_to_png
+from bench_rawfile import write_rawfile
+
+
+@pytest.fixture
+def y_labels(monkeypatch):
+    """Rotulos Y dos graficos gerados (capturados antes do savefig)."""
+    labels = []
+
+    def savefig(path, **kwargs):
+        labels.append(csv_to_png.plt.gca().get_ylabel())
+
+    monkeypatch.setattr(csv_to_png.plt, 'savefig', savefig)
+    return labels
+
+
+def test_csv_labels_follow_column_names(tmp_path, y_labels):
+    data = np.column_stack([np.linspace(0, 1e-3, 20), np.ones(20), np.ones(20)])
+    path = tmp_path / 'ac.csv'
+    np.savetxt(path, data, header='time v(out) db(v(out))', comments='')
+    csv_to_png.process_csv(str(path))
+    # v( vem antes de db( na deteccao, como sempre foi para CSVs
+    assert y_labels == ['Tensao (V)']
+
+
+def test_raw_complex_plot_is_labelled_db(tmp_path, y_labels):
+    freq = np.logspace(0, 6, 61)
+    ac = np.empty((61, 2), dtype=np.complex128)
+    ac[:, 0] = freq
+    ac[:, 1] = 1 / (1 + 1j * freq / 1e3)
+    path = tmp_path / 'filtro.raw'
+    write_rawfile(path, [('AC Analysis', ['frequency', 'v(out)'], ac)])
+    outputs = csv_to_png.process_raw(str(path))
+    assert [p.rsplit('/', 1)[-1] for p in outputs] == ['filtro_ac.png']
+    assert y_labels == ['Magnitude (dB)']
+
+
+def test_find_input_files_includes_raw(tmp_path):
+    for name in ('a.csv', 'b.raw', 'c.txt'):
+        (tmp_path / name).write_text('')
+    found = sorted(p.rsplit('/', 1)[-1] for p in csv_to_png.find_input_files(str(tmp_path)))
+    assert found == ['a.csv', 'b.raw']
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason='o worker precisa herdar o process_file trocado')
+def test_dead_worker_marks_unfinished_files_failed(tmp_path, monkeypatch, capsys):
+    t = np.linspace(0, 1e-3, 20)
+    for i in range(4):
+        np.savetxt(tmp_path / f"sinal_{i}.csv", np.column_stack([t, np.sin(t * i)]))
+    process_file = csv_to_png.process_file
+
+    def crash(path, *args):
+        if path.endswith('sinal_2.csv'):
+            os._exit(1)
+        return process_file(path, *args)
+
+    monkeypatch.setattr(csv_to_png, 'process_file', crash)
+    monkeypatch.setattr(sys, 'argv', ['csv_to_png.py', str(tmp_path), '--no-cache', '-j', '2'])
+    assert csv_to_png.main() == 1
+    out = capsys.readouterr().out
+    assert f"ERRO em {tmp_path / 'sinal_2.csv'}: processo worker terminou inesperadamente" in out
+    assert "Concluido:" in out
+
+
+def test_negative_jobs_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['csv_to_png.py', str(tmp_path), '-j', '-1'])
+    with pytest.raises(SystemExit) as exc:
+        csv_to_png.main()
+    assert exc.value.code == 2
@@ -0,0 +1,52 @@
+import sys
+
+import pytest
+
+import spice_to_schematic
+from spice_to_schematic import SubcircuitFlattener, hierarchy_instance_count, hierarchy_pages, parse_spice_netlist
+from synthetic_netlists import iter_ripple_adder_lines, write_lines
+
+
+@pytest.fixture
+def adder8(tmp_path):
+    path = tmp_path / 'adder8.cir'
+    write_lines(path, iter_ripple_adder_lines(8))
+    return path
+
+
+@pytest.fixture
+def no_flatten(monkeypatch):
+    def fail(self, *args, **kwargs):
+        raise AssertionError("SubcircuitFlattener.flatten chamado no modo hierarquico")
+    monkeypatch.setattr(SubcircuitFlattener, 'flatten', fail)
+
+
+def test_pages_without_flattening(adder8, no_flatten):
+    netlist = parse_spice_netlist(adder8, flatten=False)
+    assert len(netlist.components) == netlist.top_count
+    pages = hierarchy_pages(netlist)
+    assert [page.subckt for page in pages] == [
+        None, 'SOMADOR4', 'SOMADOR_COMPLETO', 'XOR_GATE', 'NAND', 'INVERSOR']
+    # 2 somador4 -> 8 somadores -> 120 portas, sem expandir nenhuma
+    assert hierarchy_instance_count(netlist) == 130
+    assert netlist.flattener.instance_count == 0
+
+
+def test_pages_match_flattened_parse(adder8):
+    lazy = hierarchy_pages(parse_spice_netlist(adder8, flatten=False))
+    full = hierarchy_pages(parse_spice_netlist(adder8))
+    assert len(lazy) == len(full)
+    for a, b in zip(lazy, full):
+        assert a.title == b.title and a.ports == b.ports
+        assert [str(c) for c in a.components] == [str(c) for c in b.components]
+
+
+def test_cli_hierarchy_does_not_flatten(adder8, tmp_path, monkeypatch, no_flatten, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(spice_to_schematic, 'render_circuitikz_batch', lambda entries, fmt=None: [None] * len(entries))
+    monkeypatch.setattr(spice_to_schematic, 'create_schematic_matplotlib', lambda comps, title, path: path)
+    monkeypatch.setattr(sys, 'argv', [
+        'spice_to_schematic.py', str(adder8), '--hierarchy', '--no-render-cache',
+        '--no-layout-cache', '--parse-cache-dir', str(tmp_path / 'parse')])
+    assert spice_to_schematic.main() == 0
+    assert "6 pagina(s)" in capsys.readouterr().out
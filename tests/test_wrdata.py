@@ -0,0 +1,42 @@
+import numpy as np
+
+from wrdata import load_wrdata
+
+
+def test_dc_sweep_keeps_named_vector_equal_to_scale(tmp_path):
+    sweep = np.linspace(0.0, 1.8, 10)
+    path = tmp_path / 'dc.csv'
+    np.savetxt(path, np.column_stack([sweep, sweep, 2 * sweep]), header='v-sweep v(in) v(out)', comments='')
+    header, data = load_wrdata(str(path), dedupe=True)
+    assert header == ['v-sweep', 'v(in)', 'v(out)']
+    assert data.shape == (10, 3)
+
+
+def test_scale_named_copies_are_dropped(tmp_path):
+    t = np.linspace(0.0, 1e-3, 10)
+    path = tmp_path / 'tran.csv'
+    np.savetxt(path, np.column_stack([t, np.sin(t), t, np.cos(t)]),
+               header='time v(a) time_dup1 v(b)', comments='')
+    header, data = load_wrdata(str(path), dedupe=True)
+    assert header == ['time', 'v(a)', 'v(b)']
+    np.testing.assert_array_equal(data[:, 2], np.cos(t))
+
+
+def test_unnamed_copies_are_dropped(tmp_path):
+    t = np.linspace(0.0, 1e-3, 10)
+    path = tmp_path / 'gilbert.csv'
+    np.savetxt(path, np.column_stack([t, np.sin(t), t, np.cos(t)]))
+    header, data = load_wrdata(str(path), dedupe=True)
+    assert header == ['col_0', 'col_1', 'col_3']
+    assert data.shape == (10, 3)
+
+
+def test_headerless_dc_sweep_keeps_vector_equal_to_scale(tmp_path):
+    # wrdata dc.csv v(in) v(out): pares (sweep, v(in)) (sweep, v(out)), v(in) == sweep
+    sweep = np.linspace(0.0, 1.8, 10)
+    path = tmp_path / 'dc.csv'
+    np.savetxt(path, np.column_stack([sweep, sweep, sweep, 2 * sweep]))
+    header, data = load_wrdata(str(path), dedupe=True)
+    assert header == ['col_0', 'col_1', 'col_3']
+    np.testing.assert_array_equal(data[:, 1], sweep)
+    np.testing.assert_array_equal(data[:, 2], 2 * sweep)